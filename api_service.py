@@ -1,35 +1,350 @@
 import streamlit as st
 import requests
 import json
-from collections import defaultdict
+import hashlib
 import copy
-from utils import resolve_ref, deep_merge
+import uuid
+from utils import deep_merge
+from render_plan import OperationPlan, BODY_METHOD_FIELDS
+from request_builder import RequestBuildError, RequestInputs, build_request, apply_row, row_column_targets
+from request_engine import RequestEngine, grant_from_login_response
+from token_manager import TokenManager
+from oauth_flows import OAuthClient, OAuthError, OAuthTokens
+from workflow import Workflow, WorkflowError, WorkflowRun
+from batch_runner import BatchRun, BatchFileError, batch_columns
+from load_test import LoadTestRun
+from pagination import PaginationRun
 from ui_components.form_generator import build_json_from_form
-from app_config import GLOBAL_SUFFIX
+from app_config import SPEC_STREAMING_THRESHOLD_BYTES, SPEC_STREAM_CHUNK_BYTES
+from state_manager import rerun_endpoint_panel
+from spec_cache import SPEC_CACHE, SpecCache, compile_spec
+from spec_store import SPEC_STORE, content_hash_of
+from spec_stream import parse_spec_stream
+from spec_diff import diff_operation_hashes
+from http_pool import HTTP_POOL
+from background_calls import CALL_EXECUTOR, CallResult, STATUS_CANCELLED, STATUS_REQUEST_ERROR
+from resilience import RESILIENCE
+from response_cache import RESPONSE_CACHE, CACHEABLE_METHODS
+from spec_bundle import SpecDocumentError, bundle_content_hash, bundle_spec, is_yaml_document, parse_document
+
+def http_session_for(api_base_url:str):
+    """Session con pool de conexiones de la URL base, compartida con otras sesiones de Streamlit."""
+    if st.session_state.get('http_pool_holder_id') is None:
+        st.session_state.http_pool_holder_id = uuid.uuid4().hex
+    return HTTP_POOL.acquire(api_base_url, st.session_state.http_pool_holder_id)
+
+def session_token_manager() -> TokenManager:
+    """TokenManager de la sesión: vencimiento y renovación de las credenciales activas."""
+    if st.session_state.get('token_manager') is None:
+        st.session_state.token_manager = TokenManager()
+    return st.session_state.token_manager
+
+def session_oauth_tokens() -> OAuthTokens:
+    """Clientes OAuth2 configurados en la sesión y sus tokens en caché por scopes."""
+    if st.session_state.get('oauth_tokens') is None:
+        st.session_state.oauth_tokens = OAuthTokens()
+    return st.session_state.oauth_tokens
+
+def fresh_credentials(notices:list=None) -> dict:
+    """
+    Credenciales activas listas para enviar: las que el TokenManager renovó
+    reemplazan a las guardadas y las vencidas que no se pudieron renovar se quitan
+    de la sesión (un token vencido nunca se envía). Puede esperar una renovación.
+    Los esquemas con cliente OAuth2 se conservan: su token se pide por operación.
+    """
+    active = st.session_state.get('active_security_credentials') or {}
+    oauth_tokens = session_oauth_tokens()
+    fresh = session_token_manager().fresh_credentials({k: v for k, v in active.items() if not oauth_tokens.configured(k)})
+    fresh.update({k: v for k, v in active.items() if oauth_tokens.configured(k)})
+    expired = [scheme_name for scheme_name in active if scheme_name not in fresh]
+    if expired:
+        st.session_state.auth_status_message = f"El token de {', '.join(expired)} venció y no se pudo renovar: vuelve a autenticarte."
+        if notices is not None:
+            notices.append(("warning", st.session_state.auth_status_message))
+    st.session_state.active_security_credentials = fresh
+    return fresh
+
+def operation_credentials(plan:OperationPlan, notices:list=None) -> dict:
+    """Credenciales para una operación: las activas, con el token OAuth2 de los scopes que declara."""
+    return session_oauth_tokens().credentials_for(plan, fresh_credentials(notices), notices)
+
+def apply_oauth_client(scheme_name:str, scheme_details:dict, client:OAuthClient, scopes) -> None:
+    """
+    Configura el cliente OAuth2 de un esquema y pide ya el token de los scopes
+    elegidos, que queda como credencial activa. Lanza OAuthError si el tokenUrl no
+    lo entrega.
+    """
+    oauth_tokens = session_oauth_tokens()
+    session_token_manager().forget(scheme_name)
+    oauth_tokens.configure(scheme_name, scheme_details, client, st.session_state.current_api_url)
+    try:
+        st.session_state.active_security_credentials[scheme_name] = oauth_tokens.token(scheme_name, scopes)
+    except OAuthError:
+        oauth_tokens.remove(scheme_name)
+        raise
 
 def reset_api_spec(api_base_url_input:str) -> None:
+    holder = st.session_state.get('http_pool_holder_id')
+    if holder is not None and HTTP_POOL.holder_key(holder) != HTTP_POOL.make_key(api_base_url_input or ""):
+        HTTP_POOL.release(holder) # Cambió la URL base: se suelta (y si nadie más la usa, se cierra) la Session anterior
     st.session_state.openapi_spec = None
+    st.session_state.ref_index = None
+    st.session_state.operation_plans = {}
+    st.session_state.search_index = None
+    st.session_state.focused_endpoint_id = None
+    st.session_state.search_results_page = 0
+    st.session_state.spec_source = None
+    st.session_state.loaded_spec = None
+    st.session_state.loaded_spec_key = None
+    st.session_state.spec_update_message = None
     st.session_state.error_message = None
     st.session_state.grouped_endpoints = None
     st.session_state.tag_descriptions = {}
     st.session_state.current_api_url = api_base_url_input
     st.session_state.active_security_credentials = {} 
+    session_token_manager().forget()
+    session_oauth_tokens().remove()
     st.session_state.auth_input_values = {} 
     st.session_state.auth_status_message = None 
     st.session_state.user_info = {}
     st.session_state.show_detail_dialog = False
     st.session_state.show_auth_dialog = False 
     st.session_state.active_expander_id = None
+    for pending in st.session_state.get('pending_calls', {}).values():
+        pending.cancel()
+    st.session_state.pending_calls = {}
+    for batch_run in st.session_state.get('batch_runs', {}).values():
+        batch_run.discard()
+    st.session_state.batch_runs = {}
+    for load_test_run in st.session_state.get('load_tests', {}).values():
+        load_test_run.cancel()
+    st.session_state.load_tests = {}
+    for pagination_run in st.session_state.get('paginated_results', {}).values():
+        pagination_run.cancel()
+    st.session_state.paginated_results = {}
+    if st.session_state.get('workflow_run') is not None:
+        st.session_state.workflow_run.cancel()
+    st.session_state.workflow_run = None
     st.session_state.endpoint_responses = {}
+    st.session_state.endpoint_response_meta = {}
     st.session_state.active_tab_name = None
     st.session_state.form_field_values = {} 
     st.session_state.form_field_includes = {}
     st.session_state.api_json_location = "openapi.json" 
 
+def should_stream_spec(response) -> bool:
+    # El parser en streaming solo entiende JSON
+    if is_yaml_document(response.url, response.headers.get("Content-Type")):
+        return False
+    content_length = response.headers.get("Content-Length")
+    return not content_length or int(content_length) > SPEC_STREAMING_THRESHOLD_BYTES
+
+def parse_streamed_spec(response) -> tuple:
+    hasher = hashlib.sha256()
+    def hashed_chunks():
+        for chunk in response.iter_content(chunk_size=SPEC_STREAM_CHUNK_BYTES):
+            hasher.update(chunk)
+            yield chunk
+    try:
+        spec_data = parse_spec_stream(hashed_chunks())
+    except json.JSONDecodeError as e:
+        raise json.JSONDecodeError(f"{e.msg} (contenido: {e.doc[max(e.pos - 100, 0):e.pos + 100]!r})", e.doc, e.pos) from None
+    return spec_data, hasher.hexdigest()
+
+def parse_spec_content(response, content:bytes) -> dict:
+    try:
+        return parse_document(content, response.url, response.headers.get("Content-Type"))
+    except json.JSONDecodeError as e:
+        raise json.JSONDecodeError(f"{e.msg} (contenido: {response.text[:200]!r})", e.doc, e.pos) from None
+
+def fetch_api_spec(openapi_url:str, cache_key:tuple, force_revalidate:bool=False) -> tuple:
+    """
+    Devuelve (CachedSpec, origen) donde origen es 'memoria', 'revalidada', 'red',
+    'almacén local' o 'almacén local (sin conexión)'. Con force_revalidate se
+    consulta al servidor aunque la entrada en memoria siga dentro del TTL.
+    """
+    cached = SPEC_CACHE.get(cache_key)
+    if cached is not None and not force_revalidate and cached.is_fresh(SPEC_CACHE.ttl_seconds):
+        SPEC_CACHE.record_hit()
+        return cached, "memoria"
+
+    from_store = False
+    if cached is None:
+        cached = SPEC_STORE.load_latest(openapi_url)
+        from_store = cached is not None
+
+    # En especificaciones de varios archivos un 304 de la raíz no garantiza que los documentos referenciados sigan iguales
+    conditional_headers = cached.conditional_headers() if cached is not None and not cached.external_documents else {}
+
+    def offline_entry():
+        SPEC_CACHE.put(cache_key, cached)
+        SPEC_CACHE.record_hit()
+        return cached, "almacén local (sin conexión)" if from_store else "memoria (sin conexión)"
+
+    try:
+        response = requests.get(openapi_url, timeout=15, headers=conditional_headers, stream=True)
+    except requests.exceptions.RequestException:
+        if cached is None:
+            raise
+        return offline_entry()
+
+    if response.status_code >= 500 and cached is not None:
+        # Un gateway que responde 502/503 equivale a un host caído: se arranca con la versión guardada
+        response.close()
+        return offline_entry()
+
+    if response.status_code == 304 and cached is not None:
+        response.close()
+        SPEC_CACHE.mark_revalidated(cached)
+        SPEC_CACHE.put(cache_key, cached)
+        SPEC_CACHE.record_hit(revalidated=True)
+        return cached, "almacén local" if from_store else "revalidada"
+
+    response.raise_for_status()
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+
+    def known_entry(content_hash):
+        # Mismo contenido que una versión ya compilada: se reutiliza sin compilar
+        if cached is not None and cached.content_hash == content_hash:
+            return cached, "almacén local" if from_store else "revalidada"
+        return SPEC_STORE.load(openapi_url, content_hash), "almacén local"
+
+    external_documents = {}
+    if should_stream_spec(response):
+        spec_data, content_hash = parse_streamed_spec(response)
+        entry, source = known_entry(content_hash)
+        if entry is not None:
+            spec_data = None # Ya compilada: no se vuelve a compilar ni a guardar
+    else:
+        content = response.content
+        content_hash = content_hash_of(content)
+        entry, source = known_entry(content_hash)
+        spec_data = None if entry is not None else parse_spec_content(response, content)
+
+    if spec_data is not None:
+        spec_data, external_documents = bundle_spec(spec_data, openapi_url)
+        if external_documents:
+            content_hash = bundle_content_hash(content_hash, external_documents)
+            entry, source = known_entry(content_hash)
+
+    if entry is not None:
+        entry.etag, entry.last_modified = etag, last_modified
+        SPEC_CACHE.mark_revalidated(entry)
+    else:
+        source = "red"
+        entry = compile_spec(spec_data, etag=etag, last_modified=last_modified, content_hash=content_hash,
+                             external_documents=external_documents, previous=cached)
+        try:
+            SPEC_STORE.save(openapi_url, entry)
+        except OSError:
+            pass # El almacén en disco es una optimización; si no se puede escribir se sigue sin él
+    SPEC_CACHE.put(cache_key, entry)
+    SPEC_CACHE.record_miss()
+    return entry, source
+
+def set_loaded_spec(cached, spec_source:str, cache_key:tuple) -> None:
+    st.session_state.loaded_spec = cached
+    st.session_state.loaded_spec_key = cache_key
+    st.session_state.spec_source = spec_source
+    st.session_state.openapi_spec = cached.spec
+    st.session_state.ref_index = cached.ref_index
+    st.session_state.operation_plans = cached.operation_plans
+    st.session_state.search_index = cached.search_index
+    st.session_state.tag_descriptions = cached.tag_descriptions
+    st.session_state.grouped_endpoints = cached.grouped_endpoints
+
+def discard_endpoint_state(endpoint_ids) -> None:
+    """Elimina valores de formulario, respuestas y estado de widgets de los endpoints indicados."""
+    if not endpoint_ids:
+        return
+    for endpoint_id in endpoint_ids:
+        st.session_state.form_field_values.pop(endpoint_id, None)
+        st.session_state.form_field_includes.pop(endpoint_id, None)
+        st.session_state.endpoint_responses.pop(endpoint_id, None)
+        st.session_state.endpoint_response_meta.pop(endpoint_id, None)
+        pending = st.session_state.pending_calls.pop(endpoint_id, None)
+        if pending is not None:
+            pending.cancel()
+        batch_run = st.session_state.batch_runs.pop(endpoint_id, None)
+        if batch_run is not None:
+            batch_run.discard()
+        load_test_run = st.session_state.load_tests.pop(endpoint_id, None)
+        if load_test_run is not None:
+            load_test_run.cancel()
+        pagination_run = st.session_state.paginated_results.pop(endpoint_id, None)
+        if pagination_run is not None:
+            pagination_run.cancel()
+    # Todas las claves de widgets de un endpoint empiezan con su id (ver render_plan y form_generator)
+    widget_prefixes = tuple(f"{endpoint_id}_" for endpoint_id in endpoint_ids)
+    for key in list(st.session_state.keys()):
+        if isinstance(key, str) and key.startswith(widget_prefixes):
+            del st.session_state[key]
+
+def apply_spec_update(cached, spec_source:str):
+    """
+    Reemplaza la especificación cargada por una nueva versión conservando el estado
+    (formularios, respuestas, credenciales) de los endpoints cuya operación no cambió.
+    Devuelve el SpecDiff aplicado.
+    """
+    previous = st.session_state.loaded_spec
+    diff = diff_operation_hashes(previous.operation_hashes, cached.operation_hashes)
+    discard_endpoint_state(diff.invalidated)
+
+    if st.session_state.active_expander_id in diff.invalidated:
+        st.session_state.active_expander_id = None
+        st.session_state.pop('_current_expander_rendered', None)
+    if st.session_state.get('focused_endpoint_id') in diff.invalidated:
+        st.session_state.focused_endpoint_id = None
+    if st.session_state.active_tab_name not in cached.grouped_endpoints:
+        sorted_keys = sorted(cached.grouped_endpoints.keys(), key=lambda t: (t == "default", t.lower()))
+        st.session_state.active_tab_name = sorted_keys[0] if sorted_keys else None
+
+    security_schemes = cached.spec.get("components", {}).get("securitySchemes", {})
+    for scheme_name in list(st.session_state.active_security_credentials):
+        if scheme_name not in security_schemes:
+            del st.session_state.active_security_credentials[scheme_name]
+            session_token_manager().forget(scheme_name)
+            session_oauth_tokens().remove(scheme_name)
+
+    set_loaded_spec(cached, spec_source, st.session_state.loaded_spec_key)
+    if diff.is_empty:
+        st.session_state.spec_update_message = "Sin cambios en las operaciones."
+    else:
+        st.session_state.spec_update_message = (
+            f"{len(diff.changed)} modificadas, {len(diff.added)} nuevas, {len(diff.removed)} eliminadas; "
+            f"estado conservado en {len(diff.unchanged)} endpoints."
+        )
+    return diff
+
+def reload_api_spec() -> None:
+    """Vuelve a consultar la especificación ya cargada y aplica solo las operaciones que cambiaron."""
+    cache_key = st.session_state.loaded_spec_key
+    openapi_url = f"{cache_key[0]}/{cache_key[1]}"
+    try:
+        with st.spinner(f"Buscando cambios en {openapi_url}..."):
+            cached, spec_source = fetch_api_spec(openapi_url, cache_key, force_revalidate=True)
+            if cached is st.session_state.loaded_spec:
+                st.session_state.spec_source = spec_source
+                st.session_state.spec_update_message = "La especificación no cambió."
+            else:
+                apply_spec_update(cached, spec_source)
+        st.session_state.error_message = None
+    except requests.exceptions.RequestException as e:
+        st.session_state.error_message = f"Error de red al recargar API: {e}"
+    except json.JSONDecodeError as e:
+        st.session_state.error_message = f"Error al parsear JSON de la API: {e}"
+    except SpecDocumentError as e:
+        st.session_state.error_message = f"Error al parsear la especificación: {e}"
+    except Exception as e:
+        st.session_state.error_message = f"Error inesperado al recargar API: {e}"
+
 def load_api_spec(api_base_url_input:str, api_json_location_input:str) -> None:
     current_api_url = st.session_state.get("current_api_url", api_base_url_input)
     current_api_json_loc = st.session_state.get("api_json_location", api_json_location_input)
 
+    # Carga completa: descarta formularios, respuestas y credenciales (la recarga incremental es reload_api_spec)
+    cache_key = SpecCache.make_key(current_api_url, current_api_json_loc) if current_api_url else None
     reset_api_spec(current_api_url) 
     st.session_state.api_json_location = current_api_json_loc
 
@@ -37,45 +352,22 @@ def load_api_spec(api_base_url_input:str, api_json_location_input:str) -> None:
         openapi_url = f"{current_api_url.rstrip('/')}/{current_api_json_loc.lstrip('/')}"
         try:
             with st.spinner(f"Cargando especificación desde {openapi_url}..."):
-                response = requests.get(openapi_url, timeout=15)
-                response.raise_for_status()
-                spec_data: dict = response.json()
-                st.session_state.openapi_spec = spec_data
-
-                grouped = defaultdict(list)
-                st.session_state.tag_descriptions = {
-                    tag_def.get("name", f"tag_desconocido_{i}"): tag_def
-                    for i, tag_def in enumerate(spec_data.get("tags", []))
-                }
-
-                if "paths" in spec_data:
-                    for path_str, path_item in spec_data["paths"].items():
-                        for method_str, operation_obj in path_item.items():
-                            tag_name = operation_obj.get("tags", ["default"])[0]
-                            endpoint_id = f"{tag_name}_{method_str.upper()}_{path_str.replace('/','_').replace('{','').replace('}','')}{GLOBAL_SUFFIX}"
-                            grouped[tag_name].append({
-                                "path": path_str,
-                                "method": method_str,
-                                "operation": operation_obj,
-                                "id": endpoint_id
-                            })
-                    for tag_name_iter in grouped:
-                        grouped[tag_name_iter].sort(key=lambda x: (x["path"], x["method"]))
-                    
-                    st.session_state.grouped_endpoints = dict(grouped)
-
-                    if grouped:
-                        sorted_keys = sorted(grouped.keys(), key=lambda t: (t == "default", t.lower()))
-                        st.session_state.active_tab_name = sorted_keys[0] if sorted_keys else None
-                else:
-                    st.session_state.grouped_endpoints = {}
+                cached, spec_source = fetch_api_spec(openapi_url, cache_key)
+                set_loaded_spec(cached, spec_source, cache_key)
+                spec_data = cached.spec
+
+                if cached.grouped_endpoints:
+                    sorted_keys = sorted(cached.grouped_endpoints.keys(), key=lambda t: (t == "default", t.lower()))
+                    st.session_state.active_tab_name = sorted_keys[0] if sorted_keys else None
             st.success(f"API '{spec_data.get('info',{}).get('title','N/A')}' cargada exitosamente.")
             st.session_state.error_message = None 
 
         except requests.exceptions.RequestException as e:
             st.session_state.error_message = f"Error de red al cargar API: {e}"
         except json.JSONDecodeError as e:
-            st.session_state.error_message = f"Error al parsear JSON de la API: {e}. Contenido: {response.text[:200]}"
+            st.session_state.error_message = f"Error al parsear JSON de la API: {e}"
+        except SpecDocumentError as e:
+            st.session_state.error_message = f"Error al parsear la especificación: {e}"
         except Exception as e:
             st.session_state.error_message = f"Error inesperado al cargar API: {e}"
     else:
@@ -84,286 +376,294 @@ def load_api_spec(api_base_url_input:str, api_json_location_input:str) -> None:
         st.session_state.grouped_endpoints = None
 
 
-def execute_api_request(endpoint_info:dict, api_base_url:str, spec:dict) -> None:
-    path = endpoint_info["path"]
-    method = endpoint_info["method"]
-    operation = endpoint_info["operation"]
-    endpoint_id = endpoint_info["id"]
+def read_request_inputs(plan:OperationPlan) -> RequestInputs:
+    """
+    Lee del formulario del panel (st.session_state) los valores con los que se
+    construye el request. Lanza RequestBuildError si el JSON crudo es inválido.
+    """
+    endpoint_id = plan.id
+    ref_index = st.session_state.ref_index
+    inputs = RequestInputs()
 
-    if endpoint_id in st.session_state.endpoint_responses:
-        del st.session_state.endpoint_responses[endpoint_id]
+    for param in plan.params:
+        if param.location == 'path':
+            inputs.path_params[param.name] = st.session_state.get(param.widget_key, "")
+        elif param.location == 'query':
+            inputs.query_params[param.name] = st.session_state.get(param.widget_key, "")
 
-    current_path_req = path
-    query_params_req = {}
-    path_params_missing = False
-
-    if "parameters" in operation:
-        for p_idx, param_schema_ref in enumerate(operation["parameters"]):
-            param_schema = resolve_ref(spec, param_schema_ref["$ref"]) if "$ref" in param_schema_ref else param_schema_ref
-            if not param_schema: continue
-
-            param_base_key = f"{endpoint_id}_p_{p_idx}_{param_schema['name']}{GLOBAL_SUFFIX}"
-            param_value = None
-
-            if param_schema['in'] == 'path':
-                param_value = st.session_state.get(f"{param_base_key}_path", "")
-                if not param_value and param_schema.get("required", False):
-                    st.error(f"Parámetro de path requerido '{param_schema['name']}' está vacío.")
-                    path_params_missing = True
-                    break
-                current_path_req = current_path_req.replace(f"{{{param_schema['name']}}}", str(param_value or ""))
-            elif param_schema['in'] == 'query':
-                param_value = st.session_state.get(f"{param_base_key}_query", "")
-                if param_value or (param_schema.get("required", False) and param_value == ""): 
-                    query_params_req[param_schema['name']] = param_value
-    
-    if path_params_missing:
-        st.session_state.active_expander_id = endpoint_id 
-        st.rerun()
-        return
+    body = plan.body
+    if body is None:
+        return inputs
 
-    full_url_req = f"{api_base_url.rstrip('/')}{current_path_req}"
-    
-    request_kwargs = {
-        "params": {k: v for k, v in query_params_req.items() if v is not None} or None, 
-        "timeout": 20
+    if body.content_type == "application/json":
+        chosen_body_method = st.session_state.get(body.body_method_key, body.body_method_options[0])
+
+        if chosen_body_method == BODY_METHOD_FIELDS and body.schema:
+            json_from_fields = build_json_from_form(endpoint_id, ref_index, body.schema)
+            final_body_dict = copy.deepcopy(json_from_fields) if json_from_fields is not None else {}
+
+            additional_raw_str = st.session_state.get(body.additional_raw_json_key, "{}")
+            if additional_raw_str.strip() and additional_raw_str != "{}":
+                try:
+                    json_from_additional = json.loads(additional_raw_str)
+                    final_body_dict = deep_merge(json_from_additional, final_body_dict) 
+                except json.JSONDecodeError as e_merge:
+                    inputs.notices.append(("warning", f"JSON adicional/de sobrescritura inválido, no se fusionará: {e_merge}"))
+            inputs.body = final_body_dict if final_body_dict else None
+
+        else: 
+            raw_json_str = st.session_state.get(body.raw_json_key, "{}")
+            try:
+                inputs.body = json.loads(raw_json_str) if raw_json_str.strip() else None
+            except json.JSONDecodeError as e_raw:
+                raise RequestBuildError(f"JSON crudo para el body es inválido: {e_raw}") from None
+
+    elif body.content_type == "application/x-www-form-urlencoded":
+        for form_field in body.form_fields:
+            if form_field.widget_key in st.session_state: 
+                field_value = st.session_state[form_field.widget_key]
+                
+                if (field_value is not None and field_value != "") or \
+                   form_field.required or \
+                   (form_field.name == "grant_type" and field_value == form_field.literal_value):
+                    inputs.form_data[form_field.name] = field_value
+
+    return inputs
+
+
+def prepare_api_request(plan:OperationPlan, api_base_url:str):
+    """
+    Construye el request de una operación a partir de los valores del formulario y
+    las credenciales activas. Devuelve un PreparedRequest, o None si falta algún
+    dato (el error ya se mostró en el panel).
+    """
+    try:
+        inputs = read_request_inputs(plan)
+        credentials = operation_credentials(plan, inputs.notices) if plan.security and not plan.is_potentially_auth_endpoint else {}
+        return build_request(plan, api_base_url, inputs, credentials)
+    except RequestBuildError as e_build:
+        st.error(str(e_build))
+        return None
+
+
+def apply_call_result(plan:OperationPlan, spec:dict, prepared, result) -> None:
+    """Guarda el resultado de una llamada en endpoint_responses y procesa el login si corresponde."""
+    endpoint_id = plan.id
+    is_potentially_auth_endpoint = plan.is_potentially_auth_endpoint
+    response_data = result.response_data
+    raw_text_response = result.raw_text
+    notices = list(prepared.notices)
+
+    st.session_state.endpoint_responses[endpoint_id] = response_data
+    st.session_state.endpoint_response_meta[endpoint_id] = {
+        "status_code": result.status_code,
+        "elapsed_ms": result.elapsed_ms,
+        "connection_reused": result.connection_reused,
+        "cache_status": result.cache_status,
+        "cache_age_seconds": result.cache_age_seconds,
+        "timing": result.timing,
+        "retries": result.retries,
+        "circuit_state": result.circuit_state,
+        "notices": notices,
     }
+    if result.error:
+        notices.append(("error", result.error))
+        return
+
+    if is_potentially_auth_endpoint and result.ok and isinstance(response_data, dict):
+        all_security_schemes = spec.get("components", {}).get("securitySchemes", {})
+        grant = grant_from_login_response(all_security_schemes, response_data)
+        if grant is not None:
+            # El token queda a cargo del TokenManager, que lo renueva (refresh token o repitiendo este login) antes de que venza
+            api_base_url = st.session_state.current_api_url
+            engine = RequestEngine(st.session_state.loaded_spec, api_base_url, session=http_session_for(api_base_url))
+            session_token_manager().track(grant, engine.login_refresher(prepared))
+            st.session_state.active_security_credentials[grant.scheme_name] = grant.credential
+            st.session_state.auth_status_message = f"Autenticación exitosa con esquema '{grant.scheme_name}'."
+            st.session_state.user_info = grant.user_info
+        elif not response_data.get("error_msg_internal"): # Si fue OK pero no encontramos token
+            st.session_state.auth_status_message = f"Respuesta OK del endpoint de autenticación ({result.status_code}), pero no se pudo extraer un token conocido. Respuesta: {json.dumps(response_data, indent=2)[:500]}" # Limitar longitud de respuesta
     
-    headers_req = {"Accept": "application/json"}
-    query_params_for_auth = {} 
-
-    is_potentially_auth_endpoint = False
-    if not operation.get("security"): 
-            op_id_lower = operation.get("operationId", "").lower()
-            tags_lower = [t.lower() for t in operation.get("tags", [])]
-            if any(keyword in op_id_lower for keyword in ["auth", "login", "token", "authorize"]) or \
-               any(tag in tags_lower for tag in ["auth", "authentication", "login"]):
-                is_potentially_auth_endpoint = True
-
-    if not is_potentially_auth_endpoint and operation.get("security") and st.session_state.get('active_security_credentials'):
-        op_security_requirements = operation.get("security", []) 
+    elif is_potentially_auth_endpoint and not result.ok: 
+        st.session_state.user_info = {}
+        error_detail = response_data.get("detail", response_data.get("error_msg_internal")) if isinstance(response_data, dict) else None
+        if error_detail is None:
+            error_detail = raw_text_response if raw_text_response else "Error desconocido en login"
         
-        applied_auth_for_op = False
-        for sec_req_option in op_security_requirements: 
-            for scheme_name_from_op, _ in sec_req_option.items():
-                if scheme_name_from_op in st.session_state.active_security_credentials:
-                    creds = st.session_state.active_security_credentials[scheme_name_from_op]
-                    
-                    if creds.get("value"): 
-                        if creds.get("type") == "apiKey":
-                            if creds.get("in") == "header" and creds.get("name"):
-                                headers_req[creds["name"]] = creds["value"]
-                                applied_auth_for_op = True
-                            elif creds.get("in") == "query" and creds.get("name"):
-                                query_params_for_auth[creds["name"]] = creds["value"]
-                                applied_auth_for_op = True
-                        
-                        elif creds.get("type") == "http" and creds.get("scheme") == "bearer":
-                            headers_req["Authorization"] = f"Bearer {creds['value']}"
-                            applied_auth_for_op = True
-                        
-                        elif creds.get("type") == "oauth2" : 
-                            if creds.get("value"):
-                                headers_req["Authorization"] = f"Bearer {creds['value']}"
-                                applied_auth_for_op = True
-                        
-                        if applied_auth_for_op:
-                            st.caption(f"Aplicando autorización con esquema: `{scheme_name_from_op}`.")
-                            break 
-            if applied_auth_for_op:
-                break 
-
-        if not applied_auth_for_op and op_security_requirements:
-            required_scheme_names = []
-            for sec_req_opt in op_security_requirements:
-                required_scheme_names.extend(list(sec_req_opt.keys()))
-            unique_required_schemes = list(set(required_scheme_names))
-            st.warning(f"Endpoint protegido, pero no se encontraron credenciales activas para los esquemas requeridos: {', '.join(unique_required_schemes)}")
-
-
-    if query_params_for_auth:
-        request_kwargs["params"] = {**(request_kwargs.get("params") or {}), **query_params_for_auth}
+        if isinstance(error_detail, list):
+            try: error_detail = json.dumps(error_detail)
+            except TypeError: error_detail = str(error_detail)
+        elif isinstance(error_detail, dict):
+             try: error_detail = json.dumps(error_detail)
+             except TypeError: error_detail = str(error_detail)
+
+        st.session_state.auth_status_message = f"Fallo en la autenticación ({result.status_code}). Detalle: {error_detail}"
     
-    actual_body_to_send = None
-    content_type_for_request = None
-
-    if "requestBody" in operation:
-        request_body_spec = operation["requestBody"]
-        content_spec = request_body_spec.get("content", {})
-
-        if "application/json" in content_spec:
-            content_type_for_request = "application/json"
-            json_schema_ref = content_spec["application/json"].get("schema", {}).get("$ref")
-            actual_request_body_schema = resolve_ref(spec, json_schema_ref) if json_schema_ref \
-                                         else content_spec["application/json"].get("schema")
-
-            chosen_body_method_key = f"{endpoint_id}_body_method{GLOBAL_SUFFIX}"
-            default_body_method = "Campos Dinámicos" if actual_request_body_schema else "JSON Crudo"
-            chosen_body_method = st.session_state.get(chosen_body_method_key, default_body_method)
-
-            final_body_dict = {}
-            if chosen_body_method == "Campos Dinámicos" and actual_request_body_schema:
-                json_from_fields = build_json_from_form(endpoint_id, spec, actual_request_body_schema)
-                final_body_dict = copy.deepcopy(json_from_fields) if json_from_fields is not None else {}
-
-                additional_raw_json_key = f"{endpoint_id}_additional_raw_json_body{GLOBAL_SUFFIX}"
-                additional_raw_str = st.session_state.get(additional_raw_json_key, "{}")
-                if additional_raw_str.strip() and additional_raw_str != "{}":
-                    try:
-                        json_from_additional = json.loads(additional_raw_str)
-                        final_body_dict = deep_merge(json_from_additional, final_body_dict) 
-                    except json.JSONDecodeError as e_merge:
-                        st.warning(f"JSON adicional/de sobrescritura inválido, no se fusionará: {e_merge}")
-                actual_body_to_send = final_body_dict if final_body_dict else None
-
-            else: 
-                raw_json_key_main = f"{endpoint_id}_main_raw_json_body{GLOBAL_SUFFIX}"
-                raw_json_str = st.session_state.get(raw_json_key_main, "{}")
-                try:
-                    actual_body_to_send = json.loads(raw_json_str) if raw_json_str.strip() else None
-                except json.JSONDecodeError as e_raw:
-                    st.error(f"JSON crudo para el body es inválido: {e_raw}")
-                    st.session_state.active_expander_id = endpoint_id; st.rerun(); return
-
-            if actual_body_to_send is not None:
-                request_kwargs["json"] = actual_body_to_send
-
-        elif "application/x-www-form-urlencoded" in content_spec:
-            content_type_for_request = "application/x-www-form-urlencoded"
-            form_data_req = {}
-            form_schema_ref = content_spec["application/x-www-form-urlencoded"].get("schema", {}).get("$ref")
-            actual_form_schema = resolve_ref(spec, form_schema_ref) if form_schema_ref else content_spec["application/x-www-form-urlencoded"].get("schema", {})
-            
-            if actual_form_schema and "properties" in actual_form_schema:
-                for prop_name, prop_details in actual_form_schema["properties"].items():
-                    field_key = f"{endpoint_id}_form_{prop_name}{GLOBAL_SUFFIX}"
-                    if field_key in st.session_state: 
-                        field_value = st.session_state[field_key]
-                        
-                        is_prop_required_in_body = prop_name in actual_form_schema.get("required", [])
-                        
-                        if (field_value is not None and field_value != "") or \
-                           is_prop_required_in_body or \
-                           (prop_name == "grant_type" and field_value == prop_details.get("pattern", prop_details.get("default"))):
-                            form_data_req[prop_name] = field_value
-            
-            if form_data_req:
-                request_kwargs["data"] = form_data_req
-            elif actual_form_schema and actual_form_schema.get("required") and not form_data_req:
-                 st.warning("El cuerpo del request x-www-form-urlencoded tiene campos requeridos pero parece estar vacío o no se pudieron construir los datos.")
-
-
-    if content_type_for_request:
-        headers_req["Content-Type"] = content_type_for_request
-    
-    request_kwargs["headers"] = headers_req
+    elif not is_potentially_auth_endpoint and result.status_code in [401, 403]:
+        notices.append(("warning", f"Error de autorización ({result.status_code}). Verifica tus credenciales en 'Configurar Autorización'. Respuesta: {raw_text_response[:300]}"))
 
-    if request_kwargs.get("json") is None and request_kwargs.get("data") is None and \
-       method.upper() in ["POST", "PUT", "PATCH"] and "requestBody" in operation :
-        st.warning("El cuerpo del request (body) está vacío. Se enviará la solicitud igualmente.")
 
-    st.info(f"Ejecutando: {method.upper()} {full_url_req}")
-    if request_kwargs.get("params"): st.caption(f"Query Params: {request_kwargs['params']}")
-    if headers_req: st.caption(f"Headers: {json.dumps(headers_req, indent=2)}") 
-    if request_kwargs.get("json"): st.caption(f"JSON Body: {json.dumps(request_kwargs['json'])}")
-    if request_kwargs.get("data"): st.caption(f"Form Data: {request_kwargs['data']}")
+def execute_api_request(plan:OperationPlan, api_base_url:str, spec:dict) -> None:
+    """
+    Construye el request y lo envía en segundo plano (CALL_EXECUTOR): el panel
+    queda en estado 'en curso' y el resultado llega a endpoint_responses cuando
+    poll_pending_calls detecta que terminó.
+    """
+    endpoint_id = plan.id
+    st.session_state.active_expander_id = endpoint_id
 
+    prepared = prepare_api_request(plan, api_base_url)
+    if prepared is None:
+        return # El error de validación queda visible en el panel
 
-    try:
-        with st.spinner("Enviando solicitud API..."):
-            api_response = requests.request(method.upper(), full_url_req, **request_kwargs)
-
-        response_content_type = api_response.headers.get("Content-Type", "")
-        response_data = None
-        raw_text_response = api_response.text 
-
-        if "application/json" in response_content_type:
-            try:
-                response_data = api_response.json()
-            except json.JSONDecodeError:
-                response_data = {
-                    "error_msg_internal": "La respuesta indicó ser JSON pero no pudo ser parseada.",
-                    "status_code": api_response.status_code,
-                    "raw_text": raw_text_response
-                }
-        else:
-            response_data = {
-                "error_msg_internal": f"Tipo de contenido no JSON recibido: {response_content_type}",
-                "status_code": api_response.status_code,
-                "raw_text": raw_text_response
-            }
-        
-        st.session_state.endpoint_responses[endpoint_id] = response_data
+    if endpoint_id in st.session_state.endpoint_responses:
+        del st.session_state.endpoint_responses[endpoint_id]
+    st.session_state.endpoint_response_meta.pop(endpoint_id, None)
+    pagination_run = st.session_state.paginated_results.pop(endpoint_id, None)
+    if pagination_run is not None:
+        pagination_run.cancel()
+
+    # Con la caché activa, GET/HEAD pueden responderse sin red o revalidarse con ETag
+    use_cache = st.session_state.get('response_cache_enabled') and prepared.method in CACHEABLE_METHODS
+    send = RESPONSE_CACHE.send if use_cache else RESILIENCE.send
+    poller_running = bool(st.session_state.pending_calls)
+    st.session_state.pending_calls[endpoint_id] = CALL_EXECUTOR.submit(endpoint_id, http_session_for(api_base_url), prepared, send)
+    if poller_running:
+        rerun_endpoint_panel()
+    else:
+        st.rerun() # El sondeo de llamadas en curso se dibuja en la ejecución completa
 
-        if is_potentially_auth_endpoint and api_response.ok and isinstance(response_data, dict):
-            all_security_schemes = spec.get("components", {}).get("securitySchemes", {})
-            auth_success_for_scheme = False
+def cancel_pending_call(endpoint_id:str) -> None:
+    pending = st.session_state.pending_calls.pop(endpoint_id, None)
+    if pending is None:
+        return
+    pending.cancel()
+    st.session_state.endpoint_responses[endpoint_id] = {"error_msg_internal": "Solicitud cancelada por el usuario.", "status_code": STATUS_CANCELLED, "raw_text": ""}
+    st.session_state.endpoint_response_meta[endpoint_id] = {
+        "status_code": STATUS_CANCELLED,
+        "elapsed_ms": pending.elapsed_seconds * 1000,
+        "connection_reused": None,
+        "notices": list(pending.prepared.notices) + [("warning", "Solicitud cancelada por el usuario.")],
+    }
 
-            for scheme_name_in_spec, scheme_details_in_spec in all_security_schemes.items():
-                token_found_in_response = None
-                
-                if scheme_details_in_spec.get("type") == "apiKey":
-                    key_name_in_response = scheme_details_in_spec.get("name") 
-                    if key_name_in_response and key_name_in_response in response_data:
-                        token_found_in_response = response_data[key_name_in_response]
-                
-                elif scheme_details_in_spec.get("type") == "http" and scheme_details_in_spec.get("scheme") == "bearer":
-                    possible_token_keys = ["access_token", "accessToken", "token", scheme_name_in_spec.lower()]
-                    for tk in possible_token_keys:
-                        if tk in response_data:
-                            token_found_in_response = response_data[tk]
-                            break
-                
-                elif scheme_details_in_spec.get("type") == "oauth2": 
-                    if "access_token" in response_data:
-                         token_found_in_response = response_data["access_token"]
-
-                if token_found_in_response:
-                    st.session_state.active_security_credentials[scheme_name_in_spec] = {
-                        "type": scheme_details_in_spec.get("type"),
-                        "value": str(token_found_in_response),
-                        "in": scheme_details_in_spec.get("in"), # Para apiKey y http (aunque http no lo usa para 'in')
-                        "name": scheme_details_in_spec.get("name"), # Para apiKey
-                        "scheme": scheme_details_in_spec.get("scheme") # Para http (ej. 'bearer')
-                    }
-                    st.session_state.auth_status_message = f"Autenticación exitosa con esquema '{scheme_name_in_spec}'."
-                    
-                    token_keys_to_exclude = ["access_token", "accessToken", "token"]
-                    if scheme_details_in_spec.get("type") == "apiKey" and scheme_details_in_spec.get("name"):
-                        token_keys_to_exclude.append(scheme_details_in_spec.get("name"))
-                    
-                    st.session_state.user_info = {k: v for k, v in response_data.items() if k not in token_keys_to_exclude}
-                    auth_success_for_scheme = True
-                    break 
-
-            if not auth_success_for_scheme and not response_data.get("error_msg_internal"): # Si fue OK pero no encontramos token
-                st.session_state.auth_status_message = f"Respuesta OK del endpoint de autenticación ({api_response.status_code}), pero no se pudo extraer un token conocido. Respuesta: {json.dumps(response_data, indent=2)[:500]}" # Limitar longitud de respuesta
-        
-        elif is_potentially_auth_endpoint and not api_response.ok: 
-            st.session_state.user_info = {}
-            error_detail_key = "detail" if "detail" in response_data else "error_msg_internal"
-            error_detail = response_data.get(error_detail_key, raw_text_response if raw_text_response else "Error desconocido en login")
-            
-            if isinstance(error_detail, list):
-                try: error_detail = json.dumps(error_detail)
-                except TypeError: error_detail = str(error_detail)
-            elif isinstance(error_detail, dict):
-                 try: error_detail = json.dumps(error_detail)
-                 except TypeError: error_detail = str(error_detail)
-
-            st.session_state.auth_status_message = f"Fallo en la autenticación ({api_response.status_code}). Detalle: {error_detail}"
-        
-        elif not is_potentially_auth_endpoint and api_response.status_code in [401, 403]:
-            st.warning(f"Error de autorización ({api_response.status_code}). Verifica tus credenciales en 'Configurar Autorización'. Respuesta: {raw_text_response[:300]}")
-
-    except requests.exceptions.Timeout:
-        error_msg = f"Error de API: Timeout después de {request_kwargs['timeout']} segundos."
-        st.error(error_msg)
-        st.session_state.endpoint_responses[endpoint_id] = {"error_msg_internal": error_msg, "status_code": 408, "raw_text": ""}
-    except requests.exceptions.RequestException as e_req:
-        error_msg = f"Error de API: {e_req}"
-        st.error(error_msg)
-        st.session_state.endpoint_responses[endpoint_id] = {"error_msg_internal": error_msg, "status_code": 500, "raw_text": ""} 
-    
-    st.session_state.active_expander_id = endpoint_id 
-    st.rerun()
+def poll_pending_calls() -> list:
+    """Aplica los resultados de las llamadas terminadas y devuelve los ids de sus endpoints."""
+    finished = []
+    operation_plans = st.session_state.get('operation_plans', {})
+    for endpoint_id, pending in list(st.session_state.pending_calls.items()):
+        if not pending.done():
+            continue
+        del st.session_state.pending_calls[endpoint_id]
+        plan = operation_plans.get(endpoint_id)
+        if plan is None or pending.future.cancelled():
+            continue # La especificación cambió o la llamada se canceló antes de empezar
+        try:
+            result = pending.future.result()
+        except Exception as e_call: # Un fallo inesperado del envío se muestra como la respuesta del endpoint
+            message = f"Error inesperado al enviar el request: {type(e_call).__name__}: {e_call}"
+            result = CallResult(
+                status_code=STATUS_REQUEST_ERROR,
+                response_data={"error_msg_internal": message, "status_code": STATUS_REQUEST_ERROR, "raw_text": ""},
+                elapsed_ms=pending.elapsed_seconds * 1000,
+                error=message,
+            )
+        apply_call_result(plan, st.session_state.openapi_spec, pending.prepared, result)
+        finished.append(endpoint_id)
+    return finished
+
+def start_batch_run(plan:OperationPlan, api_base_url:str, data:bytes, file_name:str, concurrency:int, rate_limit:float):
+    """
+    Lanza el modo batch de un endpoint: una llamada por fila del archivo, construida
+    con los valores del formulario como base y las columnas de la fila encima, con
+    las credenciales activas al momento de lanzarlo. Devuelve el BatchRun o None si
+    no se pudo lanzar (el error ya se mostró en el panel).
+    """
+    endpoint_id = plan.id
+    try:
+        columns = batch_columns(data, file_name)
+        base_inputs = read_request_inputs(plan)
+    except (BatchFileError, RequestBuildError, UnicodeDecodeError) as e_batch:
+        st.error(f"No se pudo lanzar el batch: {e_batch}")
+        return None
+
+    targets = row_column_targets(plan, columns)
+    if not any(targets.values()):
+        st.error("Ninguna columna del archivo coincide con los parámetros o campos del body de este endpoint.")
+        return None
+
+    ref_index = st.session_state.ref_index
+    credentials = copy.deepcopy(st.session_state.get('active_security_credentials') or {})
+    token_manager = session_token_manager()
+    oauth_tokens = session_oauth_tokens()
+
+    def build_row(row):
+        # Las credenciales se revisan en cada fila: un batch largo sigue con el token renovado
+        inputs = apply_row(plan, base_inputs, row, targets, ref_index)
+        row_credentials = oauth_tokens.credentials_for(plan, token_manager.fresh_credentials(credentials), inputs.notices)
+        return build_request(plan, api_base_url, inputs, row_credentials, describe=False)
+
+    previous = st.session_state.batch_runs.pop(endpoint_id, None)
+    if previous is not None:
+        previous.discard()
+    batch_run = BatchRun(endpoint_id, data, file_name, build_row, http_session_for(api_base_url), concurrency, rate_limit)
+    st.session_state.batch_runs[endpoint_id] = batch_run.start()
+    return batch_run
+
+def start_load_test(plan:OperationPlan, api_base_url:str, config):
+    """
+    Lanza una prueba de carga con el request exactamente como lo enviaría
+    'Ejecutar'. Devuelve el LoadTestRun o None si el request no se pudo construir.
+    """
+    prepared = prepare_api_request(plan, api_base_url)
+    if prepared is None:
+        return None
+    previous = st.session_state.load_tests.pop(plan.id, None)
+    if previous is not None:
+        previous.cancel()
+    load_test_run = LoadTestRun(prepared, config)
+    st.session_state.load_tests[plan.id] = load_test_run.start()
+    return load_test_run
+
+def start_pagination(plan:OperationPlan, api_base_url:str):
+    """
+    'Traer todas las páginas': envía el request del formulario y sigue la
+    paginación en segundo plano acumulando los items de todas las páginas.
+    """
+    endpoint_id = plan.id
+    st.session_state.active_expander_id = endpoint_id
+    prepared = prepare_api_request(plan, api_base_url)
+    if prepared is None:
+        return None
+    st.session_state.endpoint_responses.pop(endpoint_id, None)
+    st.session_state.endpoint_response_meta.pop(endpoint_id, None)
+    previous = st.session_state.paginated_results.pop(endpoint_id, None)
+    if previous is not None:
+        previous.cancel()
+    pagination_run = PaginationRun(endpoint_id, plan, prepared, http_session_for(api_base_url))
+    st.session_state.paginated_results[endpoint_id] = pagination_run.start()
+    return pagination_run
+
+def start_workflow(definition:dict, api_base_url:str, max_parallel:int):
+    """
+    Lanza un workflow con la especificación cargada, la Session de la URL base y una
+    copia de las credenciales activas (los logins del workflow no cambian las de la
+    sesión). Devuelve el WorkflowRun o None si el workflow no es válido (el error ya
+    se mostró).
+    """
+    engine = RequestEngine(
+        st.session_state.loaded_spec, api_base_url,
+        credentials=copy.deepcopy(st.session_state.get('active_security_credentials') or {}),
+        session=http_session_for(api_base_url),
+        tokens=session_token_manager().fork(),
+        oauth=session_oauth_tokens().fork(),
+    )
+    try:
+        workflow_run = WorkflowRun(Workflow.from_dict(definition), engine, max_parallel)
+    except WorkflowError as e_workflow:
+        st.error(f"Workflow inválido: {e_workflow}")
+        return None
+    previous = st.session_state.get('workflow_run')
+    if previous is not None:
+        previous.cancel()
+    st.session_state.workflow_run = workflow_run.start()
+    return workflow_run
@@ -1,9 +1,127 @@
+import os
 
 GLOBAL_SUFFIX = "_stable_release"
 
+# Caché de especificaciones OpenAPI compartida entre sesiones (ver spec_cache.py)
+SPEC_CACHE_TTL_SECONDS = int(os.environ.get("SPEC_CACHE_TTL_SECONDS", "300"))
+SPEC_CACHE_MAX_ENTRIES = int(os.environ.get("SPEC_CACHE_MAX_ENTRIES", "16"))
+
+# Especificaciones más grandes que este umbral (o sin Content-Length) se parsean en
+# streaming y sus 'components.schemas' se cargan a demanda (ver spec_stream.py)
+SPEC_STREAMING_THRESHOLD_BYTES = int(os.environ.get("SPEC_STREAMING_THRESHOLD_BYTES", str(8 * 1024 * 1024)))
+SPEC_STREAM_CHUNK_BYTES = int(os.environ.get("SPEC_STREAM_CHUNK_BYTES", str(256 * 1024)))
+
+# Hilos con los que se descargan en paralelo los documentos referenciados por '$ref'
+# externos/relativos de especificaciones divididas en varios archivos (ver spec_bundle.py)
+SPEC_REF_FETCH_WORKERS = int(os.environ.get("SPEC_REF_FETCH_WORKERS", "8"))
+
+# Directorio del almacén de especificaciones precompiladas (ver spec_store.py); vacío lo desactiva
+COMPILED_SPEC_DIR = os.environ.get("COMPILED_SPEC_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".compiled_specs"))
+# Versiones (hashes de contenido) que se conservan por URL; las más viejas se borran al guardar una nueva
+COMPILED_SPEC_KEEP_VERSIONS = int(os.environ.get("COMPILED_SPEC_KEEP_VERSIONS", "3"))
+
+# Intervalo con el que el vigilante opcional consulta (con ETag) si la especificación
+# cargada cambió y aplica la recarga incremental sin intervención (ver spec_watcher.py)
+SPEC_WATCH_INTERVAL_SECONDS = int(os.environ.get("SPEC_WATCH_INTERVAL_SECONDS", "30"))
+
+# Pool de conexiones HTTP por URL base usado al ejecutar requests (ver http_pool.py):
+# hosts por Session, conexiones keep-alive por host y segundos sin uso tras los que
+# se cierra la Session de una URL base
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "20"))
+HTTP_KEEP_ALIVE = os.environ.get("HTTP_KEEP_ALIVE", "1") == "1"
+HTTP_POOL_IDLE_SECONDS = int(os.environ.get("HTTP_POOL_IDLE_SECONDS", "600"))
+
+# Resiliencia de los requests (ver resilience.py): reintentos de métodos idempotentes
+# con backoff exponencial y jitter (base y tope en segundos) ante errores de conexión
+# y los status de RETRY_STATUS_CODES; un Retry-After mayor que RETRY_AFTER_MAX_SECONDS
+# no se espera. Por host: requests simultáneos como máximo (0 = sin límite) y fallos
+# seguidos que abren el circuito (0 lo desactiva) durante CIRCUIT_BREAKER_RESET_SECONDS
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = float(os.environ.get("RETRY_BACKOFF_SECONDS", "0.5"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("RETRY_BACKOFF_MAX_SECONDS", "10"))
+RETRY_STATUS_CODES = tuple(int(code) for code in os.environ.get("RETRY_STATUS_CODES", "429,502,503,504").split(",") if code.strip())
+RETRY_AFTER_MAX_SECONDS = float(os.environ.get("RETRY_AFTER_MAX_SECONDS", "30"))
+HOST_MAX_CONCURRENCY = int(os.environ.get("HOST_MAX_CONCURRENCY", "32"))
+CIRCUIT_BREAKER_FAILURES = int(os.environ.get("CIRCUIT_BREAKER_FAILURES", "5"))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.environ.get("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+# Autorización compilada por operación y credenciales (ver request_builder.SecurityInjectorCache):
+# entradas que se conservan como máximo (0 resuelve la autorización en cada request)
+SECURITY_INJECTOR_CACHE_SIZE = int(os.environ.get("SECURITY_INJECTOR_CACHE_SIZE", "4096"))
+
+# Formulario del body JSON (ver form_tree.py): niveles de objetos anidados que se despliegan
+# en campos (los más profundos, y los esquemas recursivos, se editan como JSON) y cuántos
+# esquemas compilados se conservan
+FORM_MAX_DEPTH = int(os.environ.get("FORM_MAX_DEPTH", "8"))
+FORM_TREE_CACHE_SIZE = int(os.environ.get("FORM_TREE_CACHE_SIZE", "256"))
+
+# Ejecución de llamadas en segundo plano (ver background_calls.py): timeout de cada
+# request, hilos compartidos por todas las sesiones y cada cuánto se sondean las
+# llamadas en curso para mostrar su resultado
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "20"))
+REQUEST_WORKERS = int(os.environ.get("REQUEST_WORKERS", "16"))
+CALL_POLL_INTERVAL_SECONDS = float(os.environ.get("CALL_POLL_INTERVAL_SECONDS", "0.5"))
+
+# Lectura de respuestas (ver background_calls.py): bodies mayores que el tope en memoria
+# se vuelcan a un archivo temporal (en RESPONSE_SPILL_DIR, o el directorio temporal del
+# sistema) y se parsean a demanda; pasado RESPONSE_MAX_BYTES (0 = sin límite) se
+# abandona la descarga. Del body volcado se muestran los primeros RESPONSE_PREVIEW_BYTES
+RESPONSE_MEMORY_CAP_BYTES = int(os.environ.get("RESPONSE_MEMORY_CAP_BYTES", str(8 * 1024 * 1024)))
+RESPONSE_MAX_BYTES = int(os.environ.get("RESPONSE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+RESPONSE_PREVIEW_BYTES = int(os.environ.get("RESPONSE_PREVIEW_BYTES", str(16 * 1024)))
+RESPONSE_SPILL_DIR = os.environ.get("RESPONSE_SPILL_DIR", "")
+
+# Caché opcional de respuestas GET/HEAD (ver response_cache.py): presupuesto en memoria
+# (LRU), directorio del nivel en disco (vacío lo desactiva) y su tamaño máximo. Con
+# RESPONSE_CACHE_ENABLED=1 la caché arranca activada en cada sesión
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "0") == "1"
+RESPONSE_CACHE_MEMORY_BYTES = int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR", "")
+RESPONSE_CACHE_DISK_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Modo batch de los paneles (ver batch_runner.py): máximo de requests simultáneos que
+# se pueden elegir y filas de resultados que se muestran en la tabla del panel (el
+# resto solo queda en el NDJSON descargable)
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_TABLE_ROWS = int(os.environ.get("BATCH_TABLE_ROWS", "200"))
+
+# Límites del modo "traer todas las páginas" (ver pagination.py)
+PAGINATION_MAX_PAGES = int(os.environ.get("PAGINATION_MAX_PAGES", "100"))
+PAGINATION_MAX_ITEMS = int(os.environ.get("PAGINATION_MAX_ITEMS", "100000"))
+
+# Límites de la prueba de carga de los paneles (ver load_test.py)
+LOAD_TEST_MAX_REQUESTS = int(os.environ.get("LOAD_TEST_MAX_REQUESTS", "100000"))
+LOAD_TEST_MAX_CONCURRENCY = int(os.environ.get("LOAD_TEST_MAX_CONCURRENCY", "200"))
+
+# Tokens (ver token_manager.py): se renuevan esta cantidad de segundos antes de vencer
+# y, si una renovación falla, no se vuelve a intentar antes de TOKEN_REFRESH_RETRY_SECONDS
+TOKEN_REFRESH_MARGIN_SECONDS = float(os.environ.get("TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+TOKEN_REFRESH_RETRY_SECONDS = float(os.environ.get("TOKEN_REFRESH_RETRY_SECONDS", "10"))
+
+# Workflows (ver workflow.py): directorio donde se guardan (vacío desactiva el guardado)
+# y pasos independientes que se ejecutan a la vez como máximo
+WORKFLOW_DIR = os.environ.get("WORKFLOW_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".workflows"))
+WORKFLOW_MAX_PARALLEL = int(os.environ.get("WORKFLOW_MAX_PARALLEL", "8"))
+
+# Si está activo, los endpoints cerrados solo dibujan su cabecera y el formulario
+# completo se construye únicamente para el endpoint abierto (active_expander_id)
+LAZY_ENDPOINT_RENDERING = os.environ.get("LAZY_ENDPOINT_RENDERING", "1") == "1"
+
+# Cada panel de endpoint es un st.fragment: ejecutar una llamada o editar items de
+# un array re-ejecuta solo ese panel en lugar de toda la app
+FRAGMENT_ENDPOINT_PANELS = os.environ.get("FRAGMENT_ENDPOINT_PANELS", "1") == "1"
+
 try:
     import pandas as pd
     PANDAS_AVAILABLE = True
 except ImportError:
     PANDAS_AVAILABLE = False
-    pd = None
\ No newline at end of file
+    pd = None
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+    yaml = None
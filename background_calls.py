@@ -0,0 +1,278 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import requests
+from app_config import REQUEST_WORKERS, RESPONSE_MEMORY_CAP_BYTES, RESPONSE_MAX_BYTES, RESPONSE_PREVIEW_BYTES, RESPONSE_SPILL_DIR
+from http_pool import last_connection_reused, start_request_timing, stop_request_timing
+
+RESPONSE_READ_CHUNK_BYTES = 64 * 1024
+
+# Códigos con los que se registran en endpoint_responses las llamadas que no obtuvieron respuesta
+STATUS_TIMEOUT = 408
+STATUS_CANCELLED = 499
+STATUS_REQUEST_ERROR = 500
+STATUS_CIRCUIT_OPEN = 503
+
+# Por qué una llamada no obtuvo (o abandonó) la respuesta: CallResult.error_kind
+ERROR_TIMEOUT = "timeout"           # El servidor no respondió a tiempo (timeout de lectura)
+ERROR_CONNECTION = "connection"     # No se pudo conectar o se cortó la conexión
+ERROR_CANCELLED = "cancelled"
+ERROR_TOO_LARGE = "too_large"
+ERROR_CIRCUIT_OPEN = "circuit_open" # No se envió: el circuito del host está abierto (ver resilience.py)
+
+
+class CallCancelled(Exception):
+    pass
+
+
+@dataclass
+class PreparedRequest:
+    """Request ya construido a partir del formulario, listo para enviarse desde cualquier hilo."""
+    method: str
+    url: str
+    kwargs: dict
+    notices: list = field(default_factory=list) # [(nivel, mensaje)] generados al construirlo
+
+
+@dataclass
+class CallResult:
+    status_code: int
+    ok: bool = False
+    response_data: Any = None
+    raw_text: str = "" # Inicio del body como texto (hasta RESPONSE_PREVIEW_BYTES)
+    headers: dict = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+    connection_reused: Optional[bool] = None
+    error: Optional[str] = None
+    body: Optional[bytes] = field(default=None, repr=False) # Body en bytes si quedó en memoria (para la caché de respuestas)
+    encoding: Optional[str] = None
+    cache_status: Optional[str] = None # Ver response_cache: servida desde la caché o revalidada
+    cache_age_seconds: Optional[float] = None
+    timing: Optional[dict] = None # Desglose de tiempos y bytes (ver http_pool.RequestTiming.as_dict)
+    error_kind: Optional[str] = None # ERROR_* si no hubo respuesta completa
+    retries: list = field(default_factory=list) # Reintentos previos: [{'reason', 'delay_seconds'}] (ver resilience.py)
+    circuit_state: Optional[str] = None # Estado del circuito del host tras la llamada
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _decode(content:bytes, encoding):
+    return content.decode(encoding or "utf-8", errors="replace")
+
+
+def _response_data(status_code, content_type, content:bytes, encoding):
+    if "application/json" in content_type:
+        try:
+            return json.loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return {
+                "error_msg_internal": "La respuesta indicó ser JSON pero no pudo ser parseada.",
+                "status_code": status_code,
+                "raw_text": _decode(content, encoding)
+            }
+    return {
+        "error_msg_internal": f"Tipo de contenido no JSON recibido: {content_type}",
+        "status_code": status_code,
+        "raw_text": _decode(content, encoding)
+    }
+
+
+class SpilledResponse:
+    """
+    Body que superó RESPONSE_MEMORY_CAP_BYTES: queda en un archivo temporal y en
+    endpoint_responses solo se guarda este handle con el inicio del body. Se
+    parsea a demanda con load(); el archivo se borra al descartarse el handle.
+    """
+
+    def __init__(self, path, size_bytes, status_code, content_type, encoding, preview):
+        self.path = path
+        self.size_bytes = size_bytes
+        self.status_code = status_code
+        self.content_type = content_type
+        self.encoding = encoding
+        self.preview = preview
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    @property
+    def is_json(self):
+        return "application/json" in self.content_type
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def load(self):
+        """Parsea el body completo (mismo resultado que tendría una respuesta en memoria)."""
+        with self.open() as body_file:
+            content = body_file.read()
+        return _response_data(self.status_code, self.content_type, content, self.encoding)
+
+    def summary(self):
+        return {"spilled_to_disk": True, "size_bytes": self.size_bytes, "content_type": self.content_type, "preview": self.preview}
+
+    def discard(self):
+        self._finalizer()
+
+
+def _error_result(status_code, message, started_at, timing=None, error_kind=None):
+    return CallResult(
+        status_code=status_code,
+        response_data={"error_msg_internal": message, "status_code": status_code, "raw_text": ""},
+        elapsed_ms=(time.perf_counter() - started_at) * 1000,
+        error=message,
+        timing=timing.as_dict(last_connection_reused()) if timing is not None else None,
+        error_kind=error_kind,
+    )
+
+
+def _response_header_bytes(response):
+    # Línea de estado + headers tal como llegaron (aprox.: no se conservan los bytes exactos)
+    return len(f"HTTP/1.1 {response.status_code} {response.reason}\r\n") + sum(len(k) + len(v) + 4 for k, v in response.headers.items()) + 2
+
+
+class _BodyBuffer:
+    """Acumula el body en memoria hasta memory_cap y a partir de ahí lo escribe en un archivo temporal."""
+
+    def __init__(self, memory_cap):
+        self.memory_cap = memory_cap
+        self.chunks = []
+        self.size = 0
+        self.path = None
+        self._file = None
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self._file is None and self.size > self.memory_cap:
+            if RESPONSE_SPILL_DIR:
+                os.makedirs(RESPONSE_SPILL_DIR, exist_ok=True)
+            fd, self.path = tempfile.mkstemp(prefix="response_", suffix=".body", dir=RESPONSE_SPILL_DIR or None)
+            self._file = os.fdopen(fd, "wb")
+            self._file.writelines(self.chunks)
+            self.chunks = [self.chunks[0][:RESPONSE_PREVIEW_BYTES]] if self.chunks else []
+        if self._file is not None:
+            self._file.write(chunk)
+            if not self.chunks:
+                self.chunks.append(chunk[:RESPONSE_PREVIEW_BYTES])
+        else:
+            self.chunks.append(chunk)
+
+    def head(self):
+        return b"".join(self.chunks)[:RESPONSE_PREVIEW_BYTES]
+
+    def close(self, keep=True):
+        if self._file is not None:
+            self._file.close()
+            if not keep:
+                _remove_file(self.path)
+
+
+def send_prepared_request(session, prepared, cancel_event=None, memory_cap=RESPONSE_MEMORY_CAP_BYTES, max_bytes=RESPONSE_MAX_BYTES):
+    """
+    Envía el request y lee la respuesta por bloques (para poder abandonarla si se
+    cancela). Hasta memory_cap el body queda en memoria; por encima se vuelca a
+    disco y el resultado lleva un SpilledResponse. Pasado max_bytes (0 = sin
+    límite) se abandona la descarga. No usa st.*: se ejecuta en los hilos del pool.
+    """
+    started_at = time.perf_counter()
+    timing = start_request_timing()
+    body = _BodyBuffer(memory_cap)
+    completed = False
+    try:
+        response = session.request(prepared.method, prepared.url, stream=True, **prepared.kwargs)
+        connection_reused = last_connection_reused()
+        try:
+            for chunk in response.iter_content(chunk_size=RESPONSE_READ_CHUNK_BYTES):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CallCancelled()
+                body.write(chunk)
+                if max_bytes and body.size > max_bytes:
+                    return _error_result(response.status_code, f"La respuesta supera el máximo de {max_bytes} bytes (RESPONSE_MAX_BYTES); se abandonó la descarga.", started_at, timing, ERROR_TOO_LARGE)
+            completed = True
+            timing.finished_at = time.perf_counter()
+            # Bytes del body tal como llegaron por la red (comprimidos si hubo Content-Encoding)
+            timing.response_bytes = _response_header_bytes(response) + (response.raw.tell() if hasattr(response.raw, "tell") else body.size)
+        finally:
+            response.close()
+            body.close(keep=completed)
+    except CallCancelled:
+        return _error_result(STATUS_CANCELLED, "Solicitud cancelada por el usuario.", started_at, timing, ERROR_CANCELLED)
+    except requests.exceptions.Timeout as e_timeout:
+        # Un timeout al conectar es un error de conexión: el request no llegó a enviarse
+        error_kind = ERROR_CONNECTION if isinstance(e_timeout, requests.exceptions.ConnectTimeout) else ERROR_TIMEOUT
+        return _error_result(STATUS_TIMEOUT, f"Error de API: Timeout después de {prepared.kwargs.get('timeout')} segundos.", started_at, timing, error_kind)
+    except requests.exceptions.RequestException as e_req:
+        error_kind = ERROR_CONNECTION if isinstance(e_req, requests.exceptions.ConnectionError) else None
+        return _error_result(STATUS_REQUEST_ERROR, f"Error de API: {e_req}", started_at, timing, error_kind)
+    except OSError as e_disk:
+        # Volcar el body a disco falló (RESPONSE_SPILL_DIR inaccesible, disco lleno): el archivo parcial ya se borró
+        return _error_result(STATUS_REQUEST_ERROR, f"No se pudo guardar la respuesta en disco: {e_disk}", started_at, timing)
+    finally:
+        stop_request_timing()
+
+    content_type = response.headers.get("Content-Type", "")
+    preview = _decode(body.head(), response.encoding)
+    content = None
+    if body.path is not None:
+        response_data = SpilledResponse(body.path, body.size, response.status_code, content_type, response.encoding, preview)
+    else:
+        content = b"".join(body.chunks)
+        response_data = _response_data(response.status_code, content_type, content, response.encoding)
+    return CallResult(
+        status_code=response.status_code,
+        ok=response.ok,
+        response_data=response_data,
+        raw_text=preview,
+        headers=dict(response.headers),
+        elapsed_ms=(time.perf_counter() - started_at) * 1000,
+        connection_reused=connection_reused,
+        timing=timing.as_dict(connection_reused),
+        body=content,
+        encoding=response.encoding,
+    )
+
+
+@dataclass
+class PendingCall:
+    endpoint_id: str
+    prepared: PreparedRequest
+    future: Any
+    cancel_event: threading.Event
+    started_at: float
+
+    @property
+    def elapsed_seconds(self):
+        return time.time() - self.started_at
+
+    def done(self):
+        return self.future.done()
+
+    def cancel(self):
+        # Si aún no empezó no se envía; si está en curso se deja de leer la respuesta
+        self.cancel_event.set()
+        self.future.cancel()
+
+
+class CallExecutor:
+    """Pool de hilos, compartido por todas las sesiones, en el que se ejecutan las llamadas a la API."""
+
+    def __init__(self, max_workers=REQUEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-call")
+
+    def submit(self, endpoint_id, session, prepared, send=send_prepared_request):
+        """send: función que envía el request (p. ej. RESPONSE_CACHE.send para pasar por la caché)."""
+        cancel_event = threading.Event()
+        future = self._executor.submit(send, session, prepared, cancel_event)
+        return PendingCall(endpoint_id, prepared, future, cancel_event, time.time())
+
+
+CALL_EXECUTOR = CallExecutor()
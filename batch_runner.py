@@ -0,0 +1,219 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from app_config import BATCH_TABLE_ROWS
+from background_calls import CallResult, SpilledResponse, STATUS_REQUEST_ERROR
+from request_builder import RequestBuildError
+from resilience import RESILIENCE
+
+BATCH_FILE_TYPES = ("csv", "ndjson", "jsonl")
+RESPONSE_PREVIEW_CHARS = 200
+
+
+class BatchFileError(ValueError):
+    """El archivo del batch no se pudo leer."""
+
+
+def _is_ndjson(file_name):
+    return file_name.lower().endswith((".ndjson", ".jsonl"))
+
+
+def iter_batch_rows(data:bytes, file_name:str):
+    """Recorre las filas (dicts) de un CSV con cabecera o de un NDJSON de objetos."""
+    text = data.decode("utf-8-sig")
+    if _is_ndjson(file_name):
+        for line_number, line in enumerate(io.StringIO(text), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BatchFileError(f"Línea {line_number}: JSON inválido ({e.msg}).") from None
+            if not isinstance(row, dict):
+                raise BatchFileError(f"Línea {line_number}: se esperaba un objeto JSON.")
+            yield row
+    else:
+        yield from csv.DictReader(io.StringIO(text))
+
+
+def batch_columns(data:bytes, file_name:str, sample_rows=100):
+    """Columnas del archivo: la cabecera del CSV o las claves de las primeras filas del NDJSON."""
+    if not _is_ndjson(file_name):
+        return list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))).fieldnames or [])
+    columns = {}
+    for row_number, row in enumerate(iter_batch_rows(data, file_name)):
+        if row_number >= sample_rows:
+            break
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class BatchRun:
+    """
+    Ejecuta una operación una vez por fila de un archivo, en un hilo propio:
+    como mucho 'concurrency' requests en vuelo y, si rate_limit > 0, no más de
+    rate_limit requests por segundo. Cada resultado se escribe en un NDJSON
+    temporal a medida que llega; en memoria solo quedan los contadores y las
+    últimas BATCH_TABLE_ROWS filas para la tabla del panel.
+    """
+
+    def __init__(self, endpoint_id, data, file_name, build_row, session, concurrency=4, rate_limit=0.0):
+        self.endpoint_id = endpoint_id
+        self.file_name = file_name
+        self.concurrency = max(1, int(concurrency))
+        self.rate_limit = float(rate_limit or 0)
+        self._data = data
+        self._build_row = build_row # fila -> PreparedRequest (lanza RequestBuildError)
+        self._session = session
+
+        self.total = None
+        self.completed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.status_counts = Counter()
+        self.recent = deque(maxlen=BATCH_TABLE_ROWS)
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+
+        fd, self.results_path = tempfile.mkstemp(prefix="batch_", suffix=".ndjson")
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_file, self.results_path)
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"batch-{endpoint_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def elapsed_seconds(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.done else 0.0
+        return min(1.0, self.completed / self.total)
+
+    def cancel(self):
+        # Las filas sin enviar se descartan y las que están en vuelo dejan de leer su respuesta
+        self._cancel_event.set()
+
+    def discard(self):
+        self.cancel()
+        self._finalizer()
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.recent), dict(self.status_counts)
+
+    def read_results(self) -> bytes:
+        with self._lock, open(self.results_path, "rb") as results_file:
+            return results_file.read()
+
+    def _record(self, results_file, row_number, row, result):
+        response = result.response_data if result.error is None else None
+        if isinstance(response, SpilledResponse):
+            # En el NDJSON de resultados no se copian bodies volcados a disco: solo su resumen
+            response.discard()
+            response = response.summary()
+        line = {
+            "row": row_number,
+            "input": row,
+            "status_code": result.status_code,
+            "ok": result.ok,
+            "elapsed_ms": round(result.elapsed_ms, 1),
+            "response": response,
+            "error": result.error,
+            "retries": len(result.retries),
+        }
+        preview = result.error or result.raw_text
+        with self._lock:
+            results_file.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+            results_file.flush()
+            self.completed += 1
+            if result.ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.status_counts[result.status_code] += 1
+            self.recent.append({
+                "fila": row_number,
+                "status": result.status_code,
+                "ms": round(result.elapsed_ms),
+                "respuesta": preview[:RESPONSE_PREVIEW_CHARS],
+            })
+
+    def _send(self, row):
+        prepared = self._build_row(row)
+        return RESILIENCE.send(self._session, prepared, self._cancel_event)
+
+    def _run(self):
+        try:
+            self.total = sum(1 for _ in iter_batch_rows(self._data, self.file_name))
+            with open(self.results_path, "w", encoding="utf-8") as results_file, \
+                 ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch-call") as pool:
+                self._run_rows(results_file, pool)
+        except BatchFileError as e:
+            self.error = str(e)
+        except Exception as e_run: # Sin esto el hilo terminaría y el panel mostraría el batch como terminado sin error
+            self.error = f"{type(e_run).__name__}: {e_run}"
+        finally:
+            self._data = None
+            self.finished_at = time.time()
+
+    def _run_rows(self, results_file, pool):
+        in_flight = {}
+        interval = 1.0 / self.rate_limit if self.rate_limit > 0 else 0.0
+        next_send_at = time.monotonic()
+        rows = enumerate(iter_batch_rows(self._data, self.file_name), start=1)
+
+        for row_number, row in rows:
+            while len(in_flight) >= self.concurrency:
+                self._collect(results_file, in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+            if interval:
+                delay = next_send_at - time.monotonic()
+                if delay > 0 and self._cancel_event.wait(delay):
+                    break
+                next_send_at = max(next_send_at, time.monotonic()) + interval
+            if self._cancel_event.is_set():
+                break
+            in_flight[pool.submit(self._send, row)] = (row_number, row)
+
+        while in_flight:
+            self._collect(results_file, in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+
+    def _collect(self, results_file, in_flight, done):
+        for future in done:
+            row_number, row = in_flight.pop(future)
+            try:
+                result = future.result()
+            except RequestBuildError as e:
+                result = CallResult(status_code=STATUS_REQUEST_ERROR, error=f"Fila no enviada: {e}")
+            except Exception as e_row: # Renovar un token, convertir una celda, enviar: el fallo de una fila no detiene el batch
+                result = CallResult(status_code=STATUS_REQUEST_ERROR, error=f"Fila no enviada: {type(e_row).__name__}: {e_row}")
+            self._record(results_file, row_number, row, result)
@@ -0,0 +1,94 @@
+"""
+Mide el formulario del body JSON con un esquema profundo (objetos anidados por
+'$ref' en varios niveles): compilar el FormTree, armar el body y dibujar el
+formulario (por defecto y con todos los campos incluidos) con el árbol en caché
+vs. compilándolo en cada rerun. Requiere streamlit (usa streamlit.testing.v1.AppTest).
+
+    python benchmarks/bench_form_tree.py [niveles] [hijos_por_nivel]
+"""
+import os
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+from ref_index import RefIndex
+from form_tree import FIELD_OBJECT, FIELD_OBJECT_ARRAY, FORM_TREES, build_body, compile_form_tree
+
+ENDPOINT_ID = "bench_body"
+
+
+def make_spec(levels, children):
+    # LevelN tiene escalares y 'children' propiedades que apuntan a LevelN+1
+    schemas = {}
+    for level in range(levels + 1):
+        properties = {
+            "id": {"type": "integer", "default": level},
+            "name": {"type": "string", "default": f"nivel {level}"},
+            "status": {"type": "string", "enum": ["active", "inactive"], "default": "active"},
+            "score": {"type": "number", "default": 1.5},
+        }
+        if level < levels:
+            properties.update({f"child{c}": {"$ref": f"#/components/schemas/Level{level + 1}"} for c in range(children)})
+        schemas[f"Level{level}"] = {"type": "object", "properties": properties}
+    return {"openapi": "3.0.3", "info": {"title": "Deep", "version": "1"}, "paths": {}, "components": {"schemas": schemas}}
+
+
+def all_included(tree):
+    return {field.path: True for field in tree.fields}
+
+
+def render_script():
+    import streamlit as st
+    from ui_components.form_generator import render_form_tree
+    render_form_tree(st.session_state["bench_schema"], "bench_body", st.session_state["bench_ref_index"])
+
+
+def time_reruns(schema, ref_index, includes, reruns=3):
+    at = AppTest.from_function(render_script, default_timeout=600)
+    at.session_state["bench_schema"] = schema
+    at.session_state["bench_ref_index"] = ref_index
+    at.session_state["form_field_values"] = {}
+    at.session_state["form_field_includes"] = {ENDPOINT_ID: dict(includes)}
+    at.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), at.session_state["form_field_values"][ENDPOINT_ID]
+
+
+def main():
+    levels = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    children = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    spec = make_spec(levels, children)
+    ref_index = RefIndex(spec)
+    schema = spec["components"]["schemas"]["Level0"]
+
+    tree = compile_form_tree(schema, ref_index)
+    objects = sum(1 for f in tree.fields if f.kind in (FIELD_OBJECT, FIELD_OBJECT_ARRAY))
+    print(f"Campos: {len(tree.fields)} ({objects} objetos, {levels} niveles)")
+
+    compile_s = timeit.timeit(lambda: compile_form_tree(schema, ref_index), number=20) / 20
+    print(f"Compilar el FormTree: {compile_s * 1000:8.2f} ms")
+
+    includes = all_included(tree)
+    # Por defecto los objetos opcionales no están incluidos y sus campos no se dibujan;
+    # con todo incluido, el costo lo ponen los widgets de streamlit (uno por campo)
+    for label, form_includes in (("por defecto", {}), ("todo incluido", includes)):
+        FORM_TREES.max_entries = 0 # Compilar en cada rerun
+        uncached_s, values = time_reruns(schema, ref_index, form_includes)
+        FORM_TREES.max_entries = 256
+        cached_s, _ = time_reruns(schema, ref_index, form_includes)
+        print(f"Rerun {label:14s} compilando: {uncached_s * 1000:8.1f} ms   en caché: {cached_s * 1000:8.1f} ms")
+
+    build_s = timeit.timeit(lambda: build_body(tree, values, includes), number=20) / 20
+    print(f"Armar el body:        {build_s * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compara utils.resolve_ref (recorre la ruta en cada llamada) con RefIndex.resolve
+(acceso directo a diccionario) sobre una especificación con miles de componentes.
+
+    python benchmarks/bench_ref_index.py [n_schemas]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_spec import make_synthetic_spec
+from ref_index import RefIndex
+from utils import resolve_ref
+
+
+def collect_refs(node, found):
+    if isinstance(node, dict):
+        if isinstance(node.get("$ref"), str):
+            found.append(node["$ref"])
+        for value in node.values():
+            collect_refs(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            collect_refs(value, found)
+    return found
+
+
+def main():
+    n_schemas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    spec = make_synthetic_spec(n_schemas=n_schemas)
+    refs = collect_refs(spec, [])
+    print(f"Componentes: {n_schemas}, '$ref' en la especificación: {len(refs)}")
+
+    build_s = timeit.timeit(lambda: RefIndex(spec), number=5) / 5
+    index = RefIndex(spec)
+    print(f"Construcción del índice: {build_s * 1000:.1f} ms ({len(index)} refs distintas)")
+
+    rounds = 20
+    walk_s = timeit.timeit(lambda: [resolve_ref(spec, r) for r in refs], number=rounds) / rounds
+    index_s = timeit.timeit(lambda: [index.resolve(r) for r in refs], number=rounds) / rounds
+    print(f"resolve_ref:      {walk_s * 1e9 / len(refs):7.0f} ns/ref")
+    print(f"RefIndex.resolve: {index_s * 1e9 / len(refs):7.0f} ns/ref  ({walk_s / index_s:.1f}x)")
+
+    assert all(index.resolve(r) is resolve_ref(spec, r) for r in refs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Mide el tiempo de una recarga (rerun) de app.py con un tag de muchos endpoints,
+construyendo todos los formularios vs. solo el del endpoint abierto.
+Requiere streamlit (usa streamlit.testing.v1.AppTest).
+
+    python benchmarks/bench_render_rerun.py [endpoints_por_tag]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.testing.v1 import AppTest
+from synthetic_spec import make_synthetic_spec
+from spec_cache import group_endpoints
+from ref_index import RefIndex
+from render_plan import compile_operation_plans
+
+
+def build_app(spec, lazy_rendering, active_tag):
+    grouped, tag_descriptions = group_endpoints(spec)
+    ref_index = RefIndex(spec)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+    at.session_state["current_api_url"] = "http://localhost"
+    at.session_state["openapi_spec"] = spec
+    at.session_state["grouped_endpoints"] = grouped
+    at.session_state["tag_descriptions"] = tag_descriptions
+    at.session_state["ref_index"] = ref_index
+    at.session_state["operation_plans"] = compile_operation_plans(spec, grouped, ref_index)
+    at.session_state["active_tab_name"] = active_tag
+    at.session_state["active_expander_id"] = grouped[active_tag][0]["id"]
+    at.session_state["lazy_endpoint_rendering"] = lazy_rendering
+    return at
+
+
+def time_reruns(at, reruns=3):
+    at.run()
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(at.text_input) + len(at.button) + len(at.checkbox)
+
+
+def main():
+    endpoints_per_tag = int(sys.argv[1]) if len(sys.argv) > 1 else 75
+    spec = make_synthetic_spec(n_tags=2, endpoints_per_tag=endpoints_per_tag, n_schemas=500, nested_refs=False)
+    n_operations = endpoints_per_tag * 2
+    print(f"Tag activo con {n_operations} operaciones")
+    for label, lazy_rendering in (("Todos los formularios", False), ("Solo el endpoint abierto", True)):
+        best, widgets = time_reruns(build_app(spec, lazy_rendering, "tag0"))
+        print(f"{label:26s} rerun: {best * 1000:8.1f} ms  widgets: {widgets}")
+
+
+if __name__ == "__main__":
+    main()
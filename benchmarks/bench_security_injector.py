@@ -0,0 +1,64 @@
+"""
+Mide la construcción de requests (build_request) de las operaciones de una
+especificación sintética: resolviendo la seguridad en cada request (como antes)
+vs. con el SecurityInjector compilado y en caché por operación y credenciales.
+
+    python benchmarks/bench_security_injector.py [repeticiones]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_spec import make_synthetic_spec
+from spec_cache import compile_spec
+from request_builder import RequestInputs, SecurityInjectorCache, build_request, compile_security_injector
+
+API_BASE_URL = "http://localhost:8000"
+
+
+def make_spec():
+    spec = make_synthetic_spec(n_tags=4, endpoints_per_tag=50, n_schemas=200, nested_refs=False)
+    spec["components"]["securitySchemes"].update({
+        "oauth": {"type": "oauth2", "flows": {"clientCredentials": {"tokenUrl": "/oauth/token", "scopes": {"read": ""}}}},
+        "apiKeyAuth": {"type": "apiKey", "in": "query", "name": "api_key"},
+    })
+    # Varias alternativas por operación: la que tiene credencial activa es la última
+    for path_item in spec["paths"].values():
+        for operation in path_item.values():
+            if operation.get("security"):
+                operation["security"] = [{"oauth": ["read"]}, {"apiKeyAuth": []}, {"bearerAuth": []}]
+    return spec
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    compiled = compile_spec(make_spec())
+    plans = [plan for plan in compiled.operation_plans.values() if plan.security]
+    credentials = {"bearerAuth": {"type": "http", "value": "token", "in": None, "name": None, "scheme": "bearer", "expires_at": None}}
+    inputs = [RequestInputs(path_params={"item_id": "7"}, body={"name": "x"} if plan.body else None) for plan in plans]
+    print(f"Operaciones protegidas: {len(plans)}")
+
+    uncached, cached = SecurityInjectorCache(max_entries=0), SecurityInjectorCache()
+    resolve_s = timeit.timeit(lambda: [compile_security_injector(plan, credentials) for plan in plans], number=repeat) / repeat
+    lookup_s = timeit.timeit(lambda: [cached.injector(plan, credentials) for plan in plans], number=repeat) / repeat
+    print(f"Resolver la seguridad:           {resolve_s * 1e9 / len(plans):6.0f} ns/request")
+    print(f"Injector en caché:               {lookup_s * 1e9 / len(plans):6.0f} ns/request  ({resolve_s / lookup_s:.1f}x)")
+
+    def build_all(injectors, describe=True):
+        return [build_request(plan, API_BASE_URL, plan_inputs, credentials, injectors=injectors, describe=describe)
+                for plan, plan_inputs in zip(plans, inputs)]
+    # Panel (describe=True: avisos con URL, headers y body) y filas de un batch o la CLI (describe=False)
+    for label, describe in (("panel", True), ("batch", False)):
+        build_uncached_s = timeit.timeit(lambda: build_all(uncached, describe), number=repeat) / repeat
+        build_cached_s = timeit.timeit(lambda: build_all(cached, describe), number=repeat) / repeat
+        print(f"build_request ({label}) sin caché: {build_uncached_s * 1e6 / len(plans):6.1f} µs/request")
+        print(f"build_request ({label}) con caché: {build_cached_s * 1e6 / len(plans):6.1f} µs/request  ({build_uncached_s / build_cached_s:.2f}x)")
+    print(f"Caché: {cached.hits} aciertos, {cached.misses} compilaciones")
+
+    assert [p.kwargs for p in build_all(uncached)] == [p.kwargs for p in build_all(cached, describe=False)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compara la carga actual (documento completo + json.loads) con parse_spec_stream
+sobre una especificación sintética grande: RSS pico del proceso y tiempo hasta
+tener los endpoints agrupados y los planes compilados (primer render).
+Cada modo corre en un subproceso aparte para medir su RSS pico.
+
+    python benchmarks/bench_spec_stream.py [n_schemas]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CHUNK_BYTES = 256 * 1024
+
+
+def load_full(path):
+    with open(path, "rb") as f:
+        content = f.read()
+    return json.loads(content.decode("utf-8"))
+
+
+def load_stream(path):
+    from spec_stream import parse_spec_stream
+    with open(path, "rb") as f:
+        return parse_spec_stream(iter(lambda: f.read(CHUNK_BYTES), b""))
+
+
+def run_mode(mode, path):
+    from spec_cache import group_endpoints
+    from ref_index import RefIndex
+    from render_plan import compile_operation_plans
+
+    start = time.perf_counter()
+    if mode != "idle":
+        spec = load_full(path) if mode == "full" else load_stream(path)
+        grouped, _ = group_endpoints(spec)
+        ref_index = RefIndex(spec)
+        compile_operation_plans(spec, grouped, ref_index)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_kb": peak_kb}))
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], sys.argv[3])
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from synthetic_spec import make_synthetic_spec
+
+    n_schemas = int(sys.argv[1]) if len(sys.argv) > 1 else 60000
+    spec = make_synthetic_spec(n_tags=20, endpoints_per_tag=50, n_schemas=n_schemas)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(spec, f, indent=1)
+        path = f.name
+    del spec
+    try:
+        print(f"Especificación: {os.path.getsize(path) / 1e6:.1f} MB, {n_schemas} esquemas")
+        results = {}
+        for mode in ("idle", "full", "stream"):
+            out = subprocess.run([sys.executable, __file__, "--mode", mode, path], capture_output=True, text=True, check=True)
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+        idle_mb = results["idle"]["peak_kb"] / 1024
+        for mode, label in (("full", "json.loads completo"), ("stream", "parse_spec_stream")):
+            r = results[mode]
+            print(f"{label:20s} primer render: {r['seconds']:6.2f} s   RSS pico: {r['peak_kb'] / 1024 - idle_mb:7.1f} MB (sobre {idle_mb:.0f} MB base)")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
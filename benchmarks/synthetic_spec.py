@@ -0,0 +1,73 @@
+import random
+
+
+def make_synthetic_spec(n_tags=10, endpoints_per_tag=50, n_schemas=2000, seed=1, nested_refs=True):
+    """
+    Genera una especificación OpenAPI sintética con muchos componentes. Con
+    nested_refs=True los esquemas se referencian entre sí ('parent'/'children').
+    """
+    rng = random.Random(seed)
+    schemas = {}
+    for i in range(n_schemas):
+        properties = {
+            "id": {"type": "integer"},
+            "name": {"type": "string", "description": f"Nombre {i}"},
+            "status": {"type": "string", "enum": ["active", "inactive", "pending"]},
+            "labels": {"type": "array", "items": {"type": "string"}},
+        }
+        if nested_refs and i > 0:
+            properties["parent"] = {"$ref": f"#/components/schemas/Schema{rng.randrange(i)}"}
+            properties["children"] = {"type": "array", "items": {"$ref": f"#/components/schemas/Schema{rng.randrange(i)}"}}
+        schemas[f"Schema{i}"] = {"type": "object", "required": ["name"], "properties": properties}
+    schemas["Node"] = {
+        "type": "object",
+        "properties": {"value": {"type": "string"}, "next": {"$ref": "#/components/schemas/Node"}},
+    }
+
+    paths = {}
+    for t in range(n_tags):
+        for e in range(endpoints_per_tag):
+            path = f"/tag{t}/resource{e}/{{item_id}}"
+            paths[path] = {
+                "get": {
+                    "tags": [f"tag{t}"],
+                    "operationId": f"get_tag{t}_resource{e}",
+                    "summary": f"Obtener recurso {e} del tag {t}",
+                    "parameters": [
+                        {"name": "item_id", "in": "path", "required": True, "schema": {"type": "integer"}},
+                        {"$ref": "#/components/parameters/Limit"},
+                    ],
+                    "security": [{"bearerAuth": []}],
+                },
+                "post": {
+                    "tags": [f"tag{t}"],
+                    "operationId": f"create_tag{t}_resource{e}",
+                    "summary": f"Crear recurso {e}",
+                    "parameters": [{"name": "item_id", "in": "path", "required": True, "schema": {"type": "integer"}}],
+                    "requestBody": {"content": {"application/json": {
+                        "schema": {"$ref": f"#/components/schemas/Schema{rng.randrange(n_schemas)}"}
+                    }}},
+                    "security": [{"bearerAuth": []}],
+                },
+            }
+    paths["/auth/login"] = {"post": {
+        "tags": ["auth"],
+        "operationId": "login",
+        "requestBody": {"content": {"application/x-www-form-urlencoded": {"schema": {
+            "type": "object",
+            "properties": {"username": {"type": "string"}, "password": {"type": "string"}},
+            "required": ["username", "password"],
+        }}}},
+    }}
+
+    return {
+        "openapi": "3.0.3",
+        "info": {"title": "Synthetic API", "version": "1.0.0"},
+        "tags": [{"name": f"tag{t}", "description": f"Tag sintético {t}"} for t in range(n_tags)],
+        "paths": paths,
+        "components": {
+            "schemas": schemas,
+            "parameters": {"Limit": {"name": "limit", "in": "query", "schema": {"type": "integer"}}},
+            "securitySchemes": {"bearerAuth": {"type": "http", "scheme": "bearer"}},
+        },
+    }
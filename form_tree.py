@@ -0,0 +1,277 @@
+import json
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+from app_config import FORM_MAX_DEPTH, FORM_TREE_CACHE_SIZE
+
+# Tipos de campo del formulario de un body JSON
+FIELD_VALUE = "valor"                 # Escalar: text_input, number_input, toggle o selectbox
+FIELD_OBJECT = "objeto"               # Objeto: sus propiedades son los campos siguientes (hasta 'end')
+FIELD_JSON_ARRAY = "array_json"       # Array de escalares: se edita como texto JSON
+FIELD_OBJECT_ARRAY = "array_objetos"  # Array de objetos: cada item se dibuja con la plantilla 'items'
+FIELD_JSON = "json"                   # Objeto recursivo o más profundo que FORM_MAX_DEPTH: texto JSON
+FIELD_BROKEN_REF = "ref_rota"         # '$ref' que no se pudo resolver
+
+# Clave con la que se guarda el valor de un body que no es un objeto (array o escalar en la raíz)
+ROOT_KEY = "__raiz__"
+
+
+@dataclass(frozen=True)
+class FormField:
+    """
+    Campo del formulario ya derivado del esquema. path es relativo a la plantilla
+    (dentro de un array de objetos, relativo al item); value_key y key_prefix son
+    las partes fijas de las claves de sus widgets.
+    """
+    kind: str
+    key: str            # Propiedad en el objeto padre (ROOT_KEY en la raíz)
+    label: str
+    path: tuple
+    parent: int         # Índice del FIELD_OBJECT padre en la plantilla (-1: raíz)
+    end: int            # Índice siguiente al último descendiente: saltar el subárbol es ir a 'end'
+    depth: int
+    value_key: str      # '__'.join(path)
+    key_prefix: str     # '_'.join(path)
+    has_include: bool   # Tiene el checkbox "Incluir"
+    required: bool = False
+    default_include: bool = True
+    schema_type: Optional[str] = None
+    description: str = ""
+    default: Any = None # Valor inicial (en los campos JSON, el texto)
+    enum: tuple = ()
+    items: Optional["FormTree"] = None
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class FormTree:
+    """Campos de un body (o del item de un array de objetos) en orden de dibujo, sin recursión."""
+    fields: tuple
+    root_value: bool = False # El body no es un objeto: un único campo guardado en ROOT_KEY
+
+
+def _is_object(schema):
+    return schema.get("type") == "object" or (schema.get("type") is None and "properties" in schema)
+
+
+def _raw(value):
+    # Los valores de un default o example se copian tal cual del esquema, sin la vista
+    return getattr(value, "raw", value)
+
+
+def _json_text(value, fallback):
+    try:
+        return json.dumps(_raw(value) if value is not None else fallback, indent=2)
+    except TypeError:
+        return json.dumps(fallback)
+
+
+def _scalar_default(schema):
+    default = schema.get("default", schema.get("example"))
+    if default is not None:
+        return _raw(default)
+    if schema.get("type") in ("integer", "number"):
+        return 0
+    if schema.get("type") == "boolean":
+        return False
+    return ""
+
+
+def _ref_of(raw_schema):
+    return raw_schema.get("$ref") if isinstance(raw_schema, dict) else None
+
+
+class _TreeCompiler:
+    """
+    Recorre el esquema a través de la vista de ref_index.deref: cada '$ref' se
+    resuelve al leerlo. ancestors guarda los nodos (raw) del camino actual para
+    cortar los esquemas que se contienen a sí mismos.
+    """
+
+    def __init__(self, ref_index, max_depth):
+        self.ref_index = ref_index
+        self.max_depth = max_depth
+
+    def tree(self, raw_schema, depth=0) -> FormTree:
+        fields = []
+        schema = self.ref_index.deref(raw_schema)
+        if isinstance(schema, Mapping) and _is_object(schema):
+            self._properties(fields, schema, (), -1, frozenset({id(schema.raw)}), depth)
+            return FormTree(tuple(fields))
+        self._field(fields, ROOT_KEY, schema, _ref_of(raw_schema), (), -1, frozenset(), depth, required=False, has_include=False)
+        return FormTree(tuple(fields), root_value=True)
+
+    def _properties(self, fields, schema, base_path, parent, ancestors, depth):
+        required = set(schema.get("required") or ())
+        properties = schema.get("properties") or {}
+        for prop_name in properties:
+            self._field(fields, prop_name, properties[prop_name], _ref_of(_raw(properties)[prop_name]), base_path + (prop_name,), parent, ancestors, depth,
+                        required=prop_name in required, has_include=True)
+
+    def _field(self, fields, key, schema, ref, path, parent, ancestors, depth, required, has_include):
+        index = len(fields)
+        label = key if key != ROOT_KEY else "valor_raiz"
+        common = dict(
+            key=key, label=label, path=path, parent=parent, end=index + 1, depth=depth,
+            value_key="__".join(map(str, path)), key_prefix="_".join(map(str, path)),
+            has_include=has_include, required=required,
+        )
+        if not isinstance(schema, Mapping):
+            fields.append(FormField(FIELD_BROKEN_REF, **common, error=f"Error de referencia: {ref} para la propiedad '{key}' no pudo ser resuelta."))
+            return
+
+        schema_type = schema.get("type")
+        has_default_or_example = schema.get("default") is not None or schema.get("example") is not None
+        common.update(
+            label="ArrayRaiz" if key == ROOT_KEY and schema_type == "array" else label,
+            schema_type=schema_type, description=schema.get("description", ""),
+            default_include=required or (has_default_or_example and schema_type not in ("object", "array")),
+        )
+
+        if _is_object(schema):
+            if id(schema.raw) in ancestors or depth >= self.max_depth:
+                # Un esquema que se contiene a sí mismo no se puede desplegar: se edita como JSON
+                fields.append(FormField(FIELD_JSON, **common, default=_json_text(schema.get("default", schema.get("example")), {})))
+                return
+            fields.append(FormField(FIELD_OBJECT, **common))
+            self._properties(fields, schema, path, index, ancestors | {id(schema.raw)}, depth + 1)
+            fields[index] = replace(fields[index], end=len(fields))
+            return
+
+        if schema_type == "array":
+            items_schema = schema.get("items")
+            if isinstance(items_schema, Mapping) and _is_object(items_schema) and id(items_schema.raw) not in ancestors and depth < self.max_depth:
+                items_tree = FormTree(tuple(self._item_fields(items_schema, ancestors | {id(items_schema.raw)}, depth + 1)))
+                fields.append(FormField(FIELD_OBJECT_ARRAY, **common, items=items_tree))
+                return
+            fields.append(FormField(FIELD_JSON_ARRAY, **common, default=_json_text(schema.get("default", schema.get("example")), [])))
+            return
+
+        fields.append(FormField(FIELD_VALUE, **common, default=_scalar_default(schema), enum=tuple(_raw(schema.get("enum")) or ())))
+
+    def _item_fields(self, items_schema, ancestors, depth):
+        item_fields = []
+        self._properties(item_fields, items_schema, (), -1, ancestors, depth)
+        return item_fields
+
+
+def compile_form_tree(schema:dict, ref_index, max_depth=FORM_MAX_DEPTH) -> FormTree:
+    """
+    Compila el esquema de un body JSON en la lista plana de campos que dibuja el
+    formulario. Los '$ref' se resuelven una sola vez; un esquema que se referencia
+    a sí mismo (o que supera max_depth niveles) queda como un campo JSON.
+    """
+    return _TreeCompiler(ref_index, max_depth).tree(schema)
+
+
+class FormTreeCache:
+    """
+    FormTree de cada (esquema, especificación), compilado la primera vez que se
+    dibuja o se envía el formulario. max_entries=0 compila en cada llamada.
+    """
+
+    def __init__(self, max_entries=FORM_TREE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, schema:dict, ref_index) -> FormTree:
+        # El esquema y el índice se identifican por identidad (la entrada los conserva, así que sus id no se reutilizan)
+        key = (id(schema), id(ref_index))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is schema and entry[1] is ref_index:
+            return entry[2]
+        tree = compile_form_tree(schema, ref_index)
+        if self.max_entries <= 0:
+            return tree
+        with self._lock:
+            while self._entries and len(self._entries) >= self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (schema, ref_index, tree)
+        return tree
+
+
+FORM_TREES = FormTreeCache()
+
+
+def shift_includes(includes:dict, array_path:tuple, removed_index:int) -> None:
+    """Tras eliminar un item de un array de objetos, corre los 'Incluir' de los items siguientes."""
+    depth = len(array_path)
+    moved = {}
+    for path in [path for path in includes if len(path) > depth and path[:depth] == array_path and isinstance(path[depth], int)]:
+        index = path[depth]
+        value = includes.pop(path) if index >= removed_index else None
+        if index > removed_index:
+            moved[path[:depth] + (index - 1,) + path[depth + 1:]] = value
+    includes.update(moved)
+
+
+def _json_value(text, fallback):
+    if isinstance(text, str):
+        try:
+            return json.loads(text) if text.strip() else fallback
+        except json.JSONDecodeError:
+            return fallback
+    return text if text is not None else fallback
+
+
+def build_body(tree:FormTree, values:dict, includes:dict, base_path:tuple=()):
+    """
+    Arma el body JSON a partir de los valores del formulario, en una pasada por
+    los campos: solo entran los incluidos que tienen valor y los objetos que
+    quedan vacíos se omiten. Devuelve None si no queda nada.
+    """
+    if not isinstance(values, dict):
+        return None
+    if tree.root_value:
+        built = {}
+        _build_field(tree.fields[0], values, built, includes, base_path)
+        return built.get(ROOT_KEY)
+
+    fields = tree.fields
+    result = {}
+    outputs, sources = [None] * len(fields), [None] * len(fields)
+    i = 0
+    while i < len(fields):
+        field = fields[i]
+        parent_values = values if field.parent < 0 else sources[field.parent]
+        parent_output = result if field.parent < 0 else outputs[field.parent]
+        if (field.has_include and not includes.get(base_path + field.path)) or field.key not in parent_values:
+            i = field.end
+            continue
+        if field.kind == FIELD_OBJECT:
+            if isinstance(parent_values[field.key], dict):
+                sources[i], outputs[i] = parent_values[field.key], {}
+                parent_output[field.key] = outputs[i]
+                i += 1
+            else:
+                i = field.end
+            continue
+        _build_field(field, parent_values, parent_output, includes, base_path)
+        i = field.end
+
+    # Los objetos sin ninguna propiedad incluida no se envían (de los más internos hacia afuera)
+    for i in range(len(fields) - 1, -1, -1):
+        if outputs[i] == {}:
+            field = fields[i]
+            (result if field.parent < 0 else outputs[field.parent]).pop(field.key, None)
+    return result or None
+
+
+def _build_field(field, parent_values, parent_output, includes, base_path):
+    value = parent_values.get(field.key)
+    if field.kind == FIELD_VALUE:
+        if not (field.schema_type in ("integer", "number") and value == "") and value is not None:
+            parent_output[field.key] = value
+    elif field.kind == FIELD_JSON_ARRAY:
+        built = _json_value(value, [])
+        parent_output[field.key] = built if isinstance(built, list) else []
+    elif field.kind == FIELD_JSON:
+        built = _json_value(value, None)
+        if built is not None:
+            parent_output[field.key] = built
+    elif field.kind == FIELD_OBJECT_ARRAY and isinstance(value, list):
+        item_path = base_path + field.path
+        built_items = (build_body(field.items, item, includes, item_path + (idx,)) for idx, item in enumerate(value))
+        parent_output[field.key] = [item for item in built_items if item is not None]
@@ -0,0 +1,334 @@
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from app_config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_KEEP_ALIVE, HTTP_POOL_IDLE_SECONDS
+
+_last_connection = threading.local()
+
+
+def last_connection_reused():
+    """Si la última solicitud enviada desde este hilo usó una conexión ya abierta (None si no pasó por el pool)."""
+    return getattr(_last_connection, "reused", None)
+
+
+class RequestTiming:
+    """
+    Marcas de tiempo (time.perf_counter) de un request enviado desde el hilo actual,
+    completadas por las conexiones del pool: resolución DNS, conexión TCP, TLS, envío,
+    primer byte de la respuesta y fin de la descarga. Con conexión reutilizada no
+    hay DNS/TCP/TLS.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.dns_start = None
+        self.dns_end = None
+        self.connect_end = None
+        self.connected_at = None
+        self.tls = False
+        self.send_start = None
+        self.send_end = None
+        self.first_byte_at = None
+        self.finished_at = None
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def phases(self):
+        """[(fase, inicio ms, fin ms)] relativos al inicio, en orden."""
+        def ms(mark):
+            return (mark - self.started_at) * 1000
+
+        phases = []
+        network_start = self.dns_start if self.dns_start is not None else self.send_start
+        if network_start is not None:
+            phases.append(("Preparación", 0.0, ms(network_start)))
+        if self.dns_start is not None and self.dns_end is not None:
+            phases.append(("DNS", ms(self.dns_start), ms(self.dns_end)))
+            if self.connect_end is not None:
+                phases.append(("Conexión TCP", ms(self.dns_end), ms(self.connect_end)))
+                if self.tls and self.connected_at is not None:
+                    phases.append(("TLS", ms(self.connect_end), ms(self.connected_at)))
+        if self.send_start is not None and self.send_end is not None:
+            # Con HTTP la conexión se abre dentro del envío: el envío cuenta desde que quedó conectada
+            send_start = max(self.send_start, self.connected_at or self.send_start)
+            phases.append(("Envío", ms(send_start), ms(self.send_end)))
+            if self.first_byte_at is not None:
+                phases.append(("Espera (TTFB)", ms(self.send_end), ms(self.first_byte_at)))
+                if self.finished_at is not None:
+                    phases.append(("Descarga", ms(self.first_byte_at), ms(self.finished_at)))
+        return phases
+
+    def as_dict(self, connection_reused=None):
+        end = self.finished_at or time.perf_counter()
+        return {
+            "phases": self.phases(),
+            "total_ms": (end - self.started_at) * 1000,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "connection_reused": connection_reused,
+        }
+
+
+def start_request_timing():
+    """Empieza a medir el próximo request de este hilo; devuelve el RequestTiming que completarán las conexiones."""
+    _last_connection.reused = None
+    _last_connection.timing = RequestTiming()
+    return _last_connection.timing
+
+
+def stop_request_timing():
+    _last_connection.timing = None
+
+
+def _current_timing():
+    return getattr(_last_connection, "timing", None)
+
+
+_system_getaddrinfo = socket.getaddrinfo
+
+
+def _timed_getaddrinfo(*args, **kwargs):
+    # Solo mide las resoluciones que hace una conexión del pool mientras abre su socket
+    # (ver _TimedConnectionMixin._new_conn); el resto pasa sin cambios
+    timing = getattr(_last_connection, "resolving", None)
+    if timing is None:
+        return _system_getaddrinfo(*args, **kwargs)
+    timing.dns_start = time.perf_counter()
+    try:
+        return _system_getaddrinfo(*args, **kwargs)
+    finally:
+        timing.dns_end = time.perf_counter()
+
+
+socket.getaddrinfo = _timed_getaddrinfo
+
+
+class _TimedConnectionMixin:
+    # Anota en el RequestTiming del hilo (si hay uno) cada etapa de la conexión y del request
+
+    def _new_conn(self):
+        timing = _current_timing()
+        if timing is None:
+            return super()._new_conn()
+        # urllib3 resuelve y conecta en create_connection: la resolución la mide _timed_getaddrinfo
+        _last_connection.resolving = timing
+        try:
+            return super()._new_conn()
+        finally:
+            _last_connection.resolving = None
+            timing.connect_end = time.perf_counter()
+
+    def connect(self):
+        super().connect()
+        timing = _current_timing()
+        if timing is not None:
+            timing.connected_at = time.perf_counter()
+
+    def send(self, data):
+        timing = _current_timing()
+        if timing is not None and isinstance(data, (bytes, bytearray, memoryview)):
+            timing.request_bytes += len(data)
+        super().send(data)
+
+    def request(self, *args, **kwargs):
+        timing = _current_timing()
+        if timing is not None:
+            timing.send_start = time.perf_counter()
+        super().request(*args, **kwargs)
+        if timing is not None:
+            timing.send_end = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        timing = _current_timing()
+        if timing is not None:
+            timing.first_byte_at = time.perf_counter()
+        return response
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        timing = _current_timing()
+        if timing is not None:
+            timing.tls = True
+        super().connect()
+
+
+class _TrackingPoolMixin:
+    # Cuenta cuántas solicitudes salieron por una conexión keep-alive ya abierta
+    # (con lock: muchos hilos del executor comparten el mismo pool)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_reused = 0
+        self._reused_lock = threading.Lock()
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout=timeout)
+        reused = getattr(conn, "sock", None) is not None
+        if reused:
+            with self._reused_lock:
+                self.num_reused += 1
+        _last_connection.reused = reused
+        return conn
+
+
+class _TrackingHTTPConnectionPool(_TrackingPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TrackingHTTPSConnectionPool(_TrackingPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TrackingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TrackingHTTPConnectionPool,
+            "https": _TrackingHTTPSConnectionPool,
+        }
+
+    def connection_stats(self):
+        stats = {"connections": 0, "requests": 0, "reused": 0}
+        pools = self.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+            stats["reused"] += getattr(pool, "num_reused", 0)
+        return stats
+
+
+def build_session(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                  max_retries=0, keep_alive=HTTP_KEEP_ALIVE):
+    # Por defecto el adapter no reintenta: los reintentos (con backoff, Retry-After y
+    # circuito por host) los hace resilience.py, que los cuenta y los muestra
+    session = requests.Session()
+    # Las sesiones se comparten entre usuarios: no se guardan cookies (igual que requests.request)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=False, # Un timeout de lectura no se reintenta (multiplicaría la espera) y llega como Timeout
+        status=max_retries,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS, # Solo métodos idempotentes
+        raise_on_status=False,
+    )
+    adapter = _TrackingAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+class PooledSession:
+    def __init__(self, base_url, session):
+        self.base_url = base_url
+        self.session = session
+        self.holders = set()
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+
+    def stats(self):
+        stats = {"connections": 0, "requests": 0, "reused": 0}
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            if isinstance(adapter, _TrackingAdapter):
+                for key, value in adapter.connection_stats().items():
+                    stats[key] += value
+        stats["holders"] = len(self.holders)
+        return stats
+
+
+class SessionPool:
+    """
+    Un requests.Session (con pool de conexiones keep-alive y reintentos) por URL
+    base, compartido por todas las sesiones de Streamlit del proceso. Cada sesión
+    de Streamlit se registra como 'holder' de la URL que usa; al cambiar de URL se
+    libera la anterior y, cuando una URL se queda sin holders (o pasa
+    HTTP_POOL_IDLE_SECONDS sin uso), su Session se cierra.
+    """
+
+    def __init__(self, session_factory=build_session, idle_seconds=HTTP_POOL_IDLE_SECONDS):
+        self.session_factory = session_factory
+        self.idle_seconds = idle_seconds
+        self._sessions = {}
+        self._holder_urls = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(base_url):
+        return base_url.rstrip('/')
+
+    def _close_locked(self, key):
+        pooled = self._sessions.pop(key, None)
+        if pooled is not None:
+            pooled.session.close()
+            for holder in pooled.holders:
+                self._holder_urls.pop(holder, None)
+
+    def _release_locked(self, holder):
+        key = self._holder_urls.pop(holder, None)
+        pooled = self._sessions.get(key)
+        if pooled is not None:
+            pooled.holders.discard(holder)
+            if not pooled.holders:
+                self._close_locked(key)
+
+    def _reap_idle_locked(self, now):
+        for key, pooled in list(self._sessions.items()):
+            if now - pooled.last_used > self.idle_seconds:
+                self._close_locked(key)
+
+    def acquire(self, base_url, holder):
+        """Devuelve la Session de la URL base para 'holder', liberando la URL que usaba antes."""
+        key = self.make_key(base_url)
+        now = time.monotonic()
+        with self._lock:
+            if self._holder_urls.get(holder) != key:
+                self._release_locked(holder)
+            self._reap_idle_locked(now)
+            pooled = self._sessions.get(key)
+            if pooled is None:
+                pooled = PooledSession(key, self.session_factory())
+                self._sessions[key] = pooled
+            pooled.holders.add(holder)
+            pooled.last_used = now
+            self._holder_urls[holder] = key
+            return pooled.session
+
+    def holder_key(self, holder):
+        with self._lock:
+            return self._holder_urls.get(holder)
+
+    def release(self, holder):
+        with self._lock:
+            self._release_locked(holder)
+
+    def stats(self, base_url):
+        with self._lock:
+            pooled = self._sessions.get(self.make_key(base_url))
+            return pooled.stats() if pooled is not None else None
+
+    def close_all(self):
+        with self._lock:
+            for key in list(self._sessions):
+                self._close_locked(key)
+
+
+HTTP_POOL = SessionPool()
@@ -0,0 +1,285 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+import requests
+from background_calls import RESPONSE_READ_CHUNK_BYTES
+from http_pool import build_session
+
+MODE_COUNT = "count"   # N requests con concurrencia C
+MODE_RATE = "rate"     # RPS objetivo durante un tiempo
+WORKERS_THREADS = "threads"
+WORKERS_PROCESSES = "processes"
+
+HISTOGRAM_BINS = 20
+PROCESS_CHUNK_REQUESTS = 200 # Requests por tarea enviada a un proceso en modo MODE_COUNT
+STATUS_NO_RESPONSE = 0       # Timeout o error de conexión: no hubo respuesta HTTP
+
+
+@dataclass(frozen=True)
+class LoadTestConfig:
+    mode: str = MODE_COUNT
+    total_requests: int = 100
+    concurrency: int = 10
+    target_rps: float = 10.0
+    duration_seconds: float = 10.0
+    workers: str = WORKERS_THREADS
+
+    @property
+    def planned_requests(self):
+        if self.mode == MODE_RATE:
+            return max(1, int(self.target_rps * self.duration_seconds))
+        return max(1, int(self.total_requests))
+
+    def processes(self):
+        return max(1, min(self.concurrency, os.cpu_count() or 1))
+
+
+def _send_one(session, prepared):
+    """Envía el request y devuelve la muestra (latencia ms, status, bytes recibidos, bytes enviados, error)."""
+    started_at = time.perf_counter()
+    received = 0
+    try:
+        # El body se lee por bloques y se descarta: solo interesa su tamaño
+        with session.request(prepared.method, prepared.url, stream=True, **prepared.kwargs) as response:
+            for chunk in response.iter_content(chunk_size=RESPONSE_READ_CHUNK_BYTES):
+                received += len(chunk)
+    except requests.exceptions.Timeout:
+        return ((time.perf_counter() - started_at) * 1000, STATUS_NO_RESPONSE, 0, 0, "timeout")
+    except requests.exceptions.RequestException:
+        return ((time.perf_counter() - started_at) * 1000, STATUS_NO_RESPONSE, 0, 0, "conexión")
+    body = response.request.body or b""
+    return ((time.perf_counter() - started_at) * 1000, response.status_code, received, len(body), None)
+
+
+def _load_session(pool_size):
+    # Sin reintentos: un reintento escondería errores y falsearía las latencias
+    return build_session(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+
+
+_process_session = None
+
+def run_process_chunk(prepared, count, threads, send_times=None):
+    """
+    Tarea de un proceso del pool: envía 'count' requests con 'threads' hilos (o uno
+    por cada instante de send_times, en segundos de time.time()) y devuelve las muestras.
+    """
+    global _process_session
+    if _process_session is None:
+        _process_session = _load_session(threads)
+
+    def send_at(send_time):
+        if send_time is not None:
+            delay = send_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return _send_one(_process_session, prepared)
+
+    schedule = send_times if send_times is not None else [None] * count
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(send_at, schedule))
+
+
+class LoadTestRun:
+    """
+    Prueba de carga de un request ya preparado, en un hilo coordinador propio. Con
+    WORKERS_THREADS los requests salen de un pool de hilos; con WORKERS_PROCESSES se
+    reparten en tareas entre procesos (cada uno con sus hilos y su Session) para
+    que el GIL no limite al cliente. Las muestras se agregan a medida que llegan.
+    """
+
+    def __init__(self, prepared, config:LoadTestConfig):
+        self.prepared = prepared
+        self.config = config
+        self.latencies_ms = array("d")
+        self.status_counts = Counter()
+        self.error_counts = Counter()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="load-test", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def completed(self):
+        return len(self.latencies_ms)
+
+    @property
+    def elapsed_seconds(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def progress(self):
+        return min(1.0, self.completed / self.config.planned_requests)
+
+    def cancel(self):
+        # No se envían más requests; los que están en vuelo (o la tarea en curso de cada proceso) terminan
+        self._cancel_event.set()
+
+    def _add_samples(self, samples):
+        with self._lock:
+            for latency_ms, status_code, received, sent, error in samples:
+                self.latencies_ms.append(latency_ms)
+                self.status_counts[status_code] += 1
+                self.bytes_received += received
+                self.bytes_sent += sent
+                if error:
+                    self.error_counts[error] += 1
+
+    def _run(self):
+        self.started_at = time.time()
+        try:
+            if self.config.workers == WORKERS_PROCESSES:
+                self._run_processes()
+            else:
+                self._run_threads()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+    def _send_times(self):
+        # Instantes (time.time()) en los que debe salir cada request en MODE_RATE
+        start_at = time.time() + 0.05
+        interval = 1.0 / self.config.target_rps
+        return [start_at + i * interval for i in range(self.config.planned_requests)]
+
+    def _collect(self, in_flight, done):
+        for future in done:
+            in_flight.discard(future)
+            if not future.cancelled():
+                result = future.result()
+                self._add_samples(result if isinstance(result, list) else [result])
+
+    def _run_threads(self):
+        config = self.config
+        session = _load_session(config.concurrency)
+        in_flight = set()
+        try:
+            with ThreadPoolExecutor(max_workers=config.concurrency, thread_name_prefix="load-test") as pool:
+                send_times = self._send_times() if config.mode == MODE_RATE else [None] * config.planned_requests
+                for send_time in send_times:
+                    while len(in_flight) >= config.concurrency:
+                        self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+                    if send_time is not None:
+                        delay = send_time - time.time()
+                        if delay > 0 and self._cancel_event.wait(delay):
+                            break
+                    if self._cancel_event.is_set():
+                        break
+                    in_flight.add(pool.submit(_send_one, session, self.prepared))
+                while in_flight:
+                    self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+        finally:
+            session.close()
+
+    def _process_tasks(self, processes):
+        config = self.config
+        if config.mode == MODE_RATE:
+            # Ventanas de un segundo repartidas entre los procesos
+            send_times = self._send_times()
+            window = max(1, int(math.ceil(config.target_rps)))
+            for start in range(0, len(send_times), window):
+                window_times = send_times[start:start + window]
+                for offset in range(processes):
+                    share = window_times[offset::processes]
+                    if share:
+                        yield (len(share), share)
+        else:
+            remaining = config.planned_requests
+            while remaining > 0:
+                count = min(PROCESS_CHUNK_REQUESTS, remaining)
+                remaining -= count
+                yield (count, None)
+
+    def _run_processes(self):
+        processes = self.config.processes()
+        threads = max(1, math.ceil(self.config.concurrency / processes))
+        # 'spawn': crear procesos con fork desde un proceso con hilos (Streamlit) no es seguro
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            in_flight = {pool.submit(run_process_chunk, self.prepared, count, threads, send_times)
+                         for count, send_times in self._process_tasks(processes)}
+            while in_flight:
+                if self._cancel_event.is_set():
+                    for future in in_flight:
+                        future.cancel()
+                done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                self._collect(in_flight, done)
+
+    def report(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            status_counts = dict(self.status_counts)
+            error_counts = dict(self.error_counts)
+            bytes_received, bytes_sent = self.bytes_received, self.bytes_sent
+        return build_report(self.prepared, self.config, latencies, status_counts, error_counts,
+                            bytes_received, bytes_sent, self.elapsed_seconds)
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre valores ya ordenados."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_histogram(sorted_values, bins=HISTOGRAM_BINS):
+    if not sorted_values:
+        return []
+    low, high = sorted_values[0], sorted_values[-1]
+    width = (high - low) / bins or 1.0
+    counts = [0] * bins
+    for value in sorted_values:
+        counts[min(bins - 1, int((value - low) / width))] += 1
+    return [{"from_ms": round(low + i * width, 2), "to_ms": round(low + (i + 1) * width, 2), "count": count}
+            for i, count in enumerate(counts)]
+
+
+def build_report(prepared, config, sorted_latencies, status_counts, error_counts, bytes_received, bytes_sent, duration_seconds):
+    """Informe exportable (JSON) de una prueba de carga."""
+    requests_done = len(sorted_latencies)
+    ok = sum(count for status, count in status_counts.items() if 200 <= status < 400)
+    return {
+        "request": {"method": prepared.method, "url": prepared.url},
+        "config": asdict(config),
+        "requests": requests_done,
+        "planned_requests": config.planned_requests,
+        "ok": ok,
+        "failed": requests_done - ok,
+        "duration_seconds": round(duration_seconds, 3),
+        "throughput_rps": round(requests_done / duration_seconds, 2) if duration_seconds > 0 else None,
+        "latency_ms": {
+            "min": sorted_latencies[0] if sorted_latencies else None,
+            "mean": sum(sorted_latencies) / requests_done if requests_done else None,
+            "p50": percentile(sorted_latencies, 0.50),
+            "p90": percentile(sorted_latencies, 0.90),
+            "p99": percentile(sorted_latencies, 0.99),
+            "max": sorted_latencies[-1] if sorted_latencies else None,
+        },
+        "histogram": latency_histogram(sorted_latencies),
+        "status_codes": {str(status): count for status, count in sorted(status_counts.items())},
+        "errors": error_counts,
+        "bytes_received": bytes_received,
+        "bytes_sent": bytes_sent,
+    }
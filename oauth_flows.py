@@ -0,0 +1,241 @@
+import base64
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from urllib.parse import quote, urljoin
+from app_config import REQUEST_TIMEOUT_SECONDS
+from background_calls import PreparedRequest
+from http_pool import build_session
+from resilience import RESILIENCE
+from token_manager import TokenGrant, TokenManager, refresh_token_of, token_expiry
+
+# Flujos OAuth2 que se pueden ejecutar sin navegador (los demás necesitan redirigir al usuario)
+OAUTH_FLOWS = ("clientCredentials", "password")
+OAUTH_GRANT_TYPES = {"clientCredentials": "client_credentials", "password": "password"}
+
+
+class OAuthError(Exception):
+    """El tokenUrl no entregó un token (credenciales del cliente inválidas, scope no permitido, etc.)."""
+
+
+@dataclass(frozen=True)
+class OAuthClient:
+    """Cliente con el que se ejecuta un flujo OAuth2 de un esquema (y el usuario, en el flujo password)."""
+    flow: str
+    client_id: str
+    client_secret: str = field(default="", repr=False)
+    username: str = ""
+    password: str = field(default="", repr=False)
+
+    @property
+    def identity(self):
+        return f"{self.client_id}:{self.username}" if self.flow == "password" else self.client_id
+
+
+def runnable_flows(scheme_details:dict) -> list:
+    """Flujos de un esquema oauth2 que se pueden ejecutar desde la interfaz, en el orden de OAUTH_FLOWS."""
+    flows = scheme_details.get("flows") or {}
+    return [flow for flow in OAUTH_FLOWS if isinstance(flows.get(flow), dict) and flows[flow].get("tokenUrl")]
+
+
+def flow_scopes(scheme_details:dict, flow:str) -> dict:
+    return dict(((scheme_details.get("flows") or {}).get(flow) or {}).get("scopes") or {})
+
+
+def operation_scopes(plan, scheme_name:str) -> tuple:
+    """Scopes que pide la operación para el esquema (del primer requisito de seguridad que lo nombra)."""
+    for requirement in plan.security:
+        if scheme_name in requirement:
+            return tuple(sorted(set(requirement[scheme_name] or ())))
+    return ()
+
+
+def _absolute_url(url, api_base_url):
+    # Las URLs relativas de los flujos se resuelven contra la URL del servidor (OpenAPI 3, "Flow Object")
+    return urljoin(api_base_url.rstrip("/") + "/", url) if api_base_url else url
+
+
+def token_request(token_url:str, client:OAuthClient, grant_type:str, scopes=(), refresh_token=None, timeout=REQUEST_TIMEOUT_SECONDS) -> PreparedRequest:
+    """
+    Request al tokenUrl (RFC 6749, 4.3/4.4/6). Un cliente con secreto se autentica
+    con HTTP Basic; uno público envía solo su client_id en el body.
+    """
+    form = {"grant_type": grant_type}
+    if grant_type == "password":
+        form.update(username=client.username, password=client.password)
+    elif grant_type == "refresh_token":
+        form["refresh_token"] = refresh_token
+    if scopes:
+        form["scope"] = " ".join(scopes)
+    headers = {"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"}
+    if client.client_secret:
+        basic = f"{quote(client.client_id, safe='')}:{quote(client.client_secret, safe='')}"
+        headers["Authorization"] = "Basic " + base64.b64encode(basic.encode()).decode()
+    else:
+        form["client_id"] = client.client_id
+    return PreparedRequest("POST", token_url, {"data": form, "headers": headers, "timeout": timeout})
+
+
+@dataclass
+class OAuthScheme:
+    scheme_details: dict
+    client: OAuthClient
+    token_url: str
+    refresh_url: str
+
+
+class OAuthTokens:
+    """
+    Tokens de los flujos clientCredentials y password, en caché por (esquema,
+    cliente, scopes) hasta que vencen. Cada operación recibe el token de los scopes
+    que declara: se reutiliza el de esos mismos scopes o el de un conjunto mayor y,
+    si no hay ninguno, se pide uno al tokenUrl (una sola vez aunque lo pidan varios
+    hilos). La renovación la hace el TokenManager: con el refresh token contra el
+    refreshUrl (o el tokenUrl) y, si no hay o falla, repitiendo el flujo.
+    """
+
+    def __init__(self, session=None, tokens:TokenManager=None, timeout=REQUEST_TIMEOUT_SECONDS):
+        self.session = session
+        self.tokens = tokens if tokens is not None else TokenManager()
+        self.timeout = timeout
+        self._schemes = {}
+        self._fetching = {} # clave -> Future del primer pedido de ese token
+        self._lock = threading.Lock()
+
+    def _session(self):
+        if self.session is None:
+            self.session = build_session()
+        return self.session
+
+    def configure(self, scheme_name:str, scheme_details:dict, client:OAuthClient, api_base_url:str=None) -> None:
+        flow_details = (scheme_details.get("flows") or {}).get(client.flow) or {}
+        if client.flow not in OAUTH_FLOWS or not flow_details.get("tokenUrl"):
+            raise OAuthError(f"El esquema '{scheme_name}' no declara un flujo {client.flow} con tokenUrl.")
+        token_url = _absolute_url(flow_details["tokenUrl"], api_base_url)
+        refresh_url = _absolute_url(flow_details["refreshUrl"], api_base_url) if flow_details.get("refreshUrl") else token_url
+        self.remove(scheme_name)
+        with self._lock:
+            self._schemes[scheme_name] = OAuthScheme(scheme_details, client, token_url, refresh_url)
+
+    def remove(self, scheme_name:str=None) -> None:
+        """Olvida el cliente de un esquema (o de todos) y sus tokens en caché."""
+        with self._lock:
+            names = [scheme_name] if scheme_name is not None else list(self._schemes)
+            for name in names:
+                self._schemes.pop(name, None)
+        for key in self.tokens.status():
+            if key.split("|", 1)[0] in names:
+                self.tokens.forget(key)
+
+    def configured(self, scheme_name:str) -> bool:
+        return scheme_name in self._schemes
+
+    def fork(self):
+        """Mismos clientes y tokens en caché, sin timers (p. ej. para un workflow)."""
+        forked = OAuthTokens(self.session, self.tokens.fork(), self.timeout)
+        with self._lock:
+            forked._schemes = dict(self._schemes)
+        return forked
+
+    @staticmethod
+    def _key(scheme_name, client, scopes):
+        return f"{scheme_name}|{client.identity}|{' '.join(scopes)}"
+
+    @staticmethod
+    def _key_scopes(key):
+        return set(key.rsplit("|", 1)[1].split())
+
+    def _request_grant(self, key, prepared):
+        result = RESILIENCE.send(self._session(), prepared)
+        data = result.response_data if isinstance(result.response_data, dict) else {}
+        if not result.ok or not data.get("access_token"):
+            detail = data.get("error_description") or data.get("error") or result.error or result.raw_text[:200]
+            raise OAuthError(f"{prepared.url} respondió {result.status_code}: {detail}")
+        token = str(data["access_token"])
+        credential = {
+            "type": "oauth2", "value": token, "in": None, "name": None, "scheme": None,
+            "expires_at": token_expiry(data, token),
+        }
+        return TokenGrant(key, credential, refresh_token_of(data), {"scope": data.get("scope")} if data.get("scope") else {})
+
+    def _refresher(self, key, oauth_scheme, scopes):
+        client = oauth_scheme.client
+
+        def refresh(refresh_token):
+            if refresh_token:
+                try:
+                    return self._request_grant(key, token_request(oauth_scheme.refresh_url, client, "refresh_token", scopes, refresh_token, self.timeout))
+                except OAuthError:
+                    pass # Refresh token vencido o revocado: se repite el flujo
+            return self._request_grant(key, token_request(oauth_scheme.token_url, client, OAUTH_GRANT_TYPES[client.flow], scopes, timeout=self.timeout))
+        return refresh
+
+    def token(self, scheme_name:str, scopes=()) -> dict:
+        """Credencial del esquema para esos scopes (de la caché o pedida ahora); lanza OAuthError."""
+        oauth_scheme = self._schemes.get(scheme_name)
+        if oauth_scheme is None:
+            raise OAuthError(f"El esquema '{scheme_name}' no tiene un cliente OAuth2 configurado.")
+        scopes = tuple(sorted(set(scopes)))
+        key = self._key(scheme_name, oauth_scheme.client, scopes)
+        prefix = key.rsplit("|", 1)[0] + "|"
+        cached = self.tokens.status()
+        candidates = [key] if key in cached else []
+        # Un token con más scopes que los pedidos también sirve (el de menos scopes primero)
+        candidates += sorted(
+            (k for k in cached if k != key and k.startswith(prefix) and self._key_scopes(k) >= set(scopes)),
+            key=lambda k: len(self._key_scopes(k))
+        )
+        for candidate in candidates:
+            credential = self.tokens.credential(candidate, {})
+            if credential:
+                return credential
+
+        with self._lock:
+            future = self._fetching.get(key)
+            owner = future is None
+            if owner:
+                future = self._fetching[key] = Future()
+        if owner:
+            refresher = self._refresher(key, oauth_scheme, scopes)
+            try:
+                grant = refresher(None)
+                self.tokens.track(grant, refresher)
+                future.set_result(grant)
+            except Exception as e_token: # El pedido envía un request: cualquier fallo se informa a todos los que esperan
+                future.set_exception(e_token if isinstance(e_token, OAuthError) else OAuthError(str(e_token)))
+            finally:
+                with self._lock:
+                    self._fetching.pop(key, None)
+        try:
+            return future.result(timeout=self.timeout * 2).credential
+        except FutureTimeoutError:
+            raise OAuthError(f"{oauth_scheme.token_url} no respondió a tiempo.") from None
+
+    def credentials_for(self, plan, credentials:dict, notices:list=None) -> dict:
+        """
+        Las credenciales con las de los esquemas OAuth2 configurados reemplazadas por
+        el token de los scopes que pide la operación. Si no se pudo obtener, el
+        esquema se quita y el error queda en notices.
+        """
+        if not self._schemes or not plan.security or plan.is_potentially_auth_endpoint:
+            return credentials
+        credentials = dict(credentials)
+        for scheme_name in plan.required_scheme_names:
+            if not self.configured(scheme_name):
+                continue
+            try:
+                credentials[scheme_name] = self.token(scheme_name, operation_scopes(plan, scheme_name))
+            except OAuthError as e_oauth:
+                credentials.pop(scheme_name, None)
+                if notices is not None:
+                    notices.append(("warning", f"No se pudo obtener el token OAuth2 de `{scheme_name}`: {e_oauth}"))
+        return credentials
+
+    def status(self) -> list:
+        """Tokens en caché: [{scheme, client, scopes, expires_at, refreshes, refreshing, error}]."""
+        rows = []
+        for key, token_status in self.tokens.status().items():
+            scheme_name, rest = key.split("|", 1)
+            identity, scopes = rest.rsplit("|", 1)
+            rows.append({"scheme": scheme_name, "client": identity, "scopes": scopes.split(), **token_status})
+        return rows
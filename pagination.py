@@ -0,0 +1,307 @@
+import csv
+import io
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from urllib.parse import parse_qs, urljoin, urlparse
+from app_config import PAGINATION_MAX_PAGES, PAGINATION_MAX_ITEMS
+from background_calls import SpilledResponse
+from resilience import RESILIENCE
+
+# Campos habituales que contienen los items de una página y los datos de la siguiente
+ITEM_FIELDS = ("items", "data", "results", "records", "content", "values", "entries", "rows")
+NEXT_URL_FIELDS = ("next", "links.next", "_links.next.href", "_links.next", "meta.next", "pagination.next", "paging.next")
+NEXT_CURSOR_FIELDS = ("next_cursor", "nextCursor", "next_page_token", "nextPageToken", "next_token", "nextToken",
+                      "meta.next_cursor", "meta.nextCursor", "pagination.next_cursor", "pagination.nextCursor",
+                      "paging.cursors.after", "page_info.end_cursor", "cursor")
+CURSOR_PARAMS = ("cursor", "page_token", "pageToken", "next_token", "nextToken", "after", "starting_after", "continuation")
+OFFSET_PARAMS = ("offset", "skip", "start")
+PAGE_PARAMS = ("page", "page_number", "pageNumber", "pageIndex")
+LIMIT_PARAMS = ("limit", "size", "per_page", "perPage", "page_size", "pageSize", "count", "take")
+
+
+def _field(data, dotted_path):
+    node = data
+    for part in dotted_path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+def page_items(data):
+    """Items de una página: la respuesta si es una lista, o su campo de items."""
+    if isinstance(data, list):
+        return data
+    if not isinstance(data, dict):
+        return []
+    for field_name in ITEM_FIELDS:
+        if isinstance(data.get(field_name), list):
+            return data[field_name]
+    lists = [value for value in data.values() if isinstance(value, list)]
+    return lists[0] if len(lists) == 1 else []
+
+
+def _link_next(headers):
+    # Cabecera 'Link: <url>; rel="next", <url>; rel="last"'
+    link_header = next((v for k, v in headers.items() if k.lower() == "link"), "")
+    for part in link_header.split(","):
+        segments = part.split(";")
+        if any(s.strip().replace('"', "").lower() == "rel=next" for s in segments[1:]):
+            return segments[0].strip().strip("<>")
+    return None
+
+
+def _query_param(plan, candidates):
+    names = {p.name: p for p in plan.params if p.location == "query"}
+    return next((names[name].name for name in candidates if name in names), None)
+
+
+class PaginationStyle(ABC):
+    label = ""
+
+    @abstractmethod
+    def next_request(self, prepared, result, data, items):
+        """PreparedRequest de la página siguiente, o None si esta fue la última."""
+
+
+class LinkPagination(PaginationStyle):
+    label = "cabecera Link (rel=next)"
+
+    def next_url(self, result, data):
+        return _link_next(result.headers)
+
+    def next_request(self, prepared, result, data, items):
+        next_url = self.next_url(result, data)
+        if not isinstance(next_url, str) or not next_url:
+            return None
+        url = urljoin(prepared.url, next_url)
+        # La URL siguiente trae su propia query; se conservan los parámetros que no repite (p. ej. apiKey en query)
+        link_params = parse_qs(urlparse(url).query)
+        params = {k: v for k, v in (prepared.kwargs.get("params") or {}).items() if k not in link_params}
+        return replace(prepared, url=url, kwargs={**prepared.kwargs, "params": params or None}, notices=[])
+
+
+class NextUrlPagination(LinkPagination):
+    def __init__(self, field_path):
+        self.field_path = field_path
+        self.label = f"campo '{field_path}' con la URL siguiente"
+
+    def next_url(self, result, data):
+        return _field(data, self.field_path)
+
+
+class CursorPagination(PaginationStyle):
+    def __init__(self, field_path, param):
+        self.field_path = field_path
+        self.param = param
+        self.label = f"cursor '{field_path}' → parámetro '{param}'"
+
+    def next_request(self, prepared, result, data, items):
+        cursor = _field(data, self.field_path)
+        if cursor in (None, "", False) or not items:
+            return None
+        params = {**(prepared.kwargs.get("params") or {}), self.param: cursor}
+        return replace(prepared, kwargs={**prepared.kwargs, "params": params}, notices=[])
+
+
+class CounterPagination(PaginationStyle):
+    """Parámetro numérico que avanza por páginas (page) o por items (offset)."""
+
+    def __init__(self, param, by_items, limit_param=None):
+        self.param = param
+        self.by_items = by_items
+        self.limit_param = limit_param
+        self.first_page_size = None
+        self.label = f"parámetro '{param}'" + (f" (tamaño '{limit_param}')" if limit_param else "")
+
+    def next_request(self, prepared, result, data, items):
+        if not items:
+            return None
+        params = prepared.kwargs.get("params") or {}
+        if self.first_page_size is None:
+            self.first_page_size = len(items)
+        limit = params.get(self.limit_param) if self.limit_param else None
+        expected_size = int(limit) if str(limit or "").isdigit() else self.first_page_size
+        if len(items) < expected_size:
+            return None # Página incompleta: era la última
+        try:
+            current = int(params.get(self.param) or (0 if self.by_items else 1))
+        except (TypeError, ValueError):
+            return None
+        next_value = current + (len(items) if self.by_items else 1)
+        return replace(prepared, kwargs={**prepared.kwargs, "params": {**params, self.param: next_value}}, notices=[])
+
+
+def detect_pagination(plan, result, data):
+    """Estilo de paginación según la respuesta (cabeceras y campos) y los parámetros de query de la operación."""
+    if _link_next(result.headers):
+        return LinkPagination()
+    if isinstance(data, dict):
+        for field_path in NEXT_URL_FIELDS:
+            value = _field(data, field_path)
+            if isinstance(value, str) and (value.startswith(("http://", "https://", "/")) or value.startswith("?")):
+                return NextUrlPagination(field_path)
+        cursor_param = _query_param(plan, CURSOR_PARAMS)
+        if cursor_param:
+            for field_path in NEXT_CURSOR_FIELDS:
+                if _field(data, field_path) not in (None, ""):
+                    return CursorPagination(field_path, cursor_param)
+    limit_param = _query_param(plan, LIMIT_PARAMS)
+    offset_param = _query_param(plan, OFFSET_PARAMS)
+    if offset_param:
+        return CounterPagination(offset_param, by_items=True, limit_param=limit_param)
+    page_param = _query_param(plan, PAGE_PARAMS)
+    if page_param:
+        return CounterPagination(page_param, by_items=False, limit_param=limit_param)
+    return None
+
+
+class ColumnarBuffer:
+    """
+    Items de todas las páginas guardados por columnas (una lista por campo) en
+    lugar de una lista de dicts. Los items que no son objetos van a la columna 'value'.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.row_count = 0
+        self._lock = threading.Lock()
+
+    def extend(self, items):
+        with self._lock:
+            for item in items:
+                row = item if isinstance(item, dict) else {"value": item}
+                for key in row:
+                    if key not in self.columns:
+                        self.columns[key] = [None] * self.row_count
+                for key, column in self.columns.items():
+                    column.append(row.get(key))
+                self.row_count += 1
+
+    def display_columns(self, limit=None):
+        """Columnas para st.dataframe: objetos y listas anidados como texto JSON."""
+        with self._lock:
+            return {
+                key: [json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list)) else v for v in column[:limit]]
+                for key, column in self.columns.items()
+            }
+
+    def iter_rows(self):
+        with self._lock:
+            keys = list(self.columns)
+            row_count = self.row_count
+        for index in range(row_count):
+            yield {key: self.columns[key][index] for key in keys}
+
+    def to_ndjson(self) -> bytes:
+        return "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in self.iter_rows()).encode("utf-8")
+
+    def to_csv(self) -> bytes:
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(self.columns))
+        writer.writeheader()
+        for row in self.iter_rows():
+            writer.writerow({k: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list)) else v for k, v in row.items()})
+        return output.getvalue().encode("utf-8")
+
+
+class PaginationRun:
+    """
+    Sigue la paginación de una operación desde un hilo propio: mientras se agregan
+    al buffer los items de una página, la siguiente ya se está descargando. Se
+    detiene en la última página, ante un error, al repetirse la página siguiente,
+    al alcanzar max_pages/max_items o al cancelarse.
+    """
+
+    def __init__(self, endpoint_id, plan, prepared, session, max_pages=PAGINATION_MAX_PAGES, max_items=PAGINATION_MAX_ITEMS):
+        self.endpoint_id = endpoint_id
+        self.plan = plan
+        self.prepared = prepared
+        self.max_pages = max_pages
+        self.max_items = max_items
+        self.buffer = ColumnarBuffer()
+        self.style = None
+        self.pages = 0
+        self.stop_reason = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._session = session
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"pagination-{endpoint_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    @property
+    def elapsed_seconds(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _fetch(self, prepared):
+        result = RESILIENCE.send(self._session, prepared, self._cancel_event)
+        data = result.response_data
+        if isinstance(data, SpilledResponse):
+            data_handle, data = data, data.load()
+            data_handle.discard()
+        return prepared, result, data
+
+    def _run(self):
+        seen_requests = set()
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pagination") as prefetcher:
+                future = prefetcher.submit(self._fetch, self.prepared)
+                while future is not None:
+                    prepared, result, data = future.result()
+                    future = None
+                    if self._cancel_event.is_set():
+                        self.stop_reason = "cancelado"
+                        break
+                    if result.error or not result.ok:
+                        self.error = result.error or f"La página {self.pages + 1} respondió {result.status_code}."
+                        break
+                    items = page_items(data)
+                    if self.style is None and self.pages == 0:
+                        self.style = detect_pagination(self.plan, result, data)
+
+                    next_prepared = self.style.next_request(prepared, result, data, items) if self.style else None
+                    if next_prepared is not None:
+                        request_key = (next_prepared.url, json.dumps(next_prepared.kwargs.get("params"), sort_keys=True, default=str))
+                        if request_key in seen_requests:
+                            self.stop_reason = "la página siguiente se repite"
+                            next_prepared = None
+                        seen_requests.add(request_key)
+                    remaining_items = self.max_items - self.buffer.row_count
+                    if next_prepared is not None and self.pages + 1 < self.max_pages and len(items) < remaining_items and not self._cancel_event.is_set():
+                        # Prefetch: la siguiente página se pide antes de procesar esta
+                        future = prefetcher.submit(self._fetch, next_prepared)
+
+                    self.buffer.extend(items[:max(0, remaining_items)])
+                    self.pages += 1
+
+                    if future is None and self.stop_reason is None:
+                        if self._cancel_event.is_set():
+                            self.stop_reason = "cancelado"
+                        elif self.style is None:
+                            self.stop_reason = "no se detectó paginación"
+                        elif next_prepared is None:
+                            self.stop_reason = "última página"
+                        elif self.pages >= self.max_pages:
+                            self.stop_reason = f"límite de {self.max_pages} páginas"
+                        else:
+                            self.stop_reason = f"límite de {self.max_items} items"
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
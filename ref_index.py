@@ -0,0 +1,125 @@
+import weakref
+from collections.abc import Mapping, Sequence
+from utils import resolve_ref
+
+
+class RefIndex:
+    """
+    Índice de referencias '$ref' de una especificación, construido una sola vez
+    al cargarla. Cada cadena '$ref' local se mapea a su nodo destino para que la
+    resolución en los caminos calientes sea un acceso directo a diccionario.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._targets = {}
+        self._views = weakref.WeakValueDictionary() # id(nodo) -> vista, mientras alguien la use
+        self._index_refs(spec)
+
+    def _index_refs(self, root):
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                ref_string = node.get("$ref")
+                if isinstance(ref_string, str) and ref_string.startswith("#/") and ref_string not in self._targets:
+                    self._targets[ref_string] = resolve_ref(self.spec, ref_string)
+                pending.extend(v for v in node.values() if isinstance(v, (dict, list)))
+            elif isinstance(node, list):
+                pending.extend(v for v in node if isinstance(v, (dict, list)))
+
+    def __getstate__(self):
+        # Las vistas se indexan por id() de nodo, que no sobrevive a la serialización
+        return {"spec": self.spec, "_targets": self._targets}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._views = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._targets)
+
+    def __contains__(self, ref_string):
+        return ref_string in self._targets
+
+    def resolve(self, ref_string):
+        try:
+            return self._targets[ref_string]
+        except KeyError:
+            target = resolve_ref(self.spec, ref_string)
+            self._targets[ref_string] = target
+            return target
+
+    def resolve_schema(self, schema_obj):
+        """Sigue la cadena de '$ref' de un nodo hasta un nodo concreto (o None si hay un ciclo de refs puros)."""
+        seen = set()
+        current = schema_obj
+        while isinstance(current, dict) and "$ref" in current:
+            ref_string = current["$ref"]
+            if ref_string in seen:
+                return None
+            seen.add(ref_string)
+            current = self.resolve(ref_string)
+        return current
+
+    def deref(self, schema_obj):
+        """
+        Devuelve una vista de solo lectura del esquema en la que los '$ref' se
+        resuelven de forma perezosa al acceder a cada nodo. Como nada se expande
+        por adelantado, los esquemas recursivos no provocan recursión infinita.
+        """
+        return self._wrap(schema_obj)
+
+    def _wrap(self, node):
+        if isinstance(node, dict):
+            node = self.resolve_schema(node)
+            if node is None:
+                return None
+        if not isinstance(node, (dict, list)):
+            return node
+        view = self._views.get(id(node))
+        if view is None:
+            view = DerefDict(self, node) if isinstance(node, dict) else DerefList(self, node)
+            self._views[id(node)] = view
+        return view
+
+
+class DerefDict(Mapping):
+    __slots__ = ("_index", "_node", "__weakref__")
+
+    def __init__(self, index, node):
+        self._index = index
+        self._node = node
+
+    def __getitem__(self, key):
+        return self._index._wrap(self._node[key])
+
+    def __iter__(self):
+        return iter(self._node)
+
+    def __len__(self):
+        return len(self._node)
+
+    @property
+    def raw(self):
+        return self._node
+
+
+class DerefList(Sequence):
+    __slots__ = ("_index", "_node", "__weakref__")
+
+    def __init__(self, index, node):
+        self._index = index
+        self._node = node
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._index._wrap(item) for item in self._node[position]]
+        return self._index._wrap(self._node[position])
+
+    def __len__(self):
+        return len(self._node)
+
+    @property
+    def raw(self):
+        return self._node
@@ -0,0 +1,271 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Optional
+from app_config import GLOBAL_SUFFIX
+
+AUTH_OPERATION_KEYWORDS = ("auth", "login", "token", "authorize")
+AUTH_TAG_NAMES = ("auth", "authentication", "login")
+
+BODY_METHOD_FIELDS = "Campos Dinámicos"
+BODY_METHOD_RAW = "JSON Crudo"
+
+
+@dataclass(frozen=True)
+class ParamPlan:
+    index: int
+    name: str
+    location: str
+    required: bool
+    type_label: str
+    label: str
+    help: str
+    widget_key: str
+
+
+@dataclass(frozen=True)
+class FormFieldPlan:
+    name: str
+    widget_key: str
+    label: str
+    input_type: str
+    help: str
+    schema_default: Any
+    literal_value: Any
+    disabled: bool
+    required: bool
+
+
+@dataclass(frozen=True)
+class BodyPlan:
+    content_type: Optional[str]
+    schema: Any
+    first_content_type: Optional[str] = None
+    body_method_key: str = ""
+    body_method_options: tuple = ()
+    raw_json_key: str = ""
+    raw_json_default: str = "{}"
+    additional_raw_json_key: str = ""
+    form_fields: tuple = ()
+
+
+@dataclass(frozen=True)
+class OperationPlan:
+    """
+    Todo lo que la UI y el constructor de requests necesitan de una operación,
+    derivado una única vez al cargar la especificación.
+    """
+    id: str
+    tag: str
+    path: str
+    method: str
+    operation_id: str
+    summary: str
+    description: str
+    expander_title: str
+    security: tuple
+    security_declared: bool
+    params: tuple
+    body: Optional[BodyPlan]
+    is_potentially_auth_endpoint: bool
+    offer_authentication: bool
+    execute_button_key: str
+    state_keys: tuple
+
+    @property
+    def has_url_params(self):
+        return any(p.location in ("path", "query") for p in self.params)
+
+    @property
+    def required_scheme_names(self):
+        return sorted({name for requirement in self.security for name in requirement})
+
+
+def _resolve(ref_index, schema_obj):
+    if isinstance(schema_obj, dict) and "$ref" in schema_obj:
+        return ref_index.resolve(schema_obj["$ref"])
+    return schema_obj
+
+
+def _param_type_label(param_schema):
+    if isinstance(param_schema.get('schema'), dict):
+        return param_schema['schema'].get('type', 'desconocido')
+    elif isinstance(param_schema.get('type'), str):
+        return param_schema.get('type', 'desconocido')
+    return "desconocido"
+
+
+def _compile_params(operation, endpoint_id, ref_index):
+    params = []
+    for p_idx, param_schema_ref in enumerate(operation.get("parameters", [])):
+        param_schema = _resolve(ref_index, param_schema_ref)
+        if not param_schema:
+            continue
+        location = param_schema.get('in')
+        req_symbol = "*" if param_schema.get("required") else ""
+        param_base_key = f"{endpoint_id}_p_{p_idx}_{param_schema['name']}{GLOBAL_SUFFIX}"
+        params.append(ParamPlan(
+            index=p_idx,
+            name=param_schema['name'],
+            location=location,
+            required=bool(param_schema.get("required", False)),
+            type_label=_param_type_label(param_schema),
+            label=f"`{param_schema['name']}` ({_param_type_label(param_schema)}){req_symbol}",
+            help=param_schema.get('description', ''),
+            widget_key=f"{param_base_key}_{location}",
+        ))
+    return tuple(params)
+
+
+def _raw_json_default(schema_for_example):
+    if schema_for_example.get("example"):
+        try:
+            return json.dumps(schema_for_example.get("example", {}), indent=2)
+        except TypeError:
+            return "{}"
+    elif schema_for_example:
+        if schema_for_example.get("type") == "object":
+            return "{}"
+        elif schema_for_example.get("type") == "array":
+            return "[]"
+    return "{}"
+
+
+def _grant_type_pattern(prop_details):
+    if "anyOf" in prop_details:
+        for sub_schema in prop_details["anyOf"]:
+            if isinstance(sub_schema, dict) and sub_schema.get("type") == "string" and "pattern" in sub_schema:
+                return sub_schema["pattern"]
+    elif prop_details.get("type") == "string" and "pattern" in prop_details:
+        return prop_details["pattern"]
+    return None
+
+
+def _compile_form_fields(form_schema, endpoint_id):
+    if not form_schema or "properties" not in form_schema:
+        return ()
+    fields = []
+    for prop_name, prop_details in form_schema["properties"].items():
+        default_val = prop_details.get("default")
+        pattern_val = None
+        if prop_name == "grant_type" and default_val is None:
+            pattern_val = _grant_type_pattern(prop_details)
+            if pattern_val and not any(c in pattern_val for c in "()[]{}*+?|^$\\"):
+                default_val = pattern_val
+        fields.append(FormFieldPlan(
+            name=prop_name,
+            widget_key=f"{endpoint_id}_form_{prop_name}{GLOBAL_SUFFIX}",
+            label=prop_details.get("title", prop_name),
+            input_type="password" if "password" in prop_name.lower() else "default",
+            help=prop_details.get("description", ""),
+            schema_default=default_val,
+            literal_value=prop_details.get("pattern", prop_details.get("default")),
+            disabled=(prop_name == "grant_type" and default_val is not None and default_val == pattern_val),
+            required=prop_name in form_schema.get("required", []),
+        ))
+    return tuple(fields)
+
+
+def _compile_body(operation, endpoint_id, ref_index):
+    if "requestBody" not in operation:
+        return None
+    content_spec = operation["requestBody"].get("content", {})
+
+    if "application/json" in content_spec:
+        raw_schema = content_spec["application/json"].get("schema", {})
+        schema_ref = raw_schema.get("$ref")
+        body_schema = ref_index.resolve(schema_ref) if schema_ref else content_spec["application/json"].get("schema")
+        options = (BODY_METHOD_FIELDS, BODY_METHOD_RAW) if body_schema else (BODY_METHOD_RAW,)
+        return BodyPlan(
+            content_type="application/json",
+            schema=body_schema,
+            body_method_key=f"{endpoint_id}_body_method{GLOBAL_SUFFIX}",
+            body_method_options=options,
+            raw_json_key=f"{endpoint_id}_main_raw_json_body{GLOBAL_SUFFIX}",
+            raw_json_default=_raw_json_default(body_schema if body_schema else raw_schema),
+            additional_raw_json_key=f"{endpoint_id}_additional_raw_json_body{GLOBAL_SUFFIX}",
+        )
+
+    if "application/x-www-form-urlencoded" in content_spec:
+        raw_schema = content_spec["application/x-www-form-urlencoded"].get("schema", {})
+        form_schema = ref_index.resolve(raw_schema["$ref"]) if raw_schema.get("$ref") else raw_schema
+        return BodyPlan(
+            content_type="application/x-www-form-urlencoded",
+            schema=form_schema,
+            form_fields=_compile_form_fields(form_schema, endpoint_id),
+        )
+
+    return BodyPlan(content_type=None, schema=None, first_content_type=next(iter(content_spec), None))
+
+
+def _is_potentially_auth_endpoint(operation):
+    if operation.get("security"):
+        return False
+    op_id_lower = operation.get("operationId", "").lower()
+    tags_lower = [t.lower() for t in operation.get("tags", [])]
+    return any(keyword in op_id_lower for keyword in AUTH_OPERATION_KEYWORDS) or \
+        any(tag in tags_lower for tag in AUTH_TAG_NAMES)
+
+
+def _expander_title(method, path, operation):
+    expander_title = f"**{method.upper()}** `{path}`"
+    if operation.get('summary'):
+        expander_title += f"  —  {operation.get('summary')}"
+    if operation.get("security") is not None:
+        expander_title += " " + ("🔒" if operation.get("security") else "🔓 (Público)")
+    return expander_title
+
+
+def _state_keys(params, body):
+    # Claves de widgets cuyo valor solo vive en st.session_state (no en form_field_values)
+    keys = [p.widget_key for p in params]
+    if body is not None:
+        keys.extend(k for k in (body.body_method_key, body.raw_json_key, body.additional_raw_json_key) if k)
+        keys.extend(f.widget_key for f in body.form_fields)
+    return tuple(keys)
+
+
+def compile_operation_plan(tag_name, endpoint_info, ref_index, has_security_schemes):
+    path = endpoint_info["path"]
+    method = endpoint_info["method"]
+    operation = endpoint_info["operation"]
+    endpoint_id = endpoint_info["id"]
+    is_auth = _is_potentially_auth_endpoint(operation)
+    params = _compile_params(operation, endpoint_id, ref_index)
+    body = _compile_body(operation, endpoint_id, ref_index)
+
+    return OperationPlan(
+        id=endpoint_id,
+        tag=tag_name,
+        path=path,
+        method=method,
+        operation_id=operation.get("operationId", ""),
+        summary=operation.get("summary", ""),
+        description=operation.get("description", ""),
+        expander_title=_expander_title(method, path, operation),
+        security=tuple(operation.get("security") or ()),
+        security_declared=operation.get("security") is not None,
+        params=params,
+        body=body,
+        is_potentially_auth_endpoint=is_auth,
+        offer_authentication=is_auth and has_security_schemes,
+        execute_button_key=f"{endpoint_id}_execute_button{GLOBAL_SUFFIX}",
+        state_keys=_state_keys(params, body),
+    )
+
+
+def compile_operation_plans(spec, grouped_endpoints, ref_index, reusable_plans=None):
+    """
+    Compila el plan de cada operación y devuelve el registro id -> OperationPlan.
+    Los planes presentes en reusable_plans (operaciones sin cambios) se reutilizan.
+    """
+    has_security_schemes = bool("components" in spec and "securitySchemes" in spec["components"])
+    reusable_plans = reusable_plans or {}
+    plans = {}
+    for tag_name, endpoints in grouped_endpoints.items():
+        for endpoint_info in endpoints:
+            endpoint_id = endpoint_info["id"]
+            plan = reusable_plans.get(endpoint_id)
+            if plan is None:
+                plan = compile_operation_plan(tag_name, endpoint_info, ref_index, has_security_schemes)
+            plans[endpoint_id] = plan
+    return plans
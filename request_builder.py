@@ -0,0 +1,277 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+from typing import Any, Optional
+from app_config import REQUEST_TIMEOUT_SECONDS, SECURITY_INJECTOR_CACHE_SIZE
+from background_calls import PreparedRequest
+from utils import set_nested_value
+
+BOOLEAN_TRUE_VALUES = ("true", "1", "yes", "si", "sí")
+
+
+class RequestBuildError(ValueError):
+    """Faltan datos para construir el request (p. ej. un parámetro de path requerido)."""
+
+
+@dataclass
+class RequestInputs:
+    """Valores con los que se construye el request de una operación (formulario o fila de un batch)."""
+    path_params: dict = field(default_factory=dict)
+    query_params: dict = field(default_factory=dict)
+    body: Any = None        # Body JSON ya construido (None si no se envía)
+    form_data: dict = field(default_factory=dict) # Campos x-www-form-urlencoded que se envían
+    notices: list = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class SecurityInjector:
+    """
+    Autorización de una operación ya resuelta para unas credenciales: los headers
+    y query params que se agregan al request (no modificar) y sus avisos.
+    """
+    headers: dict = field(default_factory=dict)
+    query_params: dict = field(default_factory=dict)
+    notices: tuple = ()
+
+
+NO_SECURITY = SecurityInjector()
+
+
+def compile_security_injector(plan, credentials) -> SecurityInjector:
+    """Resuelve qué credencial activa satisface la seguridad de la operación (la primera que aplica)."""
+    if plan.is_potentially_auth_endpoint or not plan.security or not credentials:
+        return NO_SECURITY
+
+    for sec_req_option in plan.security:
+        for scheme_name in sec_req_option:
+            creds = credentials.get(scheme_name)
+            if not creds or not creds.get("value"):
+                continue
+            headers, query_params = {}, {}
+            if creds.get("type") == "apiKey" and creds.get("name"):
+                if creds.get("in") == "header":
+                    headers[creds["name"]] = creds["value"]
+                elif creds.get("in") == "query":
+                    query_params[creds["name"]] = creds["value"]
+            elif (creds.get("type") == "http" and creds.get("scheme") == "bearer") or creds.get("type") == "oauth2":
+                headers["Authorization"] = f"Bearer {creds['value']}"
+            if headers or query_params:
+                return SecurityInjector(headers, query_params, (("caption", f"Aplicando autorización con esquema: `{scheme_name}`."),))
+
+    return SecurityInjector(notices=(("warning", f"Endpoint protegido, pero no se encontraron credenciales activas para los esquemas requeridos: {', '.join(plan.required_scheme_names)}"),))
+
+
+def _credentials_fingerprint(credentials):
+    # El resto de los campos de una credencial sale del esquema, que es fijo para los planes de una especificación
+    return tuple((scheme_name, creds.get("value")) for scheme_name, creds in credentials.items() if creds)
+
+
+class SecurityInjectorCache:
+    """
+    SecurityInjector de cada operación, compilado una vez por plan y credenciales:
+    mientras no cambien (ni la especificación, que trae planes nuevos) cada request
+    solo copia sus headers y query params. Guarda hasta max_entries (se descartan
+    las usadas hace más tiempo; 0 desactiva la caché).
+    """
+
+    def __init__(self, max_entries=SECURITY_INJECTOR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def injector(self, plan, credentials) -> SecurityInjector:
+        if plan.is_potentially_auth_endpoint or not plan.security or not credentials:
+            return NO_SECURITY
+        if not self.max_entries:
+            return compile_security_injector(plan, credentials)
+        # El plan se identifica por identidad (la entrada lo conserva, así que su id no se reutiliza)
+        key = (id(plan), _credentials_fingerprint(credentials))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is plan:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        injector = compile_security_injector(plan, credentials)
+        with self._lock:
+            self._entries[key] = (plan, injector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return injector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+SECURITY_INJECTORS = SecurityInjectorCache()
+
+
+def build_request(plan, api_base_url:str, inputs:RequestInputs, credentials:dict, timeout=REQUEST_TIMEOUT_SECONDS,
+                  injectors:SecurityInjectorCache=SECURITY_INJECTORS, describe:bool=True) -> PreparedRequest:
+    """
+    Construye el PreparedRequest de una operación: sustituye los parámetros de path,
+    arma query, headers, autorización (con el SecurityInjector compilado de la
+    operación) y body. No usa st.*: sirve igual para el formulario del panel y para
+    las filas de un batch (desde cualquier hilo). Con describe=False no se agregan
+    los avisos que describen el request (URL, headers, body), que nadie muestra en
+    un batch o en la CLI.
+    """
+    notices = list(inputs.notices)
+
+    path = plan.path
+    query_params = {}
+    for param in plan.params:
+        if param.location == 'path':
+            value = inputs.path_params.get(param.name, "")
+            if (value is None or value == "") and param.required:
+                raise RequestBuildError(f"Parámetro de path requerido '{param.name}' está vacío.")
+            path = path.replace(f"{{{param.name}}}", str(value if value is not None else ""))
+        elif param.location == 'query':
+            value = inputs.query_params.get(param.name, "")
+            if value or (param.required and value == ""):
+                query_params[param.name] = value
+
+    url = f"{api_base_url.rstrip('/')}{path}"
+    request_kwargs = {
+        "params": {k: v for k, v in query_params.items() if v is not None} or None,
+        "timeout": timeout,
+    }
+    headers = {"Accept": "application/json"}
+
+    injector = injectors.injector(plan, credentials)
+    headers.update(injector.headers)
+    notices.extend(injector.notices)
+    if injector.query_params:
+        request_kwargs["params"] = {**(request_kwargs.get("params") or {}), **injector.query_params}
+
+    body = plan.body
+    content_type = None
+    if body is not None:
+        if body.content_type == "application/json":
+            content_type = "application/json"
+            if inputs.body is not None:
+                request_kwargs["json"] = inputs.body
+        elif body.content_type == "application/x-www-form-urlencoded":
+            content_type = "application/x-www-form-urlencoded"
+            if inputs.form_data:
+                request_kwargs["data"] = dict(inputs.form_data)
+            elif body.schema and body.schema.get("required"):
+                notices.append(("warning", "El cuerpo del request x-www-form-urlencoded tiene campos requeridos pero parece estar vacío o no se pudieron construir los datos."))
+
+    if content_type:
+        headers["Content-Type"] = content_type
+    request_kwargs["headers"] = headers
+
+    if request_kwargs.get("json") is None and request_kwargs.get("data") is None and \
+       plan.method.upper() in ["POST", "PUT", "PATCH"] and body is not None:
+        notices.append(("warning", "El cuerpo del request (body) está vacío. Se enviará la solicitud igualmente."))
+
+    if not describe:
+        return PreparedRequest(plan.method.upper(), url, request_kwargs, notices)
+    notices.append(("info", f"Ejecutando: {plan.method.upper()} {url}"))
+    if request_kwargs.get("params"): notices.append(("caption", f"Query Params: {request_kwargs['params']}"))
+    notices.append(("caption", f"Headers: {json.dumps(headers, indent=2)}"))
+    if request_kwargs.get("json"): notices.append(("caption", f"JSON Body: {json.dumps(request_kwargs['json'])}"))
+    if request_kwargs.get("data"): notices.append(("caption", f"Form Data: {request_kwargs['data']}"))
+
+    return PreparedRequest(plan.method.upper(), url, request_kwargs, notices)
+
+
+def _property_schema(schema, path_parts, ref_index):
+    # La vista de ref_index.deref resuelve los '$ref' (y corta sus ciclos) a medida que se baja
+    node = ref_index.deref(schema) if ref_index is not None else schema
+    for part in path_parts:
+        if not isinstance(node, Mapping):
+            return None
+        if node.get("type") == "array":
+            node = node.get("items")
+            if not isinstance(node, Mapping):
+                return None
+        node = (node.get("properties") or {}).get(part)
+    if not isinstance(node, Mapping):
+        return None
+    return getattr(node, "raw", node)
+
+
+def coerce_cell(value, schema:Optional[dict]):
+    """Convierte el texto de una celda (CSV) al tipo que declara el esquema; si no se puede, lo deja como texto."""
+    if not isinstance(value, str) or not schema:
+        return value
+    schema_type = schema.get("type")
+    try:
+        if schema_type == "integer":
+            return int(value)
+        if schema_type == "number":
+            return float(value)
+        if schema_type == "boolean":
+            return value.strip().lower() in BOOLEAN_TRUE_VALUES
+        if schema_type in ("array", "object"):
+            return json.loads(value)
+    except ValueError:
+        pass
+    return value
+
+
+def row_column_targets(plan, columns):
+    """
+    Indica a qué parte del request va cada columna de un batch: 'path'/'query' si
+    coincide con el nombre de un parámetro, 'body'/'form' si es un campo del body
+    (en JSON se admiten rutas con puntos, p. ej. 'address.city') y None si se ignora.
+    """
+    params = {p.name: p.location for p in plan.params if p.location in ("path", "query")}
+    body = plan.body
+    form_names = {f.name for f in body.form_fields} if body is not None else set()
+    json_properties = None
+    if body is not None and body.content_type == "application/json" and isinstance(body.schema, dict):
+        json_properties = body.schema.get("properties")
+
+    targets = {}
+    for column in columns:
+        if column in params:
+            targets[column] = params[column]
+        elif body is not None and body.content_type == "application/x-www-form-urlencoded":
+            targets[column] = "form" if column in form_names else None
+        elif body is not None and body.content_type == "application/json":
+            # Sin propiedades declaradas (body libre) cualquier columna se acepta como campo
+            top_level = column.split(".", 1)[0]
+            targets[column] = "body" if not json_properties or top_level in json_properties else None
+        else:
+            targets[column] = None
+    return targets
+
+
+def apply_row(plan, inputs:RequestInputs, row:dict, targets:dict, ref_index=None) -> RequestInputs:
+    """
+    Devuelve los valores del formulario con los de una fila del batch encima. Las
+    celdas vacías conservan el valor del formulario.
+    """
+    path_params = dict(inputs.path_params)
+    query_params = dict(inputs.query_params)
+    form_data = dict(inputs.form_data)
+    body = copy.deepcopy(inputs.body)
+
+    for column, value in row.items():
+        target = targets.get(column)
+        if target is None or value is None or value == "":
+            continue
+        if target == "path":
+            path_params[column] = value
+        elif target == "query":
+            query_params[column] = value
+        elif target == "form":
+            form_data[column] = value
+        elif target == "body":
+            path_parts = column.split(".")
+            if not isinstance(body, dict):
+                body = {}
+            set_nested_value(body, path_parts, coerce_cell(value, _property_schema(plan.body.schema, path_parts, ref_index)))
+
+    return replace(inputs, path_params=path_params, query_params=query_params, body=body, form_data=form_data, notices=[])
@@ -0,0 +1,424 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from app_config import REQUEST_TIMEOUT_SECONDS
+from background_calls import CallResult, SpilledResponse, STATUS_REQUEST_ERROR
+from batch_runner import BatchFileError, iter_batch_rows
+from http_pool import build_session
+from load_test import percentile
+from request_builder import RequestBuildError, RequestInputs, apply_row, build_request, row_column_targets
+from resilience import RESILIENCE
+from oauth_flows import OAuthClient, OAuthError, OAuthTokens
+from token_manager import REFRESH_TOKEN_KEYS, TokenGrant, TokenManager, TokenRefreshError, jwt_expiry, refresh_token_of, token_expiry
+from spec_bundle import SpecDocumentError, bundle_content_hash, bundle_spec
+from spec_cache import compile_spec
+from spec_store import SPEC_STORE, content_hash_of, parse_spec_bytes
+
+# Claves en las que un endpoint de login suele devolver el token
+TOKEN_RESPONSE_KEYS = ("access_token", "accessToken", "token")
+
+
+class UnknownOperationError(LookupError):
+    """La operación pedida no existe en la especificación."""
+
+
+def scheme_credentials(scheme_details:dict, value:str, expires_at:float=None) -> dict:
+    """
+    Credencial activa (formato de active_security_credentials) de un esquema de
+    securitySchemes. Sin expires_at, el vencimiento es el 'exp' del token si es un JWT.
+    """
+    return {
+        "type": scheme_details.get("type"),
+        "value": value,
+        "in": scheme_details.get("in"), # Para apiKey y http (aunque http no lo usa para 'in')
+        "name": scheme_details.get("name"), # Para apiKey
+        "scheme": scheme_details.get("scheme"), # Para http (ej. 'bearer')
+        "expires_at": expires_at if expires_at is not None else jwt_expiry(value), # Epoch, o None si no se sabe
+    }
+
+
+def credentials_from_login_response(security_schemes:dict, response_data):
+    """
+    Busca en la respuesta de un endpoint de login el token de alguno de los esquemas
+    de seguridad. Devuelve (nombre del esquema, credencial, datos del usuario sin el
+    token) o None si no encontró ninguno.
+    """
+    if not isinstance(response_data, dict):
+        return None
+    for scheme_name, scheme_details in security_schemes.items():
+        token = None
+        if scheme_details.get("type") == "apiKey":
+            key_name = scheme_details.get("name")
+            if key_name and key_name in response_data:
+                token = response_data[key_name]
+        elif scheme_details.get("type") == "http" and scheme_details.get("scheme") == "bearer":
+            for token_key in TOKEN_RESPONSE_KEYS + (scheme_name.lower(),):
+                if token_key in response_data:
+                    token = response_data[token_key]
+                    break
+        elif scheme_details.get("type") == "oauth2":
+            token = response_data.get("access_token")
+
+        if token:
+            excluded_keys = list(TOKEN_RESPONSE_KEYS + REFRESH_TOKEN_KEYS)
+            if scheme_details.get("type") == "apiKey" and scheme_details.get("name"):
+                excluded_keys.append(scheme_details.get("name"))
+            user_info = {k: v for k, v in response_data.items() if k not in excluded_keys}
+            return scheme_name, scheme_credentials(scheme_details, str(token), token_expiry(response_data, token)), user_info
+    return None
+
+
+def grant_from_login_response(security_schemes:dict, response_data):
+    """Como credentials_from_login_response, pero como TokenGrant (con el refresh token si lo trae), o None."""
+    found = credentials_from_login_response(security_schemes, response_data)
+    if found is None:
+        return None
+    scheme_name, credential, user_info = found
+    return TokenGrant(scheme_name, credential, refresh_token_of(response_data), user_info)
+
+
+def load_compiled_spec(source:str, spec_url:str=None, store=SPEC_STORE):
+    """
+    Carga y compila una especificación desde una URL o un archivo JSON/YAML. Los
+    '$ref' relativos se resuelven contra spec_url (por defecto la URL de source); si
+    el almacén local tiene esa versión precompilada se usa sin compilar.
+    """
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, timeout=REQUEST_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        data = response.content
+        spec_url = spec_url or source
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    content_hash = content_hash_of(data)
+    if spec_url:
+        entry = store.load(spec_url, content_hash)
+        if entry is not None:
+            return entry
+        spec_data, external_documents = bundle_spec(parse_spec_bytes(data, source), spec_url)
+    else:
+        spec_data, external_documents = parse_spec_bytes(data, source), {}
+    if external_documents:
+        content_hash = bundle_content_hash(content_hash, external_documents)
+    return compile_spec(spec_data, content_hash=content_hash, external_documents=external_documents)
+
+
+class RequestEngine:
+    """
+    Construye y envía los requests de una especificación compilada sin Streamlit:
+    la operación se elige por operationId, 'MÉTODO /ruta' o id de endpoint, las
+    entradas son un dict plano y las credenciales un dict esquema -> credencial
+    (mismo formato que active_security_credentials). Tras un login exitoso el
+    token queda como credencial para los requests siguientes y tokens
+    (TokenManager) lo renueva antes de que venza. Los esquemas OAuth2 con un
+    cliente configurado (oauth) usan el token de los scopes de cada operación.
+    """
+
+    def __init__(self, compiled, api_base_url:str, credentials:dict=None, session=None, timeout=REQUEST_TIMEOUT_SECONDS,
+                 tokens:TokenManager=None, oauth:OAuthTokens=None):
+        self.compiled = compiled
+        self.api_base_url = api_base_url
+        self.credentials = dict(credentials or {})
+        self.session = session or build_session()
+        self.timeout = timeout
+        self.tokens = tokens if tokens is not None else TokenManager()
+        self.oauth = oauth if oauth is not None else OAuthTokens(self.session, timeout=timeout)
+        self.user_info = {}
+        self._credentials_lock = threading.Lock()
+        plans = compiled.operation_plans.values()
+        self._operations = {plan.id: plan for plan in plans}
+        self._operations.update({f"{plan.method.upper()} {plan.path}": plan for plan in plans})
+        self._operations.update({plan.operation_id: plan for plan in plans if plan.operation_id})
+
+    @property
+    def security_schemes(self):
+        return self.compiled.spec.get("components", {}).get("securitySchemes", {})
+
+    def operation(self, operation_ref:str):
+        plan = self._operations.get(operation_ref)
+        if plan is None:
+            method, _, path = operation_ref.partition(" ")
+            plan = self._operations.get(f"{method.upper()} {path}")
+        if plan is None:
+            raise UnknownOperationError(f"La operación '{operation_ref}' no existe en la especificación.")
+        return plan
+
+    def set_credential(self, scheme_name:str, value:str) -> None:
+        scheme_details = self.security_schemes.get(scheme_name)
+        if scheme_details is None:
+            raise RequestBuildError(f"El esquema de seguridad '{scheme_name}' no está definido en la especificación.")
+        with self._credentials_lock:
+            self.credentials = {**self.credentials, scheme_name: scheme_credentials(scheme_details, value)}
+
+    def set_oauth_client(self, scheme_name:str, client:OAuthClient) -> None:
+        """Ejecuta el flujo del cliente contra el tokenUrl del esquema cuando una operación necesite un token."""
+        scheme_details = self.security_schemes.get(scheme_name)
+        if scheme_details is None or scheme_details.get("type") != "oauth2":
+            raise RequestBuildError(f"'{scheme_name}' no es un esquema oauth2 de la especificación.")
+        self.oauth.configure(scheme_name, scheme_details, client, self.api_base_url)
+
+    def inputs(self, plan, data:dict=None) -> RequestInputs:
+        """
+        Entradas de un request a partir de un dict: las secciones 'path', 'query',
+        'body' y 'form' se usan tal cual y el resto de las claves se reparte como las
+        columnas de un batch (parámetros por nombre, campos del body con puntos).
+        """
+        data = dict(data or {})
+        inputs = RequestInputs(
+            path_params={k: str(v) for k, v in (data.pop("path", None) or {}).items()},
+            query_params={k: str(v) for k, v in (data.pop("query", None) or {}).items()},
+            body=data.pop("body", None),
+            form_data=dict(data.pop("form", None) or {}),
+        )
+        if not data:
+            return inputs
+        targets = row_column_targets(plan, list(data))
+        ignored = [column for column, target in targets.items() if target is None]
+        if ignored:
+            raise RequestBuildError(f"Entradas que no coinciden con parámetros ni campos del body: {', '.join(ignored)}.")
+        return apply_row(plan, inputs, data, targets, self.compiled.ref_index)
+
+    def prepare(self, operation_ref:str, data:dict=None):
+        plan = self.operation(operation_ref)
+        inputs = self.inputs(plan, data)
+        return build_request(plan, self.api_base_url, inputs, self.current_credentials(plan, inputs.notices), self.timeout)
+
+    def current_credentials(self, plan, notices:list=None) -> dict:
+        # Los logins no llevan credenciales: no hace falta esperar una renovación para enviarlos
+        if plan.is_potentially_auth_endpoint or not plan.security:
+            return {}
+        return self.oauth.credentials_for(plan, self.tokens.fresh_credentials(self.credentials), notices)
+
+    def learn_credentials(self, result, login_prepared=None) -> str:
+        """
+        Si el resultado es un login exitoso, guarda su token como credencial y lo
+        deja a cargo de tokens (que, con login_prepared, puede repetir el login para
+        renovarlo). Devuelve el esquema o None.
+        """
+        if not result.ok:
+            return None
+        grant = grant_from_login_response(self.security_schemes, result.response_data)
+        if grant is None:
+            return None
+        self.user_info = grant.user_info
+        with self._credentials_lock:
+            self.credentials = {**self.credentials, grant.scheme_name: grant.credential}
+        self.tokens.track(grant, self.login_refresher(login_prepared))
+        return grant.scheme_name
+
+    def refresh_operation(self):
+        """Operación de login que renueva tokens (su ruta u operationId menciona 'refresh'), o None."""
+        return next(
+            (plan for plan in self.compiled.operation_plans.values()
+             if plan.is_potentially_auth_endpoint and "refresh" in f"{plan.path} {plan.operation_id or ''}".lower()),
+            None
+        )
+
+    def _refresh_inputs(self, plan, refresh_token):
+        for key in REFRESH_TOKEN_KEYS:
+            try:
+                return self.inputs(plan, {key: refresh_token})
+            except RequestBuildError:
+                continue
+        raise RequestBuildError(f"La operación '{plan.operation_id or plan.path}' no tiene un campo para el refresh token.")
+
+    def _send_for_grant(self, prepared):
+        result = RESILIENCE.send(self.session, prepared)
+        grant = grant_from_login_response(self.security_schemes, result.response_data) if result.ok else None
+        if grant is None:
+            raise TokenRefreshError(result.error or f"{prepared.method} {prepared.url} respondió {result.status_code} sin un token.")
+        return grant
+
+    def login_refresher(self, login_prepared=None):
+        """
+        Renovador para TokenManager: envía el refresh token a la operación de
+        refresh si la especificación tiene una y, si no hay o falla, repite el login
+        (login_prepared). None si no hay forma de renovar.
+        """
+        refresh_plan = self.refresh_operation()
+        if refresh_plan is None and login_prepared is None:
+            return None
+
+        def refresh(refresh_token):
+            errors = []
+            if refresh_token and refresh_plan is not None:
+                try:
+                    return self._send_for_grant(build_request(refresh_plan, self.api_base_url, self._refresh_inputs(refresh_plan, refresh_token), {}, self.timeout, describe=False))
+                except (RequestBuildError, TokenRefreshError) as e_refresh:
+                    errors.append(f"refresh: {e_refresh}")
+            if login_prepared is not None:
+                try:
+                    return self._send_for_grant(login_prepared)
+                except TokenRefreshError as e_login:
+                    errors.append(f"login: {e_login}")
+            raise TokenRefreshError("; ".join(errors) or "No hay refresh token ni login para repetir.")
+        return refresh
+
+    def execute(self, operation_ref:str, data:dict=None, cancel_event=None):
+        """Construye, envía y devuelve el CallResult; un RequestBuildError se devuelve como resultado con error."""
+        try:
+            plan = self.operation(operation_ref)
+            inputs = self.inputs(plan, data)
+            prepared = build_request(plan, self.api_base_url, inputs, self.current_credentials(plan, inputs.notices), self.timeout, describe=False)
+        except (RequestBuildError, UnknownOperationError) as e_build:
+            return CallResult(status_code=STATUS_REQUEST_ERROR, error=f"Request no enviado: {e_build}")
+        result = RESILIENCE.send(self.session, prepared, cancel_event)
+        if plan.is_potentially_auth_endpoint:
+            self.learn_credentials(result, prepared)
+        return result
+
+    def _is_login(self, operation_ref):
+        try:
+            return self.operation(operation_ref).is_potentially_auth_endpoint
+        except UnknownOperationError:
+            return False
+
+    def run(self, jobs, concurrency:int=8):
+        """
+        Ejecuta (operación, entradas) con hasta 'concurrency' requests en vuelo y
+        devuelve (índice, operación, entradas, CallResult) a medida que terminan. Los
+        logins se ejecutan solos, después de los anteriores, para que los requests
+        siguientes ya usen su token.
+        """
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="request-engine") as pool:
+            def finished(return_when):
+                done, _ = wait(in_flight, return_when=return_when)
+                for future in done:
+                    index, operation_ref, data = in_flight.pop(future)
+                    yield index, operation_ref, data, future.result()
+
+            for index, (operation_ref, data) in enumerate(jobs):
+                is_login = self._is_login(operation_ref)
+                if is_login and in_flight:
+                    yield from finished(return_when=ALL_COMPLETED)
+                while len(in_flight) >= max(1, concurrency):
+                    yield from finished(return_when=FIRST_COMPLETED)
+                future = pool.submit(self.execute, operation_ref, data)
+                in_flight[future] = (index, operation_ref, data)
+                if is_login:
+                    yield from finished(return_when=ALL_COMPLETED)
+            while in_flight:
+                yield from finished(return_when=FIRST_COMPLETED)
+
+
+def job_from_row(row:dict, default_operation:str=None):
+    """Una fila de un archivo de requests: {'operation': ..., 'inputs': {...}} o solo las entradas (con la operación por defecto)."""
+    row = dict(row)
+    operation_ref = row.pop("operation", None) or default_operation
+    if not operation_ref:
+        raise BatchFileError("Fila sin 'operation' y no se indicó una operación por defecto.")
+    return operation_ref, row.pop("inputs") if "inputs" in row else row
+
+
+def _result_record(index, operation_ref, result, include_body=True):
+    record = {"index": index, "operation": operation_ref, "status_code": result.status_code, "ok": result.ok, "elapsed_ms": round(result.elapsed_ms, 2)}
+    if result.error:
+        record["error"] = result.error
+    if result.retries:
+        record["retries"] = result.retries
+    if include_body:
+        data = result.response_data
+        record["response"] = data.summary() if isinstance(data, SpilledResponse) else data
+    if isinstance(result.response_data, SpilledResponse):
+        result.response_data.discard()
+    return record
+
+
+def parse_auth_arguments(values, option="--auth"):
+    """['NOMBRE=VALOR', ...] de una opción repetible de la CLI -> {NOMBRE: VALOR}."""
+    parsed = {}
+    for value in values or []:
+        name, separator, argument = value.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"{option} espera NOMBRE=VALOR: {value!r}")
+        parsed[name] = argument
+    return parsed
+
+
+def parse_oauth_arguments(clients, users):
+    """--oauth-client ESQUEMA=ID[:SECRETO] y --oauth-user ESQUEMA=USUARIO:CLAVE -> {ESQUEMA: OAuthClient}."""
+    users = parse_auth_arguments(users, "--oauth-user")
+    parsed = {}
+    for scheme_name, client in parse_auth_arguments(clients, "--oauth-client").items():
+        client_id, _, client_secret = client.partition(":")
+        username, separator, password = users.pop(scheme_name, "").partition(":")
+        flow = "password" if separator else "clientCredentials"
+        parsed[scheme_name] = OAuthClient(flow, client_id, client_secret, username, password)
+    if users:
+        raise argparse.ArgumentTypeError(f"--oauth-user sin --oauth-client para: {', '.join(users)}")
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta operaciones de una especificación OpenAPI sin la interfaz (salida NDJSON).")
+    parser.add_argument("--spec", required=True, help="URL o archivo JSON/YAML de la especificación.")
+    parser.add_argument("--spec-url", help="URL contra la que se resuelven los '$ref' relativos de un archivo local.")
+    parser.add_argument("--base-url", required=True, help="URL base de la API.")
+    parser.add_argument("--auth", action="append", metavar="ESQUEMA=VALOR", help="Credencial de un esquema de securitySchemes (repetible).")
+    parser.add_argument("--oauth-client", action="append", metavar="ESQUEMA=ID[:SECRETO]",
+                        help="Cliente OAuth2 de un esquema: los tokens se piden al tokenUrl con clientCredentials (repetible).")
+    parser.add_argument("--oauth-user", action="append", metavar="ESQUEMA=USUARIO:CLAVE",
+                        help="Usuario del flujo password para el cliente de --oauth-client del mismo esquema (repetible).")
+    parser.add_argument("--operation", help="operationId, 'MÉTODO /ruta' o id de endpoint (por defecto para las filas del archivo).")
+    parser.add_argument("--input", default="{}", help="Entradas del request como JSON (con --operation y sin --requests).")
+    parser.add_argument("--requests", metavar="ARCHIVO", help="Archivo NDJSON o CSV con un request por fila.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests simultáneos (por defecto 8).")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS, help="Timeout de cada request en segundos.")
+    parser.add_argument("--output", help="Archivo NDJSON de resultados (por defecto la salida estándar).")
+    parser.add_argument("--no-body", action="store_true", help="No incluir el body de las respuestas en la salida.")
+    args = parser.parse_args(argv)
+    if not args.requests and not args.operation:
+        parser.error("Indique --operation o --requests.")
+
+    try:
+        compiled = load_compiled_spec(args.spec, args.spec_url)
+        engine = RequestEngine(compiled, args.base_url, session=build_session(pool_maxsize=max(1, args.concurrency)), timeout=args.timeout)
+        for scheme_name, value in parse_auth_arguments(args.auth).items():
+            engine.set_credential(scheme_name, value)
+        for scheme_name, client in parse_oauth_arguments(args.oauth_client, args.oauth_user).items():
+            engine.set_oauth_client(scheme_name, client)
+        if args.requests:
+            with open(args.requests, "rb") as f:
+                rows = iter_batch_rows(f.read(), args.requests)
+            jobs = (job_from_row(row, args.operation) for row in rows)
+        else:
+            jobs = [(args.operation, json.loads(args.input))]
+    except (OSError, requests.exceptions.RequestException, json.JSONDecodeError, SpecDocumentError,
+            RequestBuildError, OAuthError, argparse.ArgumentTypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started_at = time.perf_counter()
+    latencies, failed = [], 0
+    try:
+        for index, operation_ref, _, result in engine.run(jobs, args.concurrency):
+            latencies.append(result.elapsed_ms)
+            failed += 0 if result.ok else 1
+            output.write(json.dumps(_result_record(index, operation_ref, result, not args.no_body), ensure_ascii=False, default=str) + "\n")
+    except BatchFileError as e:
+        print(f"Error en el archivo de requests: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started_at
+    latencies.sort()
+    print(
+        f"{len(latencies)} requests, {failed} con error, {len(latencies) / elapsed if elapsed > 0 else 0:.1f} req/s, "
+        f"p50 {percentile(latencies, 0.5) or 0:.1f} ms, p99 {percentile(latencies, 0.99) or 0:.1f} ms",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from app_config import (
+    HTTP_MAX_RETRIES, RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX_SECONDS, RETRY_STATUS_CODES, RETRY_AFTER_MAX_SECONDS,
+    HOST_MAX_CONCURRENCY, CIRCUIT_BREAKER_FAILURES, CIRCUIT_BREAKER_RESET_SECONDS,
+)
+from background_calls import (
+    ERROR_CANCELLED, ERROR_CIRCUIT_OPEN, ERROR_CONNECTION, ERROR_TIMEOUT, STATUS_CANCELLED, STATUS_CIRCUIT_OPEN,
+    SpilledResponse, _error_result, send_prepared_request,
+)
+
+# Métodos que se pueden repetir sin efectos adicionales (RFC 9110, 9.2.2)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE")
+# Status que indican que el host (no el request) está fallando: cuentan para el circuito
+CIRCUIT_FAILURE_STATUS = (502, 503, 504)
+
+CIRCUIT_CLOSED = "cerrado"
+CIRCUIT_OPEN = "abierto"
+CIRCUIT_HALF_OPEN = "semiabierto"
+
+
+def host_key(url:str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+def parse_retry_after(value, now=None):
+    """Segundos que pide esperar un header Retry-After (entero o fecha HTTP), o None si no es válido."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _retry_after_of(result):
+    return parse_retry_after(next((v for k, v in result.headers.items() if k.lower() == "retry-after"), None))
+
+
+class CircuitBreaker:
+    """
+    Circuito de un host: tras failure_threshold fallos seguidos se abre y los
+    requests fallan sin enviarse durante reset_seconds; después deja pasar un único
+    request de prueba (semiabierto) que lo cierra si sale bien o lo reabre si falla.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_BREAKER_FAILURES, reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def retry_in_seconds(self):
+        return max(0.0, self.open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() < self.open_until:
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record(self, failed:bool, hold_seconds=None) -> None:
+        """Resultado de un request permitido; hold_seconds (p. ej. un Retry-After) alarga la apertura."""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            self._probe_in_flight = False
+            if not failed:
+                self.state = CIRCUIT_CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.open_until = time.monotonic() + max(self.reset_seconds, hold_seconds or 0)
+
+    def release(self) -> None:
+        # Un request permitido terminó sin resultado (cancelado): no cuenta, pero libera la prueba
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class HostGuard:
+    """Límite de requests simultáneos y circuito de un host, compartidos por todas las sesiones."""
+
+    def __init__(self, host, max_concurrency=HOST_MAX_CONCURRENCY, breaker=None):
+        self.host = host
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+
+    def acquire(self, cancel_event=None) -> bool:
+        """Espera un lugar libre; devuelve False si el request se canceló mientras esperaba."""
+        if self._slots is None:
+            return True
+        while not self._slots.acquire(timeout=0.1):
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+        return True
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+
+class ResilienceLayer:
+    """
+    Envía requests con reintentos y protección por host: los métodos idempotentes
+    se reintentan ante errores de conexión y los status de retry_status, esperando
+    lo que pida Retry-After o un backoff exponencial con jitter; cada host tiene un
+    máximo de requests simultáneos y un circuito que, abierto, hace fallar los
+    requests al instante. El CallResult lleva los reintentos hechos y el estado del
+    circuito.
+    """
+
+    def __init__(self, max_retries=HTTP_MAX_RETRIES, backoff_seconds=RETRY_BACKOFF_SECONDS, backoff_max_seconds=RETRY_BACKOFF_MAX_SECONDS,
+                 retry_status=RETRY_STATUS_CODES, retry_after_max_seconds=RETRY_AFTER_MAX_SECONDS,
+                 host_max_concurrency=HOST_MAX_CONCURRENCY, breaker_failures=CIRCUIT_BREAKER_FAILURES, breaker_reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS):
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.retry_status = tuple(retry_status)
+        self.retry_after_max_seconds = retry_after_max_seconds
+        self.host_max_concurrency = host_max_concurrency
+        self.breaker_failures = breaker_failures
+        self.breaker_reset_seconds = breaker_reset_seconds
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def host(self, url) -> HostGuard:
+        key = host_key(url)
+        with self._lock:
+            guard = self._hosts.get(key)
+            if guard is None:
+                guard = HostGuard(key, self.host_max_concurrency, CircuitBreaker(self.breaker_failures, self.breaker_reset_seconds))
+                self._hosts[key] = guard
+            return guard
+
+    def backoff_delay(self, retry_number:int) -> float:
+        # "Full jitter": uniforme entre 0 y el backoff exponencial, para que los clientes no reintenten a la vez
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** retry_number))
+
+    @staticmethod
+    def is_failure(result) -> bool:
+        return result.error_kind in (ERROR_TIMEOUT, ERROR_CONNECTION) or (result.error is None and result.status_code in CIRCUIT_FAILURE_STATUS)
+
+    def retry_delay(self, result, retry_number:int):
+        """(segundos de espera, motivo) antes de repetir el request, o None si no se reintenta."""
+        if retry_number >= self.max_retries:
+            return None
+        if result.error_kind == ERROR_CONNECTION:
+            # Un timeout de lectura no se reintenta: multiplicaría la espera
+            reason = "error de conexión"
+        elif result.error is None and result.status_code in self.retry_status:
+            reason = f"status {result.status_code}"
+        else:
+            return None
+        retry_after = _retry_after_of(result)
+        if retry_after is not None:
+            if retry_after > self.retry_after_max_seconds:
+                return None # El servidor pide esperar más de lo razonable: se devuelve su respuesta
+            return retry_after, f"{reason}, Retry-After"
+        return self.backoff_delay(retry_number), reason
+
+    def _circuit_open_result(self, guard, started_at):
+        return _error_result(
+            STATUS_CIRCUIT_OPEN,
+            f"No enviado: el circuito de {guard.host} está abierto tras {guard.breaker.failures} fallos seguidos; "
+            f"se volverá a probar en {guard.breaker.retry_in_seconds:.0f}s.",
+            started_at, error_kind=ERROR_CIRCUIT_OPEN
+        )
+
+    def send(self, session, prepared, cancel_event=None, send=send_prepared_request):
+        """Igual que send_prepared_request (misma firma y resultado), con reintentos y protección por host."""
+        guard = self.host(prepared.url)
+        retryable = prepared.method.upper() in IDEMPOTENT_METHODS
+        started_at = time.perf_counter()
+        retries = []
+        result = None
+        while True:
+            if not guard.breaker.allow():
+                if result is None:
+                    result = self._circuit_open_result(guard, started_at)
+                else:
+                    retries.pop() # El circuito se abrió entre reintentos: se devuelve el último fallo real
+                break
+            if not guard.acquire(cancel_event):
+                guard.breaker.release()
+                result = _error_result(STATUS_CANCELLED, "Solicitud cancelada por el usuario.", started_at, error_kind=ERROR_CANCELLED)
+                break
+            if result is not None and isinstance(result.response_data, SpilledResponse):
+                result.response_data.discard() # Body del intento anterior, que se descarta
+            try:
+                result = send(session, prepared, cancel_event)
+            except BaseException:
+                # Sin resultado no se cuenta como fallo, pero la prueba del circuito semiabierto
+                # debe liberarse: si no, el host quedaría abierto para todas las sesiones
+                guard.breaker.release()
+                raise
+            finally:
+                guard.release()
+
+            if result.error_kind == ERROR_CANCELLED:
+                guard.breaker.release()
+                break
+            failed = self.is_failure(result)
+            guard.breaker.record(failed, _retry_after_of(result) if failed else None)
+
+            retry = self.retry_delay(result, len(retries)) if retryable else None
+            if retry is None:
+                break
+            delay, reason = retry
+            retries.append({"reason": reason, "delay_seconds": round(delay, 3)})
+            if cancel_event is not None and cancel_event.wait(delay):
+                result = _error_result(STATUS_CANCELLED, "Solicitud cancelada por el usuario.", started_at, error_kind=ERROR_CANCELLED)
+                break
+            if cancel_event is None:
+                time.sleep(delay)
+
+        result.retries = retries
+        result.circuit_state = guard.breaker.state if guard.breaker.failure_threshold else None
+        if retries:
+            result.elapsed_ms = (time.perf_counter() - started_at) * 1000 # Incluye los intentos previos y las esperas
+        return result
+
+
+RESILIENCE = ResilienceLayer()
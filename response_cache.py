@@ -0,0 +1,316 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from email.utils import parsedate_to_datetime
+from app_config import RESPONSE_CACHE_MEMORY_BYTES, RESPONSE_CACHE_DIR, RESPONSE_CACHE_DISK_MAX_BYTES, RESPONSE_PREVIEW_BYTES
+from background_calls import CallResult, _decode, _response_data
+from resilience import RESILIENCE
+
+CACHE_FORMAT_VERSION = 1
+CACHEABLE_METHODS = ("GET", "HEAD")
+# Status que se pueden guardar sin indicaciones especiales (RFC 9111, "heuristically cacheable")
+CACHEABLE_STATUS = (200, 203, 204, 300, 301, 404, 405, 410, 414, 501)
+
+CACHE_HIT = "hit"
+CACHE_REVALIDATED = "revalidated"
+
+
+def _header(headers, name):
+    return next((v for k, v in headers.items() if k.lower() == name.lower()), None)
+
+
+def parse_cache_control(value):
+    """'no-cache, max-age=60' -> {'no-cache': None, 'max-age': '60'}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def _seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers):
+    """Segundos que la respuesta es fresca según max-age o Expires (0 si no lo indica)."""
+    max_age = _seconds(parse_cache_control(_header(headers, "Cache-Control")).get("max-age"))
+    if max_age is not None:
+        return max_age
+    expires, date = _header(headers, "Expires"), _header(headers, "Date")
+    if expires and date:
+        try:
+            return max(0, int((parsedate_to_datetime(expires) - parsedate_to_datetime(date)).total_seconds()))
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+def cache_key(prepared):
+    """
+    Método, URL resuelta, query ordenada y alcance de credenciales: un hash de los
+    headers y cookies enviados (incluye Authorization o el header del apiKey), para
+    que credenciales distintas nunca compartan una respuesta.
+    """
+    params = tuple(sorted((str(k), str(v)) for k, v in (prepared.kwargs.get("params") or {}).items()))
+    scope_source = json.dumps(
+        [sorted((str(k).lower(), str(v)) for k, v in (prepared.kwargs.get("headers") or {}).items()),
+         sorted((prepared.kwargs.get("cookies") or {}).items())],
+        default=str
+    )
+    scope = hashlib.sha256(scope_source.encode("utf-8")).hexdigest()[:16]
+    return (prepared.method.upper(), prepared.url, params, scope)
+
+
+class CachedResponse:
+    """Respuesta guardada: el body en bytes (se vuelve a parsear en cada acierto) y sus validadores."""
+
+    def __init__(self, status_code, headers, content, content_type, encoding):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.content_type = content_type
+        self.encoding = encoding
+        self._refresh()
+
+    def _refresh(self):
+        # Al guardarla o al revalidarla (304) empieza de nuevo su vida útil
+        self.stored_at = time.time()
+        self.initial_age = _seconds(_header(self.headers, "Age")) or 0
+        self.max_age = freshness_lifetime(self.headers)
+        self.no_cache = "no-cache" in parse_cache_control(_header(self.headers, "Cache-Control"))
+        self.etag = _header(self.headers, "ETag")
+        self.last_modified = _header(self.headers, "Last-Modified")
+
+    def revalidated(self, not_modified_headers):
+        """
+        Nueva entrada con el mismo body y los headers de un 304, que reemplazan a los
+        guardados salvo los que describen el body. La entrada original no se modifica
+        (puede estar sirviéndose en otro hilo).
+        """
+        body_headers = ("content-length", "content-type", "content-encoding", "transfer-encoding")
+        updated = {k: v for k, v in not_modified_headers.items() if k.lower() not in body_headers}
+        lowered = {k.lower() for k in updated}
+        headers = {**{k: v for k, v in self.headers.items() if k.lower() not in lowered}, **updated}
+        return CachedResponse(self.status_code, headers, self.content, self.content_type, self.encoding)
+
+    @property
+    def size_bytes(self):
+        return len(self.content) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+    @property
+    def age_seconds(self):
+        return self.initial_age + max(0.0, time.time() - self.stored_at)
+
+    def is_fresh(self):
+        return not self.no_cache and self.age_seconds < self.max_age
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_result(self, cache_status, elapsed_ms):
+        return CallResult(
+            status_code=self.status_code,
+            ok=self.status_code < 400,
+            response_data=_response_data(self.status_code, self.content_type, self.content, self.encoding),
+            raw_text=_decode(self.content[:RESPONSE_PREVIEW_BYTES], self.encoding),
+            headers=dict(self.headers),
+            elapsed_ms=elapsed_ms,
+            cache_status=cache_status,
+            cache_age_seconds=self.age_seconds,
+        )
+
+
+def is_storable(prepared, result):
+    if prepared.method.upper() not in CACHEABLE_METHODS or result.error or result.body is None:
+        return False
+    if result.status_code not in CACHEABLE_STATUS:
+        return False
+    directives = parse_cache_control(_header(result.headers, "Cache-Control"))
+    if "no-store" in directives or (_header(result.headers, "Vary") or "").strip() == "*":
+        return False
+    # Sin vida útil ni validadores no hay forma de reutilizarla
+    return freshness_lifetime(result.headers) > 0 or bool(_header(result.headers, "ETag") or _header(result.headers, "Last-Modified"))
+
+
+class ResponseCache:
+    """
+    Caché de respuestas GET/HEAD compartida por todas las sesiones del proceso. En
+    memoria es LRU con un presupuesto en bytes; si hay directorio, cada entrada
+    también se escribe en disco (sobrevive a reinicios y a la expulsión de memoria).
+    Una entrada fresca (max-age/Expires) se sirve sin red; una vencida con ETag o
+    Last-Modified se revalida con If-None-Match/If-Modified-Since.
+    Los archivos se cargan con pickle: el directorio debe ser de confianza.
+    """
+
+    def __init__(self, memory_budget=RESPONSE_CACHE_MEMORY_BYTES, directory=RESPONSE_CACHE_DIR, disk_budget=RESPONSE_CACHE_DISK_MAX_BYTES):
+        self.memory_budget = memory_budget
+        self.directory = directory
+        self.disk_budget = disk_budget
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def _path_for(self, key):
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32] + ".response.pickle")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path_for(key), "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if payload.get("format") != CACHE_FORMAT_VERSION or payload.get("key") != key:
+            return None
+        return payload["entry"]
+
+    def _write_disk(self, key, entry):
+        if not self.directory or entry.size_bytes > self.disk_budget:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump({"format": CACHE_FORMAT_VERSION, "key": key, "entry": entry}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path_for(key))
+            self._prune_disk()
+        except OSError:
+            pass # El disco es un nivel opcional; si no se puede escribir se sigue solo con memoria
+
+    def _prune_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".response.pickle"):
+                path = os.path.join(self.directory, name)
+                try:
+                    files.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except OSError:
+                    continue
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def _remember(self, key, entry):
+        # Llamar con el lock tomado
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.size_bytes
+        if entry.size_bytes > self.memory_budget:
+            return
+        self._entries[key] = entry
+        self._memory_bytes += entry.size_bytes
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted.size_bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry is not None:
+            with self._lock:
+                self._remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".response.pickle"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def send(self, session, prepared, cancel_event=None):
+        """
+        Igual que RESILIENCE.send, pero sirve GET/HEAD desde la caché cuando
+        se puede. El resultado lleva cache_status (CACHE_HIT, CACHE_REVALIDATED o
+        None si vino de la red) y la edad de la respuesta guardada.
+        """
+        if prepared.method.upper() not in CACHEABLE_METHODS:
+            return RESILIENCE.send(session, prepared, cancel_event)
+        started_at = time.perf_counter()
+        key = cache_key(prepared)
+        entry = self.get(key)
+        if entry is not None and entry.is_fresh():
+            self._count("hits")
+            return entry.to_result(CACHE_HIT, (time.perf_counter() - started_at) * 1000)
+
+        conditional = entry.conditional_headers() if entry is not None else {}
+        if conditional:
+            headers = {**(prepared.kwargs.get("headers") or {}), **conditional}
+            result = RESILIENCE.send(session, replace(prepared, kwargs={**prepared.kwargs, "headers": headers}), cancel_event)
+        else:
+            result = RESILIENCE.send(session, prepared, cancel_event)
+
+        if entry is not None and result.status_code == 304 and not result.error:
+            entry = entry.revalidated(result.headers)
+            self.put(key, entry)
+            self._count("revalidations")
+            revalidated = entry.to_result(CACHE_REVALIDATED, result.elapsed_ms)
+            revalidated.connection_reused = result.connection_reused
+            revalidated.timing = result.timing
+            revalidated.retries = result.retries
+            revalidated.circuit_state = result.circuit_state
+            return revalidated
+
+        self._count("misses")
+        if is_storable(prepared, result):
+            self.put(key, CachedResponse(result.status_code, result.headers, result.body, _header(result.headers, "Content-Type") or "", result.encoding))
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "memory_budget": self.memory_budget,
+                "disk_enabled": bool(self.directory),
+            }
+
+
+RESPONSE_CACHE = ResponseCache()
@@ -0,0 +1,118 @@
+import bisect
+import re
+from collections import defaultdict
+
+# Peso de cada campo de la operación en el ranking
+FIELD_WEIGHTS = {
+    "path": 3.0,
+    "operation_id": 3.0,
+    "method": 2.0,
+    "tag": 2.0,
+    "summary": 2.0,
+    "description": 1.0,
+}
+# Factor aplicado cuando el término de búsqueda es solo prefijo del token indexado
+PREFIX_MATCH_FACTOR = 0.5
+
+_SPLIT_RE = re.compile(r"[^0-9a-zA-ZÀ-ɏ]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-zß-ɏ]+|[A-Z]+|\d+")
+
+
+def tokenize(text, split_camel_case=True):
+    """Separa en palabras (también camelCase y snake_case) en minúsculas, conservando la palabra compuesta."""
+    tokens = []
+    for word in _SPLIT_RE.split(text or ""):
+        if not word:
+            continue
+        tokens.append(word.lower())
+        if not split_camel_case:
+            continue
+        parts = _CAMEL_RE.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def _tokenize_path(path):
+    tokens = []
+    for segment in path.strip("/").split("/"):
+        segment = segment.strip("{}")
+        tokens.extend(tokenize(segment))
+        if "_" in segment:
+            tokens.append(segment.lower())
+    return tokens
+
+
+class SearchIndex:
+    """
+    Índice invertido de las operaciones de una especificación (segmentos de path,
+    método, operationId, summary, descripción y tags), construido al cargarla.
+    Las consultas devuelven ids de endpoint ordenados por relevancia; cada término
+    coincide con tokens completos o como prefijo de ellos.
+    """
+
+    def __init__(self, grouped_endpoints):
+        self._endpoint_ids = []
+        self._sort_keys = []
+        self._postings = defaultdict(dict)
+        for tag_name, endpoints in grouped_endpoints.items():
+            for endpoint_info in endpoints:
+                self._add(tag_name, endpoint_info)
+        self._postings = dict(self._postings)
+        self._vocabulary = sorted(self._postings)
+
+    def _add(self, tag_name, endpoint_info):
+        doc = len(self._endpoint_ids)
+        operation = endpoint_info["operation"]
+        self._endpoint_ids.append(endpoint_info["id"])
+        self._sort_keys.append((endpoint_info["path"], endpoint_info["method"]))
+        fields = {
+            "path": _tokenize_path(endpoint_info["path"]),
+            "operation_id": tokenize(operation.get("operationId", "")),
+            "method": [endpoint_info["method"].lower()],
+            "tag": [token for tag in (operation.get("tags") or [tag_name]) for token in tokenize(tag)],
+            "summary": tokenize(operation.get("summary", "")),
+            "description": tokenize(operation.get("description", "")),
+        }
+        for field_name, tokens in fields.items():
+            weight = FIELD_WEIGHTS[field_name]
+            for token in tokens:
+                postings = self._postings[token]
+                if postings.get(doc, 0.0) < weight:
+                    postings[doc] = weight
+
+    def __len__(self):
+        return len(self._endpoint_ids)
+
+    @property
+    def vocabulary_size(self):
+        return len(self._vocabulary)
+
+    def _term_scores(self, term):
+        scores = dict(self._postings.get(term, {}))
+        position = bisect.bisect_right(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            token = self._vocabulary[position]
+            position += 1
+            for doc, weight in self._postings[token].items():
+                prefix_weight = weight * PREFIX_MATCH_FACTOR
+                if scores.get(doc, 0.0) < prefix_weight:
+                    scores[doc] = prefix_weight
+        return scores
+
+    def search(self, query):
+        """Devuelve [(id de endpoint, puntaje)] de las operaciones que contienen todos los términos."""
+        terms = list(dict.fromkeys(tokenize(query, split_camel_case=False)))
+        if not terms:
+            return []
+        total_scores = None
+        for term in terms:
+            term_scores = self._term_scores(term)
+            if total_scores is None:
+                total_scores = term_scores
+            else:
+                total_scores = {doc: score + term_scores[doc] for doc, score in total_scores.items() if doc in term_scores}
+            if not total_scores:
+                return []
+        ranked = sorted(total_scores.items(), key=lambda item: (-item[1], self._sort_keys[item[0]]))
+        return [(self._endpoint_ids[doc], score) for doc, score in ranked]
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import posixpath
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urljoin, urlparse
+import requests
+from app_config import SPEC_CACHE_TTL_SECONDS, SPEC_REF_FETCH_WORKERS, YAML_AVAILABLE, yaml
+from utils import resolve_ref
+
+# Clave del documento raíz bajo la que se incrustan los documentos externos
+BUNDLED_DOCUMENTS_KEY = "x-bundled-documents"
+YAML_SUFFIXES = (".yaml", ".yml")
+
+
+class SpecDocumentError(ValueError):
+    """El documento de la especificación (o uno referenciado) no se pudo interpretar."""
+
+
+def is_yaml_document(url, content_type=None):
+    if content_type and "yaml" in content_type.lower():
+        return True
+    return urlparse(url).path.lower().endswith(YAML_SUFFIXES)
+
+
+def _stringify_keys(node):
+    # YAML convierte claves como 200 en enteros; en OpenAPI todas las claves son cadenas
+    if isinstance(node, dict):
+        return {str(k): _stringify_keys(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_stringify_keys(v) for v in node]
+    return node
+
+
+def parse_document(content:bytes, url:str, content_type=None):
+    """Parsea un documento JSON o YAML (según Content-Type, extensión o contenido)."""
+    looks_like_json = content.lstrip()[:1] in (b"{", b"[")
+    if looks_like_json and not is_yaml_document(url, content_type):
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"{e.msg} en {url}", e.doc, e.pos) from None
+    if not YAML_AVAILABLE:
+        raise SpecDocumentError(f"'{url}' es YAML y PyYAML no está instalado (pip install pyyaml).")
+    try:
+        return _stringify_keys(yaml.safe_load(content))
+    except yaml.YAMLError as e:
+        raise SpecDocumentError(f"YAML inválido en {url}: {e}") from None
+
+
+class _CachedDocument:
+    __slots__ = ("document", "content_hash", "etag", "last_modified", "validated_at")
+
+    def __init__(self, document, content_hash, etag, last_modified):
+        self.document = document
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated_at = time.monotonic()
+
+
+class ExternalDocumentCache:
+    """
+    Caché LRU, compartida entre cargas y sesiones, de los documentos referenciados
+    por '$ref' externos. Dentro del TTL se sirven sin red; después se revalidan con
+    If-None-Match/If-Modified-Since y solo se vuelven a parsear si cambiaron.
+    Los documentos guardados nunca se modifican (el bundling trabaja sobre copias).
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=SPEC_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, url):
+        """Devuelve (documento parseado, hash del contenido)."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None and (time.monotonic() - entry.validated_at) < self.ttl_seconds:
+            return entry.document, entry.content_hash
+
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        response = requests.get(url, timeout=15, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            entry.validated_at = time.monotonic()
+            self._put(url, entry)
+            return entry.document, entry.content_hash
+        response.raise_for_status()
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if entry is not None and entry.content_hash == content_hash:
+            document = entry.document
+        else:
+            document = parse_document(response.content, url, response.headers.get("Content-Type"))
+        self._put(url, _CachedDocument(document, content_hash, response.headers.get("ETag"), response.headers.get("Last-Modified")))
+        return document, content_hash
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+EXTERNAL_DOCUMENTS = ExternalDocumentCache()
+
+
+def collect_external_refs(document, base_url):
+    """URLs absolutas (sin fragmento) de los documentos a los que apuntan los '$ref' no locales."""
+    urls = set()
+    pending = [document]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            ref_string = node.get("$ref")
+            if isinstance(ref_string, str) and not ref_string.startswith("#"):
+                urls.add(urldefrag(urljoin(base_url, ref_string)).url)
+            pending.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            pending.extend(v for v in node if isinstance(v, (dict, list)))
+    return urls
+
+
+def fetch_documents(urls, root_url, cache=EXTERNAL_DOCUMENTS, max_workers=SPEC_REF_FETCH_WORKERS):
+    """
+    Descarga en paralelo (pool acotado) los documentos indicados y, a medida que
+    llegan, los que estos referencian. Cada URL se pide una sola vez por carga.
+    Devuelve ({url: documento}, {url: hash}).
+    """
+    documents, hashes = {}, {}
+    requested = set(urls) | {root_url}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spec-ref") as pool:
+        in_flight = {pool.submit(cache.get, url): url for url in urls}
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = in_flight.pop(future)
+                documents[url], hashes[url] = future.result()
+                for ref_url in collect_external_refs(documents[url], url) - requested:
+                    requested.add(ref_url)
+                    in_flight[pool.submit(cache.get, ref_url)] = ref_url
+    return documents, hashes
+
+
+def _document_keys(urls, root_url):
+    root = urlparse(root_url)
+    root_dir = posixpath.dirname(root.path)
+    keys, used = {}, set()
+    for url in sorted(urls):
+        parsed = urlparse(url)
+        name = posixpath.relpath(parsed.path, root_dir) if parsed.netloc == root.netloc else parsed.netloc + parsed.path
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "document"
+        key, suffix = name, 2
+        while key in used:
+            key, suffix = f"{name}_{suffix}", suffix + 1
+        used.add(key)
+        keys[url] = key
+    return keys
+
+
+class _RefRewriter:
+    """Copia un documento convirtiendo cada '$ref' en un puntero local al documento combinado."""
+
+    def __init__(self, root_url, document_keys):
+        self.root_url = root_url
+        self.document_keys = document_keys
+
+    def local_ref(self, ref_string, base_url):
+        if ref_string.startswith("#"):
+            target_url, fragment = base_url, ref_string[1:]
+        else:
+            target_url, fragment = urldefrag(urljoin(base_url, ref_string))
+        if fragment and not fragment.startswith("/"):
+            fragment = "/" + fragment
+        if target_url == self.root_url:
+            return "#" + fragment
+        return f"#/{BUNDLED_DOCUMENTS_KEY}/{self.document_keys[target_url]}{fragment}"
+
+    def rewrite(self, node, base_url):
+        if isinstance(node, dict):
+            return {
+                key: self.local_ref(value, base_url) if key == "$ref" and isinstance(value, str) else self.rewrite(value, base_url)
+                for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self.rewrite(item, base_url) for item in node]
+        # Escalares y tablas de esquemas perezosas (spec_stream) se conservan tal cual
+        return node
+
+
+def _inline_path_item_refs(bundled):
+    # group_endpoints recorre los métodos de cada path item: los path items '$ref' se reemplazan por su contenido
+    paths = bundled.get("paths")
+    if not isinstance(paths, dict):
+        return
+    for path_str, path_item in list(paths.items()):
+        if isinstance(path_item, dict) and isinstance(path_item.get("$ref"), str):
+            target = resolve_ref(bundled, path_item["$ref"])
+            if isinstance(target, dict):
+                merged = dict(target)
+                merged.update((k, v) for k, v in path_item.items() if k != "$ref")
+                paths[path_str] = merged
+
+
+def bundle_spec(spec, root_url, cache=EXTERNAL_DOCUMENTS, max_workers=SPEC_REF_FETCH_WORKERS):
+    """
+    Resuelve los '$ref' externos/relativos de una especificación dividida en varios
+    archivos y devuelve (documento único, {url: hash} de los documentos incluidos).
+    Los documentos externos quedan bajo BUNDLED_DOCUMENTS_KEY y todos los '$ref'
+    pasan a ser punteros locales, así que el resto de la app no cambia. Si no hay
+    referencias externas se devuelve la misma especificación.
+    """
+    external_urls = collect_external_refs(spec, root_url) - {root_url}
+    if not external_urls:
+        return spec, {}
+    documents, hashes = fetch_documents(external_urls, root_url, cache, max_workers)
+    rewriter = _RefRewriter(root_url, _document_keys(documents, root_url))
+    bundled = rewriter.rewrite(spec, root_url)
+    bundled[BUNDLED_DOCUMENTS_KEY] = {
+        rewriter.document_keys[url]: rewriter.rewrite(document, url) for url, document in documents.items()
+    }
+    _inline_path_item_refs(bundled)
+    return bundled, hashes
+
+
+def bundle_content_hash(root_hash, document_hashes):
+    """Hash de la versión completa: cambia si cambia la raíz o cualquier documento referenciado."""
+    hasher = hashlib.sha256(root_hash.encode("utf-8"))
+    for url in sorted(document_hashes):
+        hasher.update(f"\n{url}={document_hashes[url]}".encode("utf-8"))
+    return hasher.hexdigest()
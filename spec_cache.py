@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from app_config import GLOBAL_SUFFIX, SPEC_CACHE_MAX_ENTRIES, SPEC_CACHE_TTL_SECONDS
+from ref_index import RefIndex
+from render_plan import compile_operation_plans
+from spec_diff import compute_operation_hashes
+from search_index import SearchIndex
+
+
+def group_endpoints(spec_data:dict) -> tuple:
+    grouped = defaultdict(list)
+    tag_descriptions = {
+        tag_def.get("name", f"tag_desconocido_{i}"): tag_def
+        for i, tag_def in enumerate(spec_data.get("tags", []))
+    }
+
+    for path_str, path_item in spec_data.get("paths", {}).items():
+        for method_str, operation_obj in path_item.items():
+            tag_name = operation_obj.get("tags", ["default"])[0]
+            endpoint_id = f"{tag_name}_{method_str.upper()}_{path_str.replace('/','_').replace('{','').replace('}','')}{GLOBAL_SUFFIX}"
+            grouped[tag_name].append({
+                "path": path_str,
+                "method": method_str,
+                "operation": operation_obj,
+                "id": endpoint_id
+            })
+    for tag_name_iter in grouped:
+        grouped[tag_name_iter].sort(key=lambda x: (x["path"], x["method"]))
+
+    return dict(grouped), tag_descriptions
+
+
+class CachedSpec:
+    """
+    Especificación ya parseada junto con los datos derivados (endpoints agrupados
+    por tag, descripciones de tags, índice de '$ref', planes por operación e
+    índice de búsqueda) y los validadores HTTP para revalidarla.
+    """
+
+    def __init__(self, spec, grouped_endpoints, tag_descriptions, ref_index, operation_plans, search_index, etag=None, last_modified=None, content_hash=None, external_documents=None):
+        self.spec = spec
+        self.grouped_endpoints = grouped_endpoints
+        self.tag_descriptions = tag_descriptions
+        self.ref_index = ref_index
+        self.operation_plans = operation_plans
+        self.search_index = search_index
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.external_documents = external_documents or {} # url -> hash de cada documento referenciado por '$ref' externos
+        self._operation_hashes = None
+        self.validated_at = time.monotonic()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["validated_at"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.setdefault("_operation_hashes", None)
+        self.__dict__.update(state)
+        # Una entrada restaurada de disco se considera vencida: se revalida antes de usarla
+        self.validated_at = float("-inf")
+
+    @property
+    def operation_hashes(self):
+        """Hash por endpoint (ver spec_diff); se calcula la primera vez que se compara una versión."""
+        if self._operation_hashes is None:
+            self._operation_hashes = compute_operation_hashes(self.spec, self.grouped_endpoints, self.ref_index)
+        return self._operation_hashes
+
+    def is_fresh(self, ttl_seconds):
+        return (time.monotonic() - self.validated_at) < ttl_seconds
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def compile_spec(spec_data, etag=None, last_modified=None, content_hash=None, external_documents=None, previous=None):
+    """
+    Compila una especificación. Si se pasa la versión anterior (previous), los
+    planes de las operaciones cuyo hash no cambió se reutilizan sin recompilar.
+    """
+    grouped, tag_descriptions = group_endpoints(spec_data)
+    ref_index = RefIndex(spec_data)
+    operation_hashes = None
+    reusable_plans = None
+    if previous is not None:
+        operation_hashes = compute_operation_hashes(spec_data, grouped, ref_index)
+        previous_hashes = previous.operation_hashes
+        reusable_plans = {
+            endpoint_id: plan for endpoint_id, plan in previous.operation_plans.items()
+            if previous_hashes.get(endpoint_id) == operation_hashes.get(endpoint_id)
+        }
+    entry = CachedSpec(
+        spec_data,
+        grouped,
+        tag_descriptions,
+        ref_index,
+        compile_operation_plans(spec_data, grouped, ref_index, reusable_plans),
+        SearchIndex(grouped),
+        etag=etag,
+        last_modified=last_modified,
+        content_hash=content_hash,
+        external_documents=external_documents
+    )
+    entry._operation_hashes = operation_hashes
+    return entry
+
+
+class SpecCache:
+    """
+    Caché LRU de especificaciones compartida por todas las sesiones del proceso.
+    Las entradas dentro del TTL se sirven sin red; las vencidas se revalidan con
+    If-None-Match/If-Modified-Since.
+    """
+
+    def __init__(self, max_entries=SPEC_CACHE_MAX_ENTRIES, ttl_seconds=SPEC_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def make_key(api_base_url, api_json_location):
+        return (api_base_url.rstrip('/'), api_json_location.lstrip('/'))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_hit(self, revalidated=False):
+        with self._lock:
+            self.hits += 1
+            if revalidated:
+                self.revalidations += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def mark_revalidated(self, entry):
+        entry.validated_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+SPEC_CACHE = SpecCache()
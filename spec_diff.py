@@ -0,0 +1,100 @@
+import hashlib
+import json
+from dataclasses import dataclass
+
+
+def _canonical_json(node):
+    return json.dumps(node, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _direct_refs(node):
+    refs = set()
+    pending = [node]
+    while pending:
+        current = pending.pop()
+        if isinstance(current, dict):
+            ref_string = current.get("$ref")
+            if isinstance(ref_string, str) and ref_string.startswith("#/"):
+                refs.add(ref_string)
+            pending.extend(v for v in current.values() if isinstance(v, (dict, list)))
+        elif isinstance(current, list):
+            pending.extend(v for v in current if isinstance(v, (dict, list)))
+    return refs
+
+
+class _RefDigests:
+    """Hash del contenido y '$ref' directos de cada destino, calculados una sola vez por especificación."""
+
+    def __init__(self, ref_index):
+        self.ref_index = ref_index
+        self._digests = {}
+        self._children = {}
+
+    def _load(self, ref_string):
+        target = self.ref_index.resolve(ref_string)
+        self._digests[ref_string] = hashlib.sha256(_canonical_json(target).encode("utf-8")).hexdigest()
+        self._children[ref_string] = _direct_refs(target)
+
+    def closure(self, roots):
+        """Devuelve {ref: hash} de todos los '$ref' alcanzables desde roots (tolera ciclos)."""
+        seen = {}
+        pending = list(roots)
+        while pending:
+            ref_string = pending.pop()
+            if ref_string in seen:
+                continue
+            if ref_string not in self._digests:
+                self._load(ref_string)
+            seen[ref_string] = self._digests[ref_string]
+            pending.extend(self._children[ref_string])
+        return seen
+
+
+def compute_operation_hashes(spec, grouped_endpoints, ref_index):
+    """
+    Devuelve {id de endpoint: hash}. El hash cubre la operación, el contenido de
+    todos los '$ref' que alcanza (transitivamente) y si la API define esquemas de
+    seguridad, es decir, todo lo que interviene en su OperationPlan.
+    """
+    has_security_schemes = bool("components" in spec and "securitySchemes" in spec["components"])
+    ref_digests = _RefDigests(ref_index)
+    hashes = {}
+    for tag_name, endpoints in grouped_endpoints.items():
+        for endpoint_info in endpoints:
+            operation = endpoint_info["operation"]
+            payload = {
+                "operation": operation,
+                "refs": ref_digests.closure(_direct_refs(operation)),
+                "security_schemes": has_security_schemes,
+            }
+            hashes[endpoint_info["id"]] = hashlib.sha256(_canonical_json(payload).encode("utf-8")).hexdigest()
+    return hashes
+
+
+@dataclass(frozen=True)
+class SpecDiff:
+    added: frozenset
+    removed: frozenset
+    changed: frozenset
+    unchanged: frozenset
+
+    @property
+    def is_empty(self):
+        return not (self.added or self.removed or self.changed)
+
+    @property
+    def invalidated(self):
+        """Endpoints cuyo estado de formulario/respuesta ya no corresponde a la especificación."""
+        return self.removed | self.changed
+
+
+def diff_operation_hashes(old_hashes, new_hashes):
+    old_ids, new_ids = set(old_hashes), set(new_hashes)
+    common = old_ids & new_ids
+    changed = {endpoint_id for endpoint_id in common if old_hashes[endpoint_id] != new_hashes[endpoint_id]}
+    return SpecDiff(
+        added=frozenset(new_ids - old_ids),
+        removed=frozenset(old_ids - new_ids),
+        changed=frozenset(changed),
+        unchanged=frozenset(common - changed),
+    )
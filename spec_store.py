@@ -0,0 +1,146 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from app_config import COMPILED_SPEC_DIR, COMPILED_SPEC_KEEP_VERSIONS, SPEC_STREAMING_THRESHOLD_BYTES, SPEC_STREAM_CHUNK_BYTES
+from spec_cache import compile_spec
+from spec_stream import parse_spec_stream
+from spec_bundle import bundle_content_hash, bundle_spec, is_yaml_document, parse_document
+
+STORE_FORMAT_VERSION = 3
+
+
+def content_hash_of(data:bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class CompiledSpecStore:
+    """
+    Almacén en disco de especificaciones ya compiladas (CachedSpec serializado con
+    pickle), indexado por URL + hash del contenido. Permite arrancar sin volver a
+    descargar/compilar y seguir funcionando si el host de la API no responde.
+    Los archivos se cargan con pickle: el directorio debe ser de confianza.
+    """
+
+    def __init__(self, directory=COMPILED_SPEC_DIR, keep_versions=COMPILED_SPEC_KEEP_VERSIONS):
+        self.directory = directory
+        self.keep_versions = keep_versions
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    @staticmethod
+    def _url_key(openapi_url):
+        return hashlib.sha256(openapi_url.encode("utf-8")).hexdigest()[:16]
+
+    def path_for(self, openapi_url, content_hash):
+        return os.path.join(self.directory, f"{self._url_key(openapi_url)}-{content_hash[:16]}.spec.pickle")
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if payload.get("format") != STORE_FORMAT_VERSION:
+            return None
+        return payload["entry"]
+
+    def load(self, openapi_url, content_hash):
+        if not self.enabled or not content_hash:
+            return None
+        path = self.path_for(openapi_url, content_hash)
+        return self._read(path) if os.path.exists(path) else None
+
+    def _versions(self, openapi_url):
+        # Archivos de la URL, del más reciente al más viejo
+        candidates = glob.glob(os.path.join(self.directory, f"{self._url_key(openapi_url)}-*.spec.pickle"))
+        return sorted(candidates, key=os.path.getmtime, reverse=True)
+
+    def load_latest(self, openapi_url):
+        if not self.enabled:
+            return None
+        for path in self._versions(openapi_url):
+            entry = self._read(path)
+            if entry is not None:
+                return entry
+        return None
+
+    def save(self, openapi_url, entry):
+        if not self.enabled or not entry.content_hash:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(openapi_url, entry.content_hash)
+        payload = {"format": STORE_FORMAT_VERSION, "url": openapi_url, "entry": entry}
+        # Escritura atómica: otro proceso nunca ve un archivo a medio escribir
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.prune(openapi_url, keep_path=path)
+        return path
+
+    def prune(self, openapi_url, keep_path=None):
+        """Borra las versiones de la URL que superan keep_versions (0 = conservarlas todas)."""
+        if self.keep_versions <= 0:
+            return
+        versions = [p for p in self._versions(openapi_url) if p != keep_path]
+        for path in versions[self.keep_versions - (1 if keep_path else 0):]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass # Otro proceso ya la borró
+
+
+SPEC_STORE = CompiledSpecStore()
+
+
+def parse_spec_bytes(data:bytes, source_name:str) -> dict:
+    if is_yaml_document(source_name):
+        return parse_document(data, source_name)
+    if len(data) > SPEC_STREAMING_THRESHOLD_BYTES:
+        return parse_spec_stream(data[i:i + SPEC_STREAM_CHUNK_BYTES] for i in range(0, len(data), SPEC_STREAM_CHUNK_BYTES))
+    return json.loads(data)
+
+
+def precompile(spec_path, openapi_url, store):
+    with open(spec_path, "rb") as f:
+        data = f.read()
+    content_hash = content_hash_of(data)
+    # Los '$ref' relativos se resuelven contra la URL desde la que la app carga la especificación
+    spec_data, external_documents = bundle_spec(parse_spec_bytes(data, spec_path), openapi_url)
+    if external_documents:
+        content_hash = bundle_content_hash(content_hash, external_documents)
+    entry = compile_spec(spec_data, content_hash=content_hash, external_documents=external_documents)
+    return store.save(openapi_url, entry), entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Almacén de especificaciones OpenAPI precompiladas.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    precompile_parser = subparsers.add_parser("precompile", help="Compila un archivo de especificación y lo guarda en el almacén.")
+    precompile_parser.add_argument("spec_file", help="Archivo JSON o YAML de la especificación.")
+    precompile_parser.add_argument("--url", required=True, help="URL completa desde la que la app carga la especificación (URL base + ubicación del openapi.json).")
+    precompile_parser.add_argument("--dir", default=COMPILED_SPEC_DIR, help="Directorio del almacén (por defecto COMPILED_SPEC_DIR).")
+
+    args = parser.parse_args(argv)
+    if args.command == "precompile":
+        if not args.dir:
+            parser.error("No hay directorio de almacén: defina COMPILED_SPEC_DIR o use --dir.")
+        path, entry = precompile(args.spec_file, args.url, CompiledSpecStore(args.dir))
+        print(f"{path}: {len(entry.operation_plans)} operaciones, {len(entry.grouped_endpoints)} tags, {len(entry.ref_index)} refs, {entry.search_index.vocabulary_size} términos de búsqueda")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import codecs
+import json
+import zlib
+from collections.abc import Mapping
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class LazySchemaTable(Mapping):
+    """
+    Reemplazo de 'components.schemas' para especificaciones cargadas en streaming.
+    Cada esquema se guarda como texto JSON comprimido y se parsea recién la
+    primera vez que se accede a él.
+    """
+
+    def __init__(self):
+        self._raw = {}
+        self._loaded = {}
+
+    def __getstate__(self):
+        # Copias: otras sesiones pueden estar cargando esquemas mientras se serializa
+        return {"_raw": dict(self._raw), "_loaded": dict(self._loaded)}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def add_raw(self, name, json_text):
+        self._raw[name] = zlib.compress(json_text.encode("utf-8"), 1)
+
+    def __getitem__(self, name):
+        try:
+            return self._loaded[name]
+        except KeyError:
+            pass
+        schema_obj = json.loads(zlib.decompress(self._raw[name]))
+        self._loaded[name] = schema_obj
+        return schema_obj
+
+    def __contains__(self, name):
+        return name in self._raw
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    @property
+    def loaded_count(self):
+        return len(self._loaded)
+
+    @property
+    def compressed_size(self):
+        return sum(len(raw) for raw in self._raw.values())
+
+
+class _TextStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_unread=0):
+        # Descarta lo ya consumido y lee bloques hasta tener al menos min_unread caracteres por leer
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        pending = [self.buf]
+        unread = len(self.buf)
+        while not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                pending.append(self._utf8.decode(b"", final=True))
+                self.eof = True
+                break
+            text = self._utf8.decode(chunk)
+            pending.append(text)
+            unread += len(text)
+            if unread > min_unread:
+                break
+        self.buf = "".join(pending)
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self._error(f"Se esperaba '{char}'")
+        self.pos += 1
+
+    def _decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+                # Un número al final del buffer podría estar cortado: solo se acepta si hay más texto o fin de stream
+                if end < len(self.buf) or self.eof:
+                    start = self.pos
+                    self.pos = end
+                    return value, start, end
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # El valor no está completo en el buffer: duplicar lo pendiente evita re-parseos cuadráticos
+            self._fill(min_unread=2 * (len(self.buf) - self.pos))
+
+    def read_value(self):
+        return self._decode()[0]
+
+    def read_raw_value(self):
+        _, start, end = self._decode()
+        return self.buf[start:end]
+
+    def iter_object_keys(self):
+        """Recorre las claves de un objeto; el llamador debe consumir el valor de cada clave."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise self._error("Se esperaba una clave de objeto")
+            self.expect(":")
+            yield key
+            separator = self.peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise self._error("Se esperaba ',' o '}'")
+
+
+def _read_components(stream):
+    components = {}
+    for component_type in stream.iter_object_keys():
+        if component_type == "schemas" and stream.peek() == "{":
+            schemas = LazySchemaTable()
+            for schema_name in stream.iter_object_keys():
+                schemas.add_raw(schema_name, stream.read_raw_value())
+            components[component_type] = schemas
+        else:
+            components[component_type] = stream.read_value()
+    return components
+
+
+def parse_spec_stream(chunks):
+    """
+    Parsea una especificación OpenAPI (JSON) a partir de bloques de bytes sin
+    materializar el documento completo: cada path item se parsea por separado a
+    medida que llega y 'components.schemas' queda como LazySchemaTable.
+    """
+    stream = _TextStream(chunks)
+    spec = {}
+    for key in stream.iter_object_keys():
+        if key == "paths" and stream.peek() == "{":
+            spec[key] = {path_str: stream.read_value() for path_str in stream.iter_object_keys()}
+        elif key == "components" and stream.peek() == "{":
+            spec[key] = _read_components(stream)
+        else:
+            spec[key] = stream.read_value()
+    if stream.peek():
+        raise stream._error("Contenido extra después del documento")
+    return spec
@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+import requests
+from app_config import SPEC_WATCH_INTERVAL_SECONDS
+
+
+class SpecWatcher(threading.Thread):
+    """
+    Hilo que revalida periódicamente (If-None-Match) una especificación y deja la
+    versión nueva en SPEC_CACHE. Hay uno solo por especificación, compartido por
+    todas las sesiones que la vigilan; termina solo cuando ninguna sesión lo
+    consulta durante varios intervalos.
+    """
+
+    IDLE_INTERVALS = 3
+
+    def __init__(self, openapi_url, cache_key, fetch, interval_seconds):
+        super().__init__(name=f"spec-watcher-{openapi_url}", daemon=True)
+        self.openapi_url = openapi_url
+        self.cache_key = cache_key
+        self.fetch = fetch
+        self.interval_seconds = interval_seconds
+        self.last_checked_at = None
+        self.last_error = None
+        self._last_touched = time.monotonic()
+        self._stop_event = threading.Event()
+
+    def touch(self):
+        self._last_touched = time.monotonic()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            if time.monotonic() - self._last_touched > self.IDLE_INTERVALS * self.interval_seconds:
+                break
+            try:
+                self.fetch(self.openapi_url, self.cache_key, force_revalidate=True)
+                self.last_error = None
+            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+                self.last_error = str(e)
+            except Exception as e_fetch: # YAML o bundle inválido, disco, etc.: el vigilante sigue y lo informa
+                self.last_error = f"{type(e_fetch).__name__}: {e_fetch}"
+            self.last_checked_at = time.time()
+
+
+class SpecWatcherRegistry:
+    def __init__(self, interval_seconds=SPEC_WATCH_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+    def watch(self, openapi_url, cache_key, fetch):
+        """Devuelve el vigilante activo de la especificación, creándolo si no existe o ya terminó."""
+        with self._lock:
+            watcher = self._watchers.get(cache_key)
+            if watcher is None or not watcher.is_alive():
+                watcher = SpecWatcher(openapi_url, cache_key, fetch, self.interval_seconds)
+                self._watchers[cache_key] = watcher
+                watcher.start()
+            watcher.touch()
+            return watcher
+
+    def stop_all(self):
+        with self._lock:
+            for watcher in self._watchers.values():
+                watcher.stop()
+            self._watchers.clear()
+
+
+SPEC_WATCHERS = SpecWatcherRegistry()
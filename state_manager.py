@@ -1,4 +1,6 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
+from app_config import LAZY_ENDPOINT_RENDERING, FRAGMENT_ENDPOINT_PANELS, RESPONSE_CACHE_ENABLED
 
 def initialize_session_state():
     """
@@ -15,17 +17,38 @@ def initialize_session_state():
         'form_field_includes': {},         # Almacena qué campos de formulario están marcados para incluir
         
         'active_expander_id': None,        # ID del expander de endpoint actualmente abierto
+        'lazy_endpoint_rendering': LAZY_ENDPOINT_RENDERING, # Solo construir el formulario del endpoint abierto
         'endpoint_responses': {},          # Almacena las respuestas de las llamadas a la API
+        'pending_calls': {},               # Llamadas en segundo plano aún sin resultado (id de endpoint -> PendingCall)
+        'batch_runs': {},                  # Ejecuciones en modo batch de cada endpoint (id de endpoint -> BatchRun)
+        'paginated_results': {},           # Resultado de "traer todas las páginas" de cada endpoint (id -> PaginationRun)
+        'load_tests': {},                  # Pruebas de carga de cada endpoint (id de endpoint -> LoadTestRun)
+        'workflow_run': None,              # Última ejecución de un workflow (ver workflow.py)
+        'response_cache_enabled': RESPONSE_CACHE_ENABLED, # Responder GET/HEAD desde la caché de respuestas (ver response_cache.py)
+        'endpoint_response_meta': {},      # Datos de la última llamada de cada endpoint (conexión reutilizada, tiempo...)
+        'http_pool_holder_id': None,       # Identifica a esta sesión ante el pool de conexiones HTTP compartido
         'active_tab_name': None,           # Nombre del tag/grupo de API actualmente seleccionado
         
         'show_auth_dialog': False,         # Controla la visibilidad del diálogo de autorización
         'auth_dialog_security_schemes': {},# Esquemas de seguridad para mostrar en el diálogo de auth
         'auth_input_values': {},           # Valores ingresados por el usuario en el diálogo de auth
         'active_security_credentials': {}, # Credenciales activas (reemplaza 'auth_token')
+        'token_manager': None,             # TokenManager: vencimiento y renovación de las credenciales (ver token_manager.py)
+        'oauth_tokens': None,              # OAuthTokens: clientes OAuth2 y tokens en caché por scopes (ver oauth_flows.py)
         'auth_status_message': None,       # Mensaje general sobre el estado de autenticación (éxito/error/info)
         'user_info': {},                   # Información del usuario (si la API la devuelve al loguear)
         
         'openapi_spec': None,              # La especificación OpenAPI cargada (en formato JSON/dict)
+        'ref_index': None,                 # Índice de '$ref' precompilado de la especificación cargada
+        'operation_plans': {},             # Registro id de endpoint -> plan precompilado de la operación
+        'search_index': None,              # Índice invertido de búsqueda de endpoints (ver search_index.py)
+        'focused_endpoint_id': None,       # Endpoint elegido desde la búsqueda: se muestra solo ese
+        'search_results_page': 0,          # Página actual de la lista de resultados de búsqueda
+        'spec_source': None,               # De dónde se obtuvo la especificación (red, memoria, almacén local...)
+        'loaded_spec': None,               # CachedSpec cargada; base para el diff de la recarga incremental
+        'loaded_spec_key': None,           # Clave (URL base, ubicación del JSON) de la especificación cargada
+        'spec_update_message': None,       # Resumen de la última recarga incremental
+        'spec_watch_enabled': False,       # Vigilar cambios de la especificación y recargarla automáticamente
         'error_message': None,             # Mensaje de error general de la aplicación
         'grouped_endpoints': None,         # Endpoints agrupados por tags
         'current_api_url': "http://hugopessolano.duckdns.org:8000", # URL base de la API por defecto
@@ -35,4 +58,28 @@ def initialize_session_state():
 
     for key, value in default_states.items():
         if key not in st.session_state:
-            st.session_state[key] = value
\ No newline at end of file
+            st.session_state[key] = value
+
+def preserve_widget_state(widget_keys):
+    """
+    Mantiene en st.session_state los valores de widgets que no se dibujan en esta
+    ejecución (Streamlit descarta el estado de los widgets no renderizados), para
+    que el formulario de un endpoint cerrado conserve lo ingresado al reabrirlo.
+    """
+    for widget_key in widget_keys:
+        if widget_key in st.session_state:
+            st.session_state[widget_key] = st.session_state[widget_key]
+
+def rerun_endpoint_panel():
+    """
+    Re-ejecuta solo el panel de endpoint actual cuando los paneles son fragmentos
+    (FRAGMENT_ENDPOINT_PANELS) y la ejecución actual es la del fragmento; en caso
+    contrario (p. ej. el panel se dibujó dentro de una ejecución completa) re-ejecuta
+    toda la app.
+    """
+    if FRAGMENT_ENDPOINT_PANELS:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            pass
+    st.rerun()
@@ -0,0 +1,102 @@
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+# Los módulos de la app están en la raíz del repositorio (sin paquete instalable)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class ServedRequest:
+    method: str
+    path: str
+    query: dict
+    headers: dict
+    body: bytes
+
+    @property
+    def form(self):
+        return {k: v[0] for k, v in parse_qs(self.body.decode()).items()}
+
+
+class LocalServer:
+    """
+    Servidor HTTP/1.1 (keep-alive) en un hilo. respond(request) devuelve
+    (status, headers, body); un body dict o list se envía como JSON. Cada
+    request recibido queda en 'requests'.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self._lock = threading.Lock()
+        local_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def handle_request(self):
+                parts = urlsplit(self.path)
+                request = ServedRequest(
+                    self.command, parts.path, {k: v[0] for k, v in parse_qs(parts.query).items()},
+                    dict(self.headers), self.rfile.read(int(self.headers.get("Content-Length") or 0)),
+                )
+                with local_server._lock:
+                    local_server.requests.append(request)
+                status, headers, body = local_server.respond(request)
+                if isinstance(body, (dict, list)):
+                    headers = {"Content-Type": "application/json", **headers}
+                    body = json.dumps(body).encode()
+                elif isinstance(body, str):
+                    body = body.encode()
+                self.send_response_only(status)
+                if "Date" not in headers:
+                    self.send_header("Date", self.date_time_string())
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                if body and self.command != "HEAD" and status != 304:
+                    try:
+                        self.wfile.write(body)
+                    except ConnectionError:
+                        pass # El cliente cortó antes (p. ej. un timeout de lectura)
+
+            do_GET = do_POST = do_HEAD = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def requests_to(self, path):
+        with self._lock:
+            return [request for request in self.requests if request.path == path]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def serve():
+    """serve(respond) levanta un LocalServer que se cierra al terminar el test."""
+    servers = []
+
+    def start(respond):
+        servers.append(LocalServer(respond))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic_spec import make_synthetic_spec
+from form_tree import (
+    FIELD_JSON, FIELD_JSON_ARRAY, FIELD_OBJECT, FIELD_OBJECT_ARRAY, FIELD_VALUE, FormTreeCache, build_body, compile_form_tree,
+    shift_includes,
+)
+from spec_cache import compile_spec
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    # Con esta semilla, create_tag0_resource0 envía un Schema3: parent -> Schema1 -> Schema0, children -> [Schema1]
+    return compile_spec(make_synthetic_spec(n_tags=1, endpoints_per_tag=2, n_schemas=6, seed=1))
+
+
+@pytest.fixture(scope="module")
+def plans(compiled):
+    return {plan.operation_id: plan for plan in compiled.operation_plans.values()}
+
+
+@pytest.fixture(scope="module")
+def body_schema(plans):
+    return plans["create_tag0_resource0"].body.schema
+
+
+def fields_by_path(tree):
+    return {field.path: (index, field) for index, field in enumerate(tree.fields)}
+
+
+def test_compiles_a_flat_tree_with_subtree_ends(compiled, body_schema):
+    tree = compile_form_tree(body_schema, compiled.ref_index)
+    by_path = fields_by_path(tree)
+
+    assert [field.path for field in tree.fields if field.parent == -1] == [
+        ("id",), ("name",), ("status",), ("labels",), ("parent",), ("children",),
+    ]
+    name = by_path[("name",)][1]
+    assert name.kind == FIELD_VALUE and name.required and name.default_include and name.description == "Nombre 3"
+    assert by_path[("status",)][1].enum == ("active", "inactive", "pending")
+    assert by_path[("labels",)][1].kind == FIELD_JSON_ARRAY
+
+    # Los '$ref' anidados se despliegan en el orden de dibujo; 'end' salta el subárbol completo
+    parent_index, parent = by_path[("parent",)]
+    grandparent_index, grandparent = by_path[("parent", "parent")]
+    assert parent.kind == grandparent.kind == FIELD_OBJECT
+    assert grandparent.parent == parent_index and by_path[("parent", "parent", "name")][1].parent == grandparent_index
+    assert parent.end == by_path[("children",)][0] and tree.fields[grandparent.end].path == ("parent", "children")
+
+    children = by_path[("children",)][1]
+    assert children.kind == FIELD_OBJECT_ARRAY and children.end == len(tree.fields)
+    assert [field.path for field in children.items.fields if field.parent == -1] == [
+        ("id",), ("name",), ("status",), ("labels",), ("parent",), ("children",),
+    ]
+
+
+def test_recursive_schema_is_unfolded_once(compiled):
+    tree = compile_form_tree(compiled.ref_index.resolve("#/components/schemas/Node"), compiled.ref_index)
+    kinds = {field.path: field.kind for field in tree.fields}
+    # La repetición de Node dentro de sí mismo queda como JSON
+    assert kinds == {("value",): FIELD_VALUE, ("next",): FIELD_JSON}
+
+
+def test_max_depth_turns_deeper_objects_into_json(compiled, body_schema):
+    kinds = {field.path: field.kind for field in compile_form_tree(body_schema, compiled.ref_index, max_depth=1).fields}
+    assert kinds[("parent",)] == FIELD_OBJECT and kinds[("parent", "parent")] == FIELD_JSON
+    assert kinds[("children",)] == FIELD_OBJECT_ARRAY
+
+    kinds = {field.path: field.kind for field in compile_form_tree(body_schema, compiled.ref_index, max_depth=0).fields}
+    assert (kinds[("parent",)], kinds[("children",)]) == (FIELD_JSON, FIELD_JSON_ARRAY)
+
+
+def test_build_body_includes_nested_objects_and_skips_excluded_fields(compiled, body_schema):
+    tree = compile_form_tree(body_schema, compiled.ref_index)
+    values = {
+        "id": "",
+        "name": "n",
+        "labels": '["a", "b"]',
+        "parent": {"name": "padre", "id": 7, "parent": {"name": ""}},
+        "children": [{"name": "c1", "id": 1}, {"name": "c2", "id": 2}],
+    }
+    includes = {
+        ("id",): True, ("name",): True, ("labels",): True,
+        ("parent",): True, ("parent", "name"): True, ("parent", "id"): True, ("parent", "parent"): True, ("parent", "parent", "name"): False,
+        ("children",): True, ("children", 0, "name"): True, ("children", 0, "id"): True, ("children", 1, "name"): True, ("children", 1, "id"): False,
+    }
+
+    assert build_body(tree, values, includes) == {
+        "name": "n", # Un número vacío no se envía
+        "labels": ["a", "b"],
+        "parent": {"name": "padre", "id": 7}, # Un objeto sin campos incluidos no se envía
+        "children": [{"name": "c1", "id": 1}, {"name": "c2"}],
+    }
+    assert build_body(tree, {}, {}) is None
+
+
+def test_build_body_parses_recursive_json(compiled):
+    tree = compile_form_tree(compiled.ref_index.resolve("#/components/schemas/Node"), compiled.ref_index)
+    values = {"value": "r", "next": json.dumps({"value": "hijo"})}
+    includes = {("value",): True, ("next",): True}
+    assert build_body(tree, values, includes) == {"value": "r", "next": {"value": "hijo"}}
+
+
+def test_shift_includes_after_deleting_an_item():
+    includes = {("children",): True, ("children", 0, "name"): True, ("children", 1, "name"): False, ("children", 2, "id"): True, ("name",): True}
+    shift_includes(includes, ("children",), 1)
+    assert includes == {("children",): True, ("children", 0, "name"): True, ("children", 1, "id"): True, ("name",): True}
+
+
+def test_cache_reuses_the_compiled_tree(compiled, plans, body_schema):
+    cache = FormTreeCache(max_entries=1)
+    tree = cache.get(body_schema, compiled.ref_index)
+    assert cache.get(body_schema, compiled.ref_index) is tree
+    assert cache.get(plans["login"].body.schema, compiled.ref_index) is not tree
+    assert cache.get(body_schema, compiled.ref_index) is not tree # Se descartó al llenarse
@@ -0,0 +1,41 @@
+import socket
+
+from background_calls import PreparedRequest, send_prepared_request
+from http_pool import build_session
+
+
+def phase_names(result):
+    return [name for name, _, _ in result.timing["phases"]]
+
+
+def test_new_and_reused_connections_record_their_phases(serve):
+    server = serve(lambda request: (200, {}, {"ok": True, "padding": "x" * 2000}))
+    session = build_session()
+    # 'localhost' obliga a resolver el nombre: la fase DNS sale de la resolución real
+    prepared = PreparedRequest("GET", f"http://localhost:{server.port}/items", {"timeout": 5})
+
+    first = send_prepared_request(session, prepared)
+    second = send_prepared_request(session, prepared)
+
+    assert first.ok and second.ok
+    assert phase_names(first) == ["Preparación", "DNS", "Conexión TCP", "Envío", "Espera (TTFB)", "Descarga"]
+    assert first.timing["connection_reused"] is False
+    # Por la conexión keep-alive ya abierta no hay DNS ni TCP
+    assert phase_names(second) == ["Preparación", "Envío", "Espera (TTFB)", "Descarga"]
+    assert second.timing["connection_reused"] is True
+
+    phases = first.timing["phases"]
+    assert all(start <= end for _, start, end in phases)
+    assert all(phases[i][2] <= phases[i + 1][1] + 1e-6 for i in range(len(phases) - 1))
+    assert phases[-1][2] <= first.timing["total_ms"] + 1e-6
+    assert first.timing["request_bytes"] > 0 and first.timing["response_bytes"] > 2000
+
+
+def test_connect_failure_keeps_the_dns_phase():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1] # Nada escucha en ese puerto: se resuelve el nombre y la conexión falla
+    result = send_prepared_request(build_session(), PreparedRequest("GET", f"http://localhost:{port}/", {"timeout": 5}))
+
+    assert result.error and result.timing is not None
+    assert phase_names(result)[:2] == ["Preparación", "DNS"]
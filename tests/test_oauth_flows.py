@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+import requests
+
+from benchmarks.synthetic_spec import make_synthetic_spec
+from oauth_flows import OAuthClient, OAuthTokens
+from request_engine import RequestEngine
+from spec_cache import compile_spec
+from token_manager import TokenManager
+
+# Scopes que declara cada GET de la especificación sintética para el esquema 'oauth'
+OPERATION_SCOPES = {"get_tag0_resource0": ["write", "read"], "get_tag0_resource1": ["read"], "get_tag0_resource2": ["admin"]}
+ITEM = {"path": {"item_id": 1}}
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    spec = make_synthetic_spec(n_tags=1, endpoints_per_tag=3, n_schemas=5)
+    spec["components"]["securitySchemes"]["oauth"] = {"type": "oauth2", "flows": {"clientCredentials": {
+        "tokenUrl": "/token", "scopes": {"read": "", "write": "", "admin": ""},
+    }}}
+    for path_item in spec["paths"].values():
+        operation = path_item.get("get")
+        if operation:
+            operation["security"] = [{"oauth": OPERATION_SCOPES[operation["operationId"]]}]
+    return compile_spec(spec)
+
+
+@pytest.fixture
+def api(serve):
+    """
+    '/token' (tokenUrl relativo al servidor) entrega 'tok-N' con el scope pedido y
+    cuenta los pedidos por grant_type; el resto de los paths devuelve el
+    Authorization recibido.
+    """
+    state = {"grants": Counter(), "issued": 0, "delay_seconds": 0.0, "expires_in": 3600, "accept_refresh": True}
+    lock = threading.Lock()
+
+    def respond(request):
+        if request.path != "/token":
+            return 200, {}, {"authorization": request.headers.get("Authorization")}
+        form = request.form
+        grant_type = form.get("grant_type")
+        with lock:
+            state["grants"][grant_type] += 1
+        time.sleep(state["delay_seconds"])
+        if grant_type == "refresh_token" and not state["accept_refresh"]:
+            return 400, {}, {"error": "invalid_grant"}
+        if form.get("scope") == "admin":
+            return 400, {}, {"error": "invalid_scope", "error_description": "scope no permitido"}
+        with lock:
+            state["issued"] += 1
+            token = f"tok-{state['issued']}"
+        return 200, {}, {"access_token": token, "token_type": "Bearer", "expires_in": state["expires_in"],
+                         "refresh_token": f"rt-{token}", "scope": form.get("scope", "")}
+
+    server = serve(respond)
+    server.state = state
+    return server
+
+
+def oauth_engine(compiled, api, refresh_margin=30):
+    session = requests.Session()
+    oauth = OAuthTokens(session, TokenManager(refresh_margin=refresh_margin, proactive=False), timeout=5)
+    engine = RequestEngine(compiled, api.url, session=session, timeout=5, oauth=oauth)
+    engine.set_oauth_client("oauth", OAuthClient("clientCredentials", "cli", "sec"))
+    return engine
+
+
+def sent_token(engine, operation_id):
+    return engine.execute(operation_id, ITEM).response_data["authorization"]
+
+
+def test_token_with_more_scopes_is_reused(compiled, api):
+    engine = oauth_engine(compiled, api)
+
+    assert sent_token(engine, "get_tag0_resource0") == "Bearer tok-1"
+    assert api.requests_to("/token")[0].form["scope"] == "read write"
+    assert sent_token(engine, "get_tag0_resource1") == "Bearer tok-1"
+    assert api.state["grants"]["client_credentials"] == 1
+
+    # Un token de menos scopes no sirve para la operación que pide más
+    engine = oauth_engine(compiled, api)
+    assert sent_token(engine, "get_tag0_resource1") == "Bearer tok-2"
+    assert sent_token(engine, "get_tag0_resource0") == "Bearer tok-3"
+
+
+def test_failed_token_request_drops_the_scheme_with_a_notice(compiled, api):
+    engine = oauth_engine(compiled, api)
+    plan = engine.operation("get_tag0_resource2")
+    notices = []
+
+    assert engine.oauth.credentials_for(plan, {"oauth": {"type": "oauth2", "value": "manual"}}, notices) == {}
+    assert notices and "scope no permitido" in notices[0][1]
+    # El request se envía sin el token que no se pudo obtener
+    assert sent_token(engine, "get_tag0_resource2") is None
+
+
+def test_concurrent_requests_fetch_a_single_token(compiled, api):
+    api.state["delay_seconds"] = 0.3
+    engine = oauth_engine(compiled, api)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(sent_token(engine, "get_tag0_resource1"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert values == ["Bearer tok-1"] * 8
+    assert api.state["grants"]["client_credentials"] == 1
+
+
+@pytest.mark.parametrize("accept_refresh, grants", [
+    (True, {"client_credentials": 1, "refresh_token": 1}),
+    (False, {"client_credentials": 2, "refresh_token": 1}), # Refresh token rechazado: se repite el flujo
+])
+def test_expired_token_is_renewed(compiled, api, accept_refresh, grants):
+    api.state["expires_in"] = 1
+    api.state["accept_refresh"] = accept_refresh
+    engine = oauth_engine(compiled, api, refresh_margin=0)
+    assert sent_token(engine, "get_tag0_resource1") == "Bearer tok-1"
+
+    time.sleep(1.1)
+    assert sent_token(engine, "get_tag0_resource1") == "Bearer tok-2"
+    assert api.state["grants"] == Counter(grants)
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+import requests
+
+from benchmarks.synthetic_spec import make_synthetic_spec
+from pagination import CounterPagination, CursorPagination, LinkPagination, NextUrlPagination, PaginationRun
+from request_builder import RequestInputs, build_request
+from spec_cache import compile_spec
+
+ITEMS = [{"id": i, "name": f"item {i}"} for i in range(7)]
+# Parámetros de query que se agregan a cada GET de la especificación sintética (todos ya traen 'limit')
+PAGING_PARAMS = {"get_tag0_resource0": "offset", "get_tag0_resource1": "page", "get_tag0_resource2": "starting_after"}
+
+
+@pytest.fixture(scope="module")
+def plans():
+    spec = make_synthetic_spec(n_tags=1, endpoints_per_tag=4, n_schemas=10)
+    for path_item in spec["paths"].values():
+        operation = path_item.get("get")
+        if operation and operation["operationId"] in PAGING_PARAMS:
+            param = PAGING_PARAMS[operation["operationId"]]
+            operation["parameters"].append({"name": param, "in": "query", "schema": {"type": "string"}})
+    return {plan.operation_id: plan for plan in compile_spec(spec).operation_plans.values()}
+
+
+def paged_api(style):
+    """Respuesta de cada página según el estilo de paginación; 'limit' define el tamaño de página."""
+    def respond(request):
+        limit = int(request.query.get("limit", 3))
+        if style == "offset":
+            start = int(request.query.get("offset", 0))
+        elif style == "page":
+            start = (int(request.query.get("page", 1)) - 1) * limit
+        elif style == "cursor":
+            start = int(request.query.get("starting_after", -1)) + 1
+        else:
+            start = int(request.query.get("from", 0))
+        page = ITEMS[start:start + limit]
+        more = start + limit < len(ITEMS)
+        if style == "link":
+            headers = {"Link": f'<{request.path}?from={start + limit}&limit={limit}>; rel="next"'} if more else {}
+            return 200, headers, page
+        if style == "next_url":
+            return 200, {}, {"results": page, "_links": {"next": {"href": f"{request.path}?from={start + limit}&limit={limit}" if more else None}}}
+        if style == "cursor":
+            return 200, {}, {"data": page, "meta": {"next_cursor": str(page[-1]["id"]) if more else None}}
+        return 200, {}, {"items": page}
+    return respond
+
+
+def run_pagination(serve, plan, style, limit=3, **kwargs):
+    server = serve(paged_api(style))
+    inputs = RequestInputs(path_params={"item_id": 1}, query_params={"limit": limit})
+    prepared = build_request(plan, server.url, inputs, {})
+    run = PaginationRun(plan.id, plan, prepared, requests.Session(), **kwargs).start()
+    deadline = time.monotonic() + 10
+    while not run.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert run.done and run.error is None
+    return run, server
+
+
+@pytest.mark.parametrize("operation_id, style, style_type", [
+    ("get_tag0_resource3", "link", LinkPagination),
+    ("get_tag0_resource3", "next_url", NextUrlPagination),
+    ("get_tag0_resource2", "cursor", CursorPagination),
+    ("get_tag0_resource0", "offset", CounterPagination),
+    ("get_tag0_resource1", "page", CounterPagination),
+])
+def test_follows_every_page(serve, plans, operation_id, style, style_type):
+    run, server = run_pagination(serve, plans[operation_id], style)
+
+    assert isinstance(run.style, style_type)
+    assert run.pages == 3 and run.stop_reason == "última página"
+    assert list(run.buffer.iter_rows()) == ITEMS
+    # Cada página conserva los parámetros de la primera (limit) salvo los que trae la URL siguiente
+    assert all(request.query["limit"] == "3" for request in server.requests)
+
+
+def test_counter_styles_use_the_operation_params(serve, plans):
+    offset_run, offset_server = run_pagination(serve, plans["get_tag0_resource0"], "offset")
+    page_run, page_server = run_pagination(serve, plans["get_tag0_resource1"], "page")
+
+    assert (offset_run.style.param, offset_run.style.by_items, offset_run.style.limit_param) == ("offset", True, "limit")
+    assert [request.query.get("offset") for request in offset_server.requests] == [None, "3", "6"]
+    assert (page_run.style.param, page_run.style.by_items) == ("page", False)
+    assert [request.query.get("page") for request in page_server.requests] == [None, "2", "3"]
+
+
+def test_cursor_needs_a_cursor_param(serve, plans):
+    # La operación no declara parámetro de cursor: el campo next_cursor de la respuesta no alcanza
+    run, server = run_pagination(serve, plans["get_tag0_resource3"], "cursor")
+    assert run.style is None and run.stop_reason == "no se detectó paginación"
+    assert run.buffer.row_count == 3 and len(server.requests) == 1
+
+
+def test_stops_at_max_pages(serve, plans):
+    run, server = run_pagination(serve, plans["get_tag0_resource0"], "offset", limit=2, max_pages=2)
+    assert run.pages == 2 and run.stop_reason == "límite de 2 páginas"
+    assert run.buffer.row_count == 4 and len(server.requests) == 2
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from benchmarks.synthetic_spec import make_synthetic_spec
+from request_builder import RequestInputs, SecurityInjectorCache, build_request
+from spec_cache import compile_spec
+
+ITEM = RequestInputs(path_params={"item_id": 1})
+
+
+def compiled_plans():
+    spec = make_synthetic_spec(n_tags=1, endpoints_per_tag=3, n_schemas=5)
+    return {plan.operation_id: plan for plan in compile_spec(spec).operation_plans.values()}
+
+
+@pytest.fixture
+def plans():
+    return compiled_plans()
+
+
+def bearer(value):
+    return {"bearerAuth": {"type": "http", "scheme": "bearer", "value": value}}
+
+
+def authorization(plan, credentials, injectors):
+    prepared = build_request(plan, "https://api.test", ITEM, credentials, injectors=injectors, describe=False)
+    return prepared.kwargs["headers"].get("Authorization")
+
+
+def test_injector_is_reused_for_the_same_plan_and_credentials(plans):
+    injectors = SecurityInjectorCache()
+    plan = plans["get_tag0_resource0"]
+    assert authorization(plan, bearer("a"), injectors) == "Bearer a"
+    assert authorization(plan, bearer("a"), injectors) == "Bearer a"
+    assert (injectors.hits, injectors.misses) == (1, 1)
+    assert injectors.injector(plan, bearer("a")) is injectors.injector(plan, bearer("a"))
+
+
+def test_injector_is_rebuilt_when_credentials_change(plans):
+    injectors = SecurityInjectorCache()
+    plan = plans["get_tag0_resource0"]
+    assert authorization(plan, bearer("a"), injectors) == "Bearer a"
+    # Un token renovado es otra credencial: no se envía el anterior
+    assert authorization(plan, bearer("b"), injectors) == "Bearer b"
+    assert authorization(plan, {}, injectors) is None
+    assert injectors.misses == 2
+
+
+def test_injector_is_rebuilt_when_the_spec_is_recompiled(plans):
+    injectors = SecurityInjectorCache()
+    old_plan = plans["get_tag0_resource0"]
+    injector = injectors.injector(old_plan, bearer("a"))
+
+    new_plan = compiled_plans()["get_tag0_resource0"]
+    assert new_plan is not old_plan and new_plan.id == old_plan.id
+    assert injectors.injector(new_plan, bearer("a")) is not injector
+    assert injectors.misses == 2
+
+
+def test_login_operations_get_no_injector(plans):
+    injectors = SecurityInjectorCache()
+    assert authorization(plans["login"], bearer("a"), injectors) is None
+    assert injectors.misses == 0
+
+
+def test_least_recently_used_injector_is_evicted(plans):
+    injectors = SecurityInjectorCache(max_entries=2)
+    first, second, third = (plans[f"get_tag0_resource{e}"] for e in range(3))
+    kept = injectors.injector(first, bearer("a"))
+    injectors.injector(second, bearer("a"))
+    injectors.injector(first, bearer("a")) # Usado hace menos que 'second'
+    injectors.injector(third, bearer("a"))
+
+    assert injectors.injector(first, bearer("a")) is kept
+    injectors.injector(second, bearer("a"))
+    assert (injectors.hits, injectors.misses) == (2, 4)
+
+
+def test_counters_are_exact_under_concurrency(plans):
+    injectors = SecurityInjectorCache()
+    plan = plans["get_tag0_resource0"]
+    injectors.injector(plan, bearer("a"))
+
+    def lookups():
+        for _ in range(500):
+            injectors.injector(plan, bearer("a"))
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (injectors.hits, injectors.misses) == (4000, 1)
@@ -0,0 +1,123 @@
+import socket
+import time
+
+import pytest
+import requests
+
+from background_calls import ERROR_CONNECTION, ERROR_TIMEOUT, STATUS_CIRCUIT_OPEN
+from benchmarks.synthetic_spec import make_synthetic_spec
+from request_builder import RequestInputs, build_request
+from resilience import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, ResilienceLayer
+from spec_cache import compile_spec
+
+# Reintentos rápidos y sin circuito, salvo en los tests que lo prueban
+FAST_RETRIES = dict(max_retries=3, backoff_seconds=0.01, backoff_max_seconds=0.04, breaker_failures=0)
+
+
+@pytest.fixture(scope="module")
+def plans():
+    spec = make_synthetic_spec(n_tags=1, endpoints_per_tag=1, n_schemas=5)
+    return {plan.operation_id: plan for plan in compile_spec(spec).operation_plans.values()}
+
+
+def prepare(plans, base_url, operation_id="get_tag0_resource0", timeout=5):
+    inputs = RequestInputs(path_params={"item_id": 1}, body={"name": "x"} if operation_id.startswith("create") else None)
+    return build_request(plans[operation_id], base_url, inputs, {}, timeout=timeout)
+
+
+def scripted_api(serve, *responses):
+    """Responde en orden los (status, headers) dados; el último se repite."""
+    def respond(request):
+        status, headers = responses[min(len(server.requests), len(responses)) - 1]
+        return status, headers, {"status": status}
+    server = serve(respond)
+    return server
+
+
+def closed_port_url():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+
+def test_retry_status_honours_retry_after(serve, plans):
+    server = scripted_api(serve, (503, {"Retry-After": "0"}), (200, {}))
+    result = ResilienceLayer(**FAST_RETRIES).send(requests.Session(), prepare(plans, server.url))
+
+    assert result.ok and result.response_data == {"status": 200}
+    assert result.retries == [{"reason": "status 503, Retry-After", "delay_seconds": 0.0}]
+    assert len(server.requests) == 2
+
+
+def test_retry_after_above_the_max_is_not_retried(serve, plans):
+    server = scripted_api(serve, (429, {"retry-after": "120"}), (200, {}))
+    result = ResilienceLayer(**FAST_RETRIES).send(requests.Session(), prepare(plans, server.url))
+    assert result.status_code == 429 and result.retries == [] and len(server.requests) == 1
+
+
+def test_connection_errors_are_retried_with_backoff(plans):
+    layer = ResilienceLayer(**FAST_RETRIES)
+    result = layer.send(requests.Session(), prepare(plans, closed_port_url()))
+
+    assert result.error_kind == ERROR_CONNECTION
+    assert [retry["reason"] for retry in result.retries] == ["error de conexión"] * 3
+    assert all(0 <= retry["delay_seconds"] <= 0.04 for retry in result.retries)
+
+
+@pytest.mark.parametrize("operation_id, status", [("get_tag0_resource0", 404), ("get_tag0_resource0", 500), ("create_tag0_resource0", 503)])
+def test_not_retried(serve, plans, operation_id, status):
+    # 404 y 500 no están en retry_status; un POST no es idempotente
+    server = scripted_api(serve, (status, {}), (200, {}))
+    result = ResilienceLayer(**FAST_RETRIES).send(requests.Session(), prepare(plans, server.url, operation_id))
+    assert result.status_code == status and result.retries == [] and len(server.requests) == 1
+
+
+def test_read_timeouts_are_not_retried(serve, plans):
+    server = serve(lambda request: (time.sleep(0.5), (200, {}, {}))[1])
+    result = ResilienceLayer(**FAST_RETRIES).send(requests.Session(), prepare(plans, server.url, timeout=0.1))
+    assert result.error_kind == ERROR_TIMEOUT and result.retries == [] and len(server.requests) == 1
+
+
+def test_backoff_grows_up_to_the_max():
+    layer = ResilienceLayer(backoff_seconds=0.5, backoff_max_seconds=4.0)
+    for retry_number, ceiling in ((0, 0.5), (1, 1.0), (2, 2.0), (3, 4.0), (6, 4.0)):
+        delays = [layer.backoff_delay(retry_number) for _ in range(200)]
+        assert 0 <= min(delays) and max(delays) <= ceiling
+
+
+def test_circuit_opens_after_consecutive_failures(serve, plans):
+    server = scripted_api(serve, (503, {}))
+    layer = ResilienceLayer(max_retries=0, breaker_failures=2, breaker_reset_seconds=60)
+    session = requests.Session()
+    results = [layer.send(session, prepare(plans, server.url)) for _ in range(3)]
+
+    assert [result.status_code for result in results[:2]] == [503, 503]
+    assert results[1].circuit_state == CIRCUIT_OPEN
+    # Con el circuito abierto el tercer request falla sin enviarse
+    assert results[2].status_code == STATUS_CIRCUIT_OPEN and len(server.requests) == 2
+
+
+def test_half_open_probe_closes_the_circuit(serve, plans):
+    server = scripted_api(serve, (503, {}), (200, {}))
+    layer = ResilienceLayer(max_retries=0, breaker_failures=1, breaker_reset_seconds=0)
+    session = requests.Session()
+    assert layer.send(session, prepare(plans, server.url)).circuit_state == CIRCUIT_OPEN
+
+    probe = layer.send(session, prepare(plans, server.url))
+    assert probe.ok and probe.circuit_state == CIRCUIT_CLOSED
+
+
+def test_failed_send_releases_the_half_open_probe(plans):
+    layer = ResilienceLayer(max_retries=0, breaker_failures=1, breaker_reset_seconds=0)
+    prepared = prepare(plans, "https://api.test", "create_tag0_resource0")
+    guard = layer.host(prepared.url)
+    guard.breaker.record(failed=True)
+    assert guard.breaker.state == CIRCUIT_OPEN
+
+    def broken_send(session, prepared, cancel_event):
+        raise RuntimeError("fallo inesperado")
+
+    with pytest.raises(RuntimeError):
+        layer.send(requests.Session(), prepared, send=broken_send)
+    assert guard.breaker.state == CIRCUIT_HALF_OPEN
+    assert guard.breaker.allow() # La prueba quedó libre para el siguiente request
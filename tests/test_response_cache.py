@@ -0,0 +1,141 @@
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from background_calls import PreparedRequest
+from response_cache import (
+    CACHE_HIT, CACHE_REVALIDATED, CachedResponse, ResponseCache, cache_key, freshness_lifetime, is_storable,
+)
+
+
+@pytest.fixture
+def api(serve):
+    """Cada path responde con los headers de caché que indica su nombre; '/etag' contesta 304 a su ETag."""
+    def respond(request):
+        version = request.query.get("v", "1")
+        if request.path == "/etag":
+            if request.headers.get("If-None-Match") == '"e1"':
+                return 304, {"ETag": '"e1"', "Cache-Control": "max-age=0", "X-Version": "2", "Content-Type": "text/plain"}, b""
+            return 200, {"ETag": '"e1"', "Cache-Control": "no-cache", "X-Version": "1"}, {"version": version}
+        headers = {
+            "/max-age": {"Cache-Control": "max-age=60"},
+            "/expires": {"Date": formatdate(usegmt=True), "Expires": formatdate(timeval=time.time() + 60, usegmt=True)},
+            "/no-store": {"Cache-Control": "no-store, max-age=60"},
+            "/vary-star": {"Cache-Control": "max-age=60", "Vary": "*"},
+            "/private": {"Cache-Control": "max-age=60"},
+        }[request.path]
+        return 200, headers, {"path": request.path, "auth": request.headers.get("Authorization"), "version": version}
+
+    return serve(respond)
+
+
+def get(api, path, headers=None, params=None):
+    return PreparedRequest("GET", f"{api.url}{path}", {"headers": headers or {}, "params": params, "timeout": 5})
+
+
+def send_twice(cache, api, path):
+    session = requests.Session()
+    first = cache.send(session, get(api, path))
+    second = cache.send(session, get(api, path))
+    return first, second, len(api.requests_to(path))
+
+
+@pytest.mark.parametrize("path", ["/max-age", "/expires"])
+def test_fresh_responses_are_served_from_memory(api, path):
+    first, second, network_calls = send_twice(ResponseCache(directory=""), api, path)
+    assert first.cache_status is None and second.cache_status == CACHE_HIT
+    assert second.response_data == first.response_data and network_calls == 1
+
+
+@pytest.mark.parametrize("path", ["/no-store", "/vary-star"])
+def test_uncacheable_responses_always_go_to_the_network(api, path):
+    cache = ResponseCache(directory="")
+    _, second, network_calls = send_twice(cache, api, path)
+    assert second.cache_status is None and network_calls == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_max_age_takes_precedence_over_expires():
+    now = formatdate(usegmt=True)
+    assert freshness_lifetime({"Date": now, "Expires": formatdate(timeval=time.time() + 30, usegmt=True)}) in (29, 30)
+    assert freshness_lifetime({"cache-control": "public, max-age=5", "Date": now, "Expires": formatdate(usegmt=True)}) == 5
+    assert freshness_lifetime({"Expires": "no es una fecha", "Date": now}) == 0
+
+
+def test_304_merges_the_new_headers_into_the_stored_response(api):
+    cache = ResponseCache(directory="")
+    session = requests.Session()
+    first = cache.send(session, get(api, "/etag"))
+    stored = cache.get(cache_key(get(api, "/etag")))
+
+    revalidated = cache.send(session, get(api, "/etag", params={"v": "1"}))
+    assert revalidated.cache_status is None # Otra query: otra entrada
+
+    revalidated = cache.send(session, get(api, "/etag"))
+    assert api.requests_to("/etag")[-1].headers["If-None-Match"] == '"e1"'
+    assert revalidated.cache_status == CACHE_REVALIDATED
+    assert revalidated.response_data == first.response_data
+    assert revalidated.headers["X-Version"] == "2"
+    # Los headers que describen el body no los cambia un 304
+    assert revalidated.headers["Content-Type"] == "application/json"
+    # La entrada anterior no se modifica (otro hilo puede estar sirviéndola)
+    assert stored.headers["X-Version"] == "1"
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_credentials_scope_the_cache_key(api):
+    cache = ResponseCache(directory="")
+    session = requests.Session()
+    cache.send(session, get(api, "/private", {"Authorization": "Bearer alice"}))
+    bob = cache.send(session, get(api, "/private", {"Authorization": "Bearer bob"}))
+    again = cache.send(session, get(api, "/private", {"authorization": "Bearer alice"}))
+
+    assert bob.cache_status is None and bob.response_data["auth"] == "Bearer bob"
+    assert again.cache_status == CACHE_HIT and again.response_data["auth"] == "Bearer alice"
+    assert cache_key(get(api, "/private", params={"a": 1, "b": 2})) == cache_key(get(api, "/private", params={"b": 2, "a": 1}))
+
+
+def stored_response(size):
+    return CachedResponse(200, {"Cache-Control": "max-age=60"}, b"x" * size, "text/plain", "utf-8")
+
+
+def test_memory_tier_evicts_least_recently_used_bytes():
+    entry_size = stored_response(100).size_bytes
+    cache = ResponseCache(memory_budget=entry_size * 2, directory="")
+    cache.put("a", stored_response(100))
+    cache.put("b", stored_response(100))
+    cache.get("a")
+    cache.put("c", stored_response(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["memory_bytes"] == entry_size * 2
+    # Una respuesta más grande que todo el presupuesto no se guarda en memoria
+    cache.put("big", stored_response(entry_size * 3))
+    assert cache.get("big") is None and cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path, api):
+    session = requests.Session()
+    ResponseCache(directory=str(tmp_path)).send(session, get(api, "/max-age"))
+
+    restarted = ResponseCache(directory=str(tmp_path))
+    result = restarted.send(session, get(api, "/max-age"))
+    assert result.cache_status == CACHE_HIT and result.response_data["path"] == "/max-age"
+    assert len(api.requests_to("/max-age")) == 1
+
+    restarted.clear()
+    assert not list(tmp_path.glob("*.response.pickle"))
+
+
+def test_other_methods_are_never_cached(api):
+    cache = ResponseCache(directory="")
+    session = requests.Session()
+    post = PreparedRequest("POST", f"{api.url}/max-age", {"timeout": 5})
+    results = [cache.send(session, post) for _ in range(2)]
+
+    assert [result.cache_status for result in results] == [None, None]
+    assert len(api.requests_to("/max-age")) == 2
+    assert not is_storable(post, results[0])
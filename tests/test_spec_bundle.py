@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+
+import pytest
+
+from app_config import YAML_AVAILABLE
+from ref_index import RefIndex
+from spec_bundle import BUNDLED_DOCUMENTS_KEY, ExternalDocumentCache, bundle_content_hash, bundle_spec, parse_document
+
+needs_yaml = pytest.mark.skipif(not YAML_AVAILABLE, reason="PyYAML no está instalado")
+
+ROOT_YAML = """
+openapi: 3.0.3
+info: {title: Pets, version: "1"}
+paths:
+  /pets:
+    get:
+      tags: [pets]
+      responses:
+        200:
+          description: ok
+          content:
+            application/json:
+              schema:
+                type: array
+                items: {$ref: 'schemas/pets.yaml#/Pet'}
+"""
+
+PETS_YAML = """
+Pet:
+  type: object
+  properties:
+    name: {type: string}
+    tag: {$ref: '#/Tag'}
+Tag:
+  type: string
+  enum: [{tags}]
+"""
+
+
+@pytest.fixture
+def spec_files(tmp_path, serve):
+    (tmp_path / "schemas").mkdir()
+    (tmp_path / "openapi.yaml").write_text(ROOT_YAML)
+    (tmp_path / "schemas" / "pets.yaml").write_text(PETS_YAML.replace("{tags}", "dog, cat"))
+
+    def respond(request):
+        path = tmp_path / request.path.lstrip("/")
+        if not path.is_file():
+            return 404, {}, b""
+        content = path.read_bytes()
+        etag = '"' + hashlib.sha256(content).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "application/yaml", "ETag": etag}, content
+
+    server = serve(respond)
+    server.root = tmp_path
+    return server
+
+
+def load_bundle(server, cache):
+    root_url = f"{server.url}/openapi.yaml"
+    content = (server.root / "openapi.yaml").read_bytes()
+    bundled, document_hashes = bundle_spec(parse_document(content, root_url), root_url, cache=cache)
+    return bundled, bundle_content_hash(hashlib.sha256(content).hexdigest(), document_hashes)
+
+
+@needs_yaml
+def test_external_refs_are_bundled_as_local_refs(spec_files):
+    bundled, _ = load_bundle(spec_files, ExternalDocumentCache(ttl_seconds=0))
+
+    items = bundled["paths"]["/pets"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]["items"]
+    assert items == {"$ref": f"#/{BUNDLED_DOCUMENTS_KEY}/schemas_pets.yaml/Pet"}
+    ref_index = RefIndex(bundled)
+    pet = ref_index.resolve(items["$ref"])
+    assert set(pet["properties"]) == {"name", "tag"}
+    # El '$ref' local del documento externo apunta ahora dentro del documento combinado
+    assert ref_index.resolve(pet["properties"]["tag"]["$ref"])["enum"] == ["dog", "cat"]
+    assert [request.path for request in spec_files.requests] == ["/schemas/pets.yaml"]
+
+
+@needs_yaml
+def test_bundle_hash_follows_the_referenced_documents(spec_files):
+    cache = ExternalDocumentCache(ttl_seconds=0)
+    first, first_hash = load_bundle(spec_files, cache)
+    _, same_hash = load_bundle(spec_files, cache)
+    assert same_hash == first_hash
+    # Sin cambios, el documento externo se revalida con su ETag
+    assert "If-None-Match" in spec_files.requests[-1].headers
+
+    (spec_files.root / "schemas" / "pets.yaml").write_text(PETS_YAML.replace("{tags}", "dog, cat, fish"))
+    changed, changed_hash = load_bundle(spec_files, cache)
+    assert changed_hash != first_hash
+    assert changed[BUNDLED_DOCUMENTS_KEY]["schemas_pets.yaml"]["Tag"]["enum"] == ["dog", "cat", "fish"]
+    assert first[BUNDLED_DOCUMENTS_KEY]["schemas_pets.yaml"]["Tag"]["enum"] == ["dog", "cat"]
+
+
+@needs_yaml
+def test_documents_within_the_ttl_are_not_fetched_again(spec_files):
+    cache = ExternalDocumentCache(ttl_seconds=60)
+    load_bundle(spec_files, cache)
+    load_bundle(spec_files, cache)
+    assert len(spec_files.requests) == 1
+
+
+def test_referenced_documents_are_fetched_in_parallel(serve):
+    in_flight = {"now": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def respond(request):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        time.sleep(0.2)
+        with lock:
+            in_flight["now"] -= 1
+        name = request.path.rsplit("/", 1)[-1].split(".")[0]
+        return 200, {}, {name.capitalize(): {"type": "object", "properties": {"id": {"type": "integer"}}}}
+
+    server = serve(respond)
+    root_url = f"{server.url}/openapi.json"
+    names = ("users", "orders", "items", "tags")
+    spec = {"openapi": "3.0.3", "paths": {}, "components": {"schemas": {
+        name.capitalize(): {"$ref": f"{name}.json#/{name.capitalize()}"} for name in names
+    }}}
+
+    bundled, document_hashes = bundle_spec(spec, root_url, cache=ExternalDocumentCache(), max_workers=4)
+
+    assert len(document_hashes) == 4 and in_flight["peak"] > 1
+    assert RefIndex(bundled).resolve(bundled["components"]["schemas"]["Orders"]["$ref"])["type"] == "object"
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+import api_service
+from spec_cache import SpecCache
+
+SPEC = {"openapi": "3.0.3", "info": {"title": "Pets", "version": "1"}, "paths": {
+    "/pets": {"get": {"tags": ["pets"], "operationId": "listPets", "responses": {"200": {"description": "ok"}}}},
+}}
+
+
+def spec_with_etag(etag, title="Pets"):
+    def respond(request):
+        if request.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"}, {**SPEC, "info": {"title": title, "version": "1"}}
+    return respond
+
+
+@pytest.fixture
+def spec_cache(monkeypatch, tmp_path):
+    # Caché propia por test; el almacén en disco va a un directorio temporal
+    cache = SpecCache(max_entries=2, ttl_seconds=0.3)
+    monkeypatch.setattr(api_service, "SPEC_CACHE", cache)
+    monkeypatch.setattr(api_service.SPEC_STORE, "directory", str(tmp_path))
+    return cache
+
+
+def test_fresh_entries_are_served_without_network(serve, spec_cache):
+    server = serve(spec_with_etag('"v1"'))
+    url = f"{server.url}/openapi.json"
+    key = SpecCache.make_key(server.url, "openapi.json")
+
+    first, source = api_service.fetch_api_spec(url, key)
+    assert source == "red" and first.spec["info"]["title"] == "Pets"
+    second, source = api_service.fetch_api_spec(url, key)
+    assert second is first and source == "memoria"
+    assert len(server.requests) == 1
+    assert spec_cache.stats()["hits"] == 1 and spec_cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_revalidated_with_a_304(serve, spec_cache):
+    server = serve(spec_with_etag('"v1"'))
+    url = f"{server.url}/openapi.json"
+    key = SpecCache.make_key(server.url, "openapi.json")
+    first, _ = api_service.fetch_api_spec(url, key)
+    assert first.conditional_headers() == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT"}
+
+    time.sleep(0.35)
+    assert not first.is_fresh(spec_cache.ttl_seconds)
+    revalidated, source = api_service.fetch_api_spec(url, key)
+
+    assert revalidated is first and source == "revalidada"
+    assert server.requests[-1].headers["If-None-Match"] == '"v1"'
+    # mark_revalidated reinicia el TTL: la siguiente consulta no va a la red
+    assert first.is_fresh(spec_cache.ttl_seconds)
+    api_service.fetch_api_spec(url, key)
+    assert len(server.requests) == 2
+    assert spec_cache.stats()["revalidations"] == 1
+
+
+def test_changed_spec_replaces_the_entry(serve, spec_cache):
+    version = {"etag": '"v1"', "title": "Pets"}
+    server = serve(lambda request: spec_with_etag(version["etag"], version["title"])(request))
+    url = f"{server.url}/openapi.json"
+    key = SpecCache.make_key(server.url, "openapi.json")
+    first, _ = api_service.fetch_api_spec(url, key)
+
+    version.update(etag='"v2"', title="Pets v2")
+    time.sleep(0.35)
+    second, _ = api_service.fetch_api_spec(url, key)
+    assert second is not first and second.etag == '"v2"'
+    assert second.spec["info"]["title"] == "Pets v2"
+    assert spec_cache.get(key) is second
+
+
+def test_least_recently_used_spec_is_evicted(serve, spec_cache):
+    server = serve(spec_with_etag('"v1"'))
+    keys = [SpecCache.make_key(server.url, f"spec{i}.json") for i in range(3)]
+    for key in keys[:2]:
+        api_service.fetch_api_spec(f"{server.url}/{key[1]}", key)
+
+    spec_cache.get(keys[0]) # La más reciente pasa a ser la 0
+    api_service.fetch_api_spec(f"{server.url}/{keys[2][1]}", keys[2])
+
+    assert spec_cache.get(keys[1]) is None
+    assert spec_cache.get(keys[0]) is not None and spec_cache.get(keys[2]) is not None
+    assert spec_cache.stats()["entries"] == 2
+
+
+@pytest.mark.parametrize("failure", [503, "caído"])
+def test_stored_spec_is_served_when_the_server_fails(serve, spec_cache, failure):
+    state = {"up": True}
+    server = serve(lambda request: spec_with_etag('"v1"')(request) if state["up"] else (failure, {}, b""))
+    url = f"{server.url}/openapi.json"
+    key = SpecCache.make_key(server.url, "openapi.json")
+    first, _ = api_service.fetch_api_spec(url, key)
+
+    state["up"] = False
+    time.sleep(0.35)
+    if failure == "caído":
+        server.close()
+    offline, source = api_service.fetch_api_spec(url, key)
+    assert offline.spec == first.spec and source == "memoria (sin conexión)"
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from benchmarks.synthetic_spec import make_synthetic_spec
+from request_engine import RequestEngine, grant_from_login_response, scheme_credentials
+from spec_cache import compile_spec
+from token_manager import TokenManager
+
+BEARER = {"type": "http", "scheme": "bearer"}
+LOGIN = {"form": {"username": "ana", "password": "secreta"}}
+ITEM = {"path": {"item_id": 1}}
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return compile_spec(make_synthetic_spec(n_tags=1, endpoints_per_tag=1, n_schemas=5))
+
+
+@pytest.fixture
+def auth_api(serve):
+    """
+    /auth/login entrega 'tok-N' con la vida útil de expires_in; mientras 'open'
+    no está activo los logins esperan. Los GET devuelven el Authorization recibido.
+    """
+    state = {"issued": 0, "expires_in": 3600, "reject": False}
+    lock = threading.Lock()
+
+    def respond(request):
+        if request.path != "/auth/login":
+            return 200, {}, {"authorization": request.headers.get("Authorization")}
+        server.open.wait(5)
+        if state["reject"]:
+            return 401, {}, {"error": "credenciales inválidas"}
+        with lock:
+            state["issued"] += 1
+            token = f"tok-{state['issued']}"
+        return 200, {}, {"access_token": token, "expires_in": state["expires_in"], "refresh_token": f"rt-{token}", "name": "Ana"}
+
+    server = serve(respond)
+    server.state = state
+    server.open = threading.Event()
+    server.open.set()
+    return server
+
+
+def logged_in_engine(compiled, auth_api, expires_in):
+    auth_api.state["expires_in"] = expires_in
+    engine = RequestEngine(compiled, auth_api.url, session=requests.Session(), tokens=TokenManager(refresh_margin=30, proactive=False))
+    assert engine.execute("login", LOGIN).ok
+    return engine
+
+
+def sent_token(engine):
+    return engine.execute("get_tag0_resource0", ITEM).response_data["authorization"]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_unmanaged_credentials_are_sent_until_they_expire():
+    tokens = TokenManager(proactive=False)
+    valid = scheme_credentials(BEARER, "a", time.time() + 60)
+    expired = scheme_credentials(BEARER, "b", time.time() - 1)
+    api_key = {"type": "apiKey", "value": "k"}
+    assert tokens.credential("bearerAuth", valid) is valid
+    assert tokens.credential("bearerAuth", expired) is None
+    assert tokens.credential("apiKey", api_key) == api_key
+
+
+def test_login_token_replaces_the_stored_credential(compiled, auth_api):
+    engine = logged_in_engine(compiled, auth_api, 3600)
+
+    assert sent_token(engine) == "Bearer tok-1"
+    assert engine.user_info == {"expires_in": 3600, "name": "Ana"}
+    stale = scheme_credentials(BEARER, "viejo", time.time() - 1)
+    assert engine.tokens.credential("bearerAuth", stale)["value"] == "tok-1"
+    assert len(auth_api.requests_to("/auth/login")) == 1
+
+
+def test_within_the_margin_sends_the_current_token_and_renews_in_background(compiled, auth_api):
+    engine = logged_in_engine(compiled, auth_api, 10)
+    version = engine.tokens.version
+    auth_api.open.clear()
+
+    assert sent_token(engine) == "Bearer tok-1"
+    assert engine.tokens.status()["bearerAuth"]["refreshing"]
+    auth_api.state["expires_in"] = 3600 # El token renovado ya no está dentro del margen
+    auth_api.open.set()
+    assert wait_until(lambda: engine.tokens.version > version)
+    assert sent_token(engine) == "Bearer tok-2"
+    # Sin operación de refresh en la especificación, la renovación repite el login
+    assert [request.form for request in auth_api.requests_to("/auth/login")] == [LOGIN["form"]] * 2
+
+
+def test_expired_token_waits_for_a_single_renewal(compiled, auth_api):
+    engine = logged_in_engine(compiled, auth_api, -1)
+    auth_api.open.clear()
+
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(sent_token(engine))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert wait_until(lambda: len(auth_api.requests_to("/auth/login")) == 2)
+    auth_api.open.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert values == ["Bearer tok-2"] * 4
+    assert len(auth_api.requests_to("/auth/login")) == 2
+
+
+def test_failed_renewal_of_an_expired_token_sends_nothing(compiled, auth_api):
+    engine = logged_in_engine(compiled, auth_api, -1)
+    auth_api.state["reject"] = True
+
+    assert sent_token(engine) is None
+    assert engine.tokens.status()["bearerAuth"]["error"].startswith("login:")
+    assert engine.tokens.fresh_credentials(engine.credentials) == {}
+
+
+def test_expired_token_without_refresher_is_not_sent(compiled, auth_api):
+    engine = logged_in_engine(compiled, auth_api, -1)
+    login = engine.execute("login", LOGIN)
+    tokens = TokenManager(proactive=False)
+    tokens.track(grant_from_login_response(engine.security_schemes, login.response_data))
+    assert tokens.credential("bearerAuth", {}) is None
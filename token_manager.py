@@ -0,0 +1,214 @@
+import base64
+import json
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Optional
+from app_config import TOKEN_REFRESH_MARGIN_SECONDS, TOKEN_REFRESH_RETRY_SECONDS, REQUEST_TIMEOUT_SECONDS
+
+# Claves en las que una respuesta de login suele devolver el refresh token y la vida útil del token
+REFRESH_TOKEN_KEYS = ("refresh_token", "refreshToken")
+EXPIRES_IN_KEYS = ("expires_in", "expiresIn")
+
+
+class TokenRefreshError(Exception):
+    """No se pudo renovar un token (ni con el refresh token ni repitiendo el login)."""
+
+
+def jwt_expiry(token) -> Optional[float]:
+    """Claim 'exp' (epoch) de un JWT, sin verificar la firma; None si el token no es un JWT con 'exp'."""
+    parts = str(token).split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4)))
+        return float(claims["exp"])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def token_expiry(response_data, token, now=None) -> Optional[float]:
+    """Vencimiento (epoch) según el expires_in de la respuesta de login o, si no lo trae, el 'exp' del JWT."""
+    if isinstance(response_data, dict):
+        for key in EXPIRES_IN_KEYS:
+            try:
+                return (now or time.time()) + float(response_data[key])
+            except (KeyError, TypeError, ValueError):
+                continue
+    return jwt_expiry(token)
+
+
+def refresh_token_of(response_data) -> Optional[str]:
+    if not isinstance(response_data, dict):
+        return None
+    return next((str(response_data[key]) for key in REFRESH_TOKEN_KEYS if response_data.get(key)), None)
+
+
+@dataclass
+class TokenGrant:
+    """Token obtenido de un login o una renovación."""
+    scheme_name: str
+    credential: dict # Formato de active_security_credentials; 'expires_at' es el vencimiento (epoch) o None
+    refresh_token: Optional[str] = field(default=None, repr=False)
+    user_info: dict = field(default_factory=dict)
+
+    @property
+    def expires_at(self):
+        return self.credential.get("expires_at")
+
+
+class ManagedToken:
+    def __init__(self, grant:TokenGrant, refresher=None):
+        self.grant = grant
+        self.refresher = refresher # refresher(refresh_token) -> TokenGrant; lanza TokenRefreshError
+        self.refreshing = None     # Future de la renovación en curso: la comparten todos los que la esperan
+        self.timer = None
+        self.used = False          # Se usó desde que se obtuvo: solo entonces lo renueva el timer
+        self.error = None
+        self.failed_at = None
+        self.refreshes = 0
+
+
+class TokenManager:
+    """
+    Ciclo de vida de los tokens de una sesión o de un RequestEngine. Cada token
+    lleva su vencimiento (expires_in de la respuesta o 'exp' del JWT) y, si vino de
+    un login, un renovador. Se renueva en segundo plano refresh_margin segundos
+    antes de vencer (con timer si proactive, y también al pedirlo); si ya venció,
+    quien lo pide espera la renovación, que es una sola aunque la pidan varios
+    hilos a la vez. Un token vencido que no se pudo renovar no se envía.
+    """
+
+    def __init__(self, refresh_margin=TOKEN_REFRESH_MARGIN_SECONDS, wait_seconds=REQUEST_TIMEOUT_SECONDS, proactive=True):
+        self.refresh_margin = refresh_margin
+        self.wait_seconds = wait_seconds
+        self.proactive = proactive
+        self.version = 0 # Cambia con cada token nuevo o renovado
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def track(self, grant:TokenGrant, refresher=None) -> None:
+        with self._lock:
+            self._discard(self._tokens.get(grant.scheme_name))
+            managed = ManagedToken(grant, refresher)
+            self._tokens[grant.scheme_name] = managed
+            self.version += 1
+            self._schedule(managed)
+
+    def forget(self, scheme_name=None) -> None:
+        """Deja de gestionar el token de un esquema (o todos) y cancela sus renovaciones programadas."""
+        with self._lock:
+            for name in [scheme_name] if scheme_name is not None else list(self._tokens):
+                self._discard(self._tokens.pop(name, None))
+            self.version += 1
+
+    def fork(self, proactive=False):
+        """Manager con los mismos tokens y renovadores (p. ej. para un workflow con credenciales propias)."""
+        forked = TokenManager(self.refresh_margin, self.wait_seconds, proactive)
+        with self._lock:
+            for managed in self._tokens.values():
+                forked.track(managed.grant, managed.refresher)
+        return forked
+
+    @staticmethod
+    def _discard(managed):
+        if managed is not None and managed.timer is not None:
+            managed.timer.cancel()
+
+    def _schedule(self, managed):
+        # Llamar con el lock tomado
+        if not self.proactive or managed.refresher is None or managed.grant.expires_at is None:
+            return
+        delay = max(0.0, managed.grant.expires_at - self.refresh_margin - time.time())
+        managed.timer = threading.Timer(delay, self._on_timer, args=(managed,))
+        managed.timer.daemon = True
+        managed.timer.start()
+
+    def _on_timer(self, managed):
+        with self._lock:
+            in_use = self._tokens.get(managed.grant.scheme_name) is managed and managed.used
+        if in_use:
+            self._refresh(managed)
+
+    def _refresh(self, managed) -> Optional[Future]:
+        """Lanza la renovación si no hay una en curso y devuelve su Future (None si falló hace muy poco)."""
+        with self._lock:
+            if managed.refreshing is not None:
+                return managed.refreshing
+            if managed.failed_at is not None and time.time() - managed.failed_at < TOKEN_REFRESH_RETRY_SECONDS:
+                return None
+            future = managed.refreshing = Future()
+        threading.Thread(target=self._run_refresh, args=(managed, future), name="token-refresh", daemon=True).start()
+        return future
+
+    def _run_refresh(self, managed, future):
+        scheme_name = managed.grant.scheme_name
+        try:
+            grant = managed.refresher(managed.grant.refresh_token)
+        except Exception as e_refresh: # El renovador envía requests: cualquier fallo deja el token como estaba
+            with self._lock:
+                managed.error, managed.failed_at, managed.refreshing = str(e_refresh), time.time(), None
+            future.set_result(None)
+            return
+        grant.scheme_name = scheme_name
+        if grant.refresh_token is None:
+            grant.refresh_token = managed.grant.refresh_token # Muchas APIs no rotan el refresh token
+        with self._lock:
+            managed.grant, managed.used, managed.error, managed.failed_at = grant, False, None, None
+            managed.refreshes += 1
+            managed.refreshing = None
+            if self._tokens.get(scheme_name) is managed:
+                self.version += 1
+                self._schedule(managed)
+        future.set_result(grant)
+
+    def credential(self, scheme_name:str, credential:dict) -> Optional[dict]:
+        """
+        Credencial que se puede enviar ahora para el esquema (la más reciente que
+        tenga el manager), o None si venció y no se pudo renovar.
+        """
+        with self._lock:
+            managed = self._tokens.get(scheme_name)
+            if managed is not None:
+                managed.used = True
+        if managed is None:
+            expires_at = credential.get("expires_at")
+            return None if expires_at is not None and expires_at <= time.time() else credential
+
+        grant = managed.grant
+        if grant.expires_at is None or grant.expires_at - time.time() > self.refresh_margin:
+            return grant.credential
+        future = self._refresh(managed) if managed.refresher is not None else None
+        if grant.expires_at > time.time():
+            return grant.credential # Todavía vale: se usa mientras se renueva en segundo plano
+        if future is None:
+            return None
+        try:
+            renewed = future.result(timeout=self.wait_seconds)
+        except FutureTimeoutError:
+            return None
+        return renewed.credential if renewed is not None else None
+
+    def fresh_credentials(self, credentials:dict) -> dict:
+        """Las credenciales a enviar: cada una reemplazada por su versión vigente; las vencidas se quitan."""
+        fresh = {}
+        for scheme_name, credential in (credentials or {}).items():
+            current = self.credential(scheme_name, credential)
+            if current is not None:
+                fresh[scheme_name] = current
+        return fresh
+
+    def status(self) -> dict:
+        """esquema -> {expires_at, refreshable, refreshing, refreshes, error} de los tokens gestionados."""
+        with self._lock:
+            return {
+                scheme_name: {
+                    "expires_at": managed.grant.expires_at,
+                    "refreshable": managed.refresher is not None,
+                    "refreshing": managed.refreshing is not None,
+                    "refreshes": managed.refreshes,
+                    "error": managed.error,
+                }
+                for scheme_name, managed in self._tokens.items()
+            }
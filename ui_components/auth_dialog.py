@@ -1,5 +1,53 @@
 import streamlit as st
 from app_config import GLOBAL_SUFFIX
+from request_engine import scheme_credentials
+from api_service import session_token_manager, session_oauth_tokens, apply_oauth_client
+from oauth_flows import OAuthClient, OAuthError, flow_scopes, runnable_flows
+
+MANUAL_TOKEN_OPTION = "Token de acceso"
+FLOW_LABELS = {"clientCredentials": "Client credentials", "password": "Password (usuario y clave)"}
+
+def render_oauth_flow_inputs(scheme_name, scheme_details, flows, input_values):
+    """
+    Modo de un esquema oauth2: token pegado a mano o uno de los flujos que se
+    ejecutan contra su tokenUrl. Guarda lo ingresado en input_values.
+    """
+    options = [MANUAL_TOKEN_OPTION] + flows
+    mode = st.radio(
+        f"Obtener el token de `{scheme_name}`:", options=options,
+        index=options.index(input_values.get("flow")) if input_values.get("flow") in options else 0,
+        format_func=lambda option: FLOW_LABELS.get(option, option), horizontal=True,
+        key=f"auth_flow_{scheme_name}{GLOBAL_SUFFIX}"
+    )
+    input_values["flow"] = mode
+    if mode == MANUAL_TOKEN_OPTION:
+        return False
+
+    token_url = scheme_details["flows"][mode]["tokenUrl"]
+    st.caption(f"Los tokens se piden a `{token_url}` y se guardan por scopes: cada operación usa el de los scopes que declara.")
+    col_id, col_secret = st.columns(2)
+    with col_id:
+        input_values["client_id"] = st.text_input("client_id:", value=input_values.get("client_id", ""), key=f"auth_client_id_{scheme_name}{GLOBAL_SUFFIX}")
+    with col_secret:
+        input_values["client_secret"] = st.text_input(
+            "client_secret:", value=input_values.get("client_secret", ""), type="password",
+            key=f"auth_client_secret_{scheme_name}{GLOBAL_SUFFIX}", help="Vacío para un cliente público (se envía solo el client_id)."
+        )
+    if mode == "password":
+        col_user, col_password = st.columns(2)
+        with col_user:
+            input_values["username"] = st.text_input("Usuario:", value=input_values.get("username", ""), key=f"auth_username_{scheme_name}{GLOBAL_SUFFIX}")
+        with col_password:
+            input_values["password"] = st.text_input("Clave:", value=input_values.get("password", ""), type="password", key=f"auth_password_{scheme_name}{GLOBAL_SUFFIX}")
+    scopes = flow_scopes(scheme_details, mode)
+    if scopes:
+        input_values["scopes"] = st.multiselect(
+            "Scopes del token inicial:", options=list(scopes), default=[s for s in input_values.get("scopes", []) if s in scopes],
+            format_func=lambda scope: f"{scope} — {scopes[scope]}" if scopes[scope] else scope,
+            key=f"auth_scopes_{scheme_name}{GLOBAL_SUFFIX}",
+            help="Las operaciones que piden otros scopes reciben su propio token automáticamente."
+        )
+    return True
 
 def render_auth_dialog():
     if not st.session_state.get('show_auth_dialog', False):
@@ -56,8 +104,14 @@ def render_auth_dialog():
                     st.caption(f"El esquema HTTP '{auth_scheme_type}' no es directamente soportado para entrada manual en esta versión. Considere el flujo OAuth2 si aplica.")
             
             elif scheme_details.get('type') == 'oauth2':
+                flows = runnable_flows(scheme_details)
+                other_flows = [flow for flow in scheme_details.get('flows', {}) if flow not in flows]
+                if other_flows:
+                    st.caption(f"Flujos OAuth2 que requieren navegador (ingrese un token si ya lo posee): {', '.join(other_flows)}.")
+                if flows and render_oauth_flow_inputs(scheme_name, scheme_details, flows, st.session_state.auth_input_values[scheme_name]):
+                    st.markdown("---")
+                    continue
                 field_label = f"Token de Acceso (OAuth2) para `{scheme_name}`:"
-                st.caption(f"Flujos OAuth2: {', '.join(scheme_details.get('flows', {}).keys())}. Por ahora, ingrese un token de acceso si ya lo posee.")
                 user_input = st.text_input(
                     field_label,
                     value=current_input_value,
@@ -81,22 +135,34 @@ def render_auth_dialog():
         with col_apply:
             if st.button("Aplicar Autorización", key=f"auth_dialog_apply_btn{GLOBAL_SUFFIX}", type="primary"):
                 st.session_state.active_security_credentials = {}
+                session_token_manager().forget() # Los tokens ingresados a mano no se renuevan (solo se controla su 'exp')
+                session_oauth_tokens().remove()
                 applied_any = False
+                oauth_errors = []
                 for scheme_name, scheme_details_apply in security_schemes.items():
                     input_val_obj = st.session_state.auth_input_values.get(scheme_name, {})
                     token_value = input_val_obj.get("value", "").strip()
 
-                    if token_value:
-                        st.session_state.active_security_credentials[scheme_name] = {
-                            "type": scheme_details_apply.get("type"),
-                            "value": token_value,
-                            "in": scheme_details_apply.get("in"), 
-                            "name": scheme_details_apply.get("name"),
-                            "scheme": scheme_details_apply.get("scheme")
-                        }
+                    flow = input_val_obj.get("flow")
+                    if scheme_details_apply.get('type') == 'oauth2' and flow in runnable_flows(scheme_details_apply):
+                        if not input_val_obj.get("client_id", "").strip():
+                            continue
+                        client = OAuthClient(
+                            flow, input_val_obj["client_id"].strip(), input_val_obj.get("client_secret", ""),
+                            input_val_obj.get("username", ""), input_val_obj.get("password", "")
+                        )
+                        try:
+                            apply_oauth_client(scheme_name, scheme_details_apply, client, input_val_obj.get("scopes", []))
+                            applied_any = True
+                        except OAuthError as e_oauth:
+                            oauth_errors.append(f"`{scheme_name}`: {e_oauth}")
+                    elif token_value:
+                        st.session_state.active_security_credentials[scheme_name] = scheme_credentials(scheme_details_apply, token_value)
                         applied_any = True
                 
-                if applied_any:
+                if oauth_errors:
+                    st.session_state.auth_status_message = f"Fallo al obtener el token OAuth2 de {'; '.join(oauth_errors)}"
+                elif applied_any:
                     st.session_state.auth_status_message = "Autorización aplicada/actualizada."
                 else:
                     st.session_state.auth_status_message = "No se ingresaron valores para autorización."
@@ -0,0 +1,104 @@
+import streamlit as st
+from app_config import GLOBAL_SUFFIX, BATCH_MAX_CONCURRENCY, CALL_POLL_INTERVAL_SECONDS
+from api_service import start_batch_run
+from batch_runner import BATCH_FILE_TYPES, BatchFileError, batch_columns
+from request_builder import row_column_targets
+from state_manager import rerun_endpoint_panel
+
+TARGET_LABELS = {"path": "path", "query": "query", "body": "body", "form": "formulario"}
+
+def render_batch_mode(plan, api_base_url, execute_disabled=False):
+    endpoint_id = plan.id
+    batch_run = st.session_state.batch_runs.get(endpoint_id)
+    enabled = st.toggle(
+        "🗂️ Modo batch (CSV/NDJSON)",
+        value=batch_run is not None,
+        key=f"{endpoint_id}_batch_mode{GLOBAL_SUFFIX}",
+        help="Ejecuta este endpoint una vez por fila de un archivo."
+    )
+    if not enabled:
+        return
+
+    st.caption(
+        "Cada columna con el nombre de un parámetro de path/query o de un campo del body se usa en el request "
+        "(campos anidados con puntos, p. ej. `address.city`). Las celdas vacías y lo que no venga en el archivo "
+        "toman el valor del formulario."
+    )
+    uploaded_file = st.file_uploader("Archivo de filas:", type=list(BATCH_FILE_TYPES), key=f"{endpoint_id}_batch_file{GLOBAL_SUFFIX}")
+
+    col_concurrency, col_rate = st.columns(2)
+    with col_concurrency:
+        concurrency = st.number_input("Requests simultáneos:", min_value=1, max_value=BATCH_MAX_CONCURRENCY, value=4, key=f"{endpoint_id}_batch_concurrency{GLOBAL_SUFFIX}")
+    with col_rate:
+        rate_limit = st.number_input("Máximo de requests por segundo (0 = sin límite):", min_value=0.0, value=0.0, step=1.0, key=f"{endpoint_id}_batch_rate{GLOBAL_SUFFIX}")
+
+    if uploaded_file is not None:
+        try:
+            targets = row_column_targets(plan, batch_columns(uploaded_file.getvalue(), uploaded_file.name))
+        except (BatchFileError, UnicodeDecodeError) as e_file:
+            st.error(f"No se pudo leer el archivo: {e_file}")
+            targets = {}
+        mapped = [f"`{column}` → {TARGET_LABELS[target]}" for column, target in targets.items() if target]
+        ignored = [f"`{column}`" for column, target in targets.items() if not target]
+        if mapped:
+            st.caption("Columnas usadas: " + ", ".join(mapped))
+        if ignored:
+            st.warning("Columnas ignoradas (no coinciden con parámetros ni campos del body): " + ", ".join(ignored))
+
+    running = batch_run is not None and not batch_run.done
+    if st.button("▶️ Ejecutar batch", key=f"{endpoint_id}_batch_start{GLOBAL_SUFFIX}", disabled=uploaded_file is None or running or execute_disabled):
+        if start_batch_run(plan, api_base_url, uploaded_file.getvalue(), uploaded_file.name, concurrency, rate_limit) is not None:
+            rerun_endpoint_panel()
+
+    if batch_run is None:
+        return
+    if running:
+        render_batch_progress(endpoint_id)
+    else:
+        render_batch_status(batch_run)
+        file_stem = plan.operation_id or endpoint_id
+        # El NDJSON de resultados solo se lee para la descarga cuando se pide, no en cada ejecución
+        download_key = f"{endpoint_id}_batch_download_ready{GLOBAL_SUFFIX}"
+        if st.session_state.get(download_key) == batch_run.started_at:
+            st.download_button(
+                "⬇️ Descargar resultados (NDJSON)",
+                data=batch_run.read_results(),
+                file_name=f"{file_stem}_batch.ndjson",
+                mime="application/x-ndjson",
+                key=f"{endpoint_id}_batch_download{GLOBAL_SUFFIX}"
+            )
+        elif st.button("Preparar descarga de resultados", key=f"{endpoint_id}_batch_prepare_download{GLOBAL_SUFFIX}"):
+            st.session_state[download_key] = batch_run.started_at
+            rerun_endpoint_panel()
+
+def render_batch_status(batch_run):
+    total = batch_run.total if batch_run.total is not None else "?"
+    rate = batch_run.completed / batch_run.elapsed_seconds if batch_run.elapsed_seconds > 0 else 0.0
+    st.progress(batch_run.progress, text=f"{batch_run.completed}/{total} filas · {batch_run.succeeded} OK · {batch_run.failed} con error · {rate:.1f} req/s")
+
+    if batch_run.error:
+        st.error(f"El batch se detuvo: {batch_run.error}")
+    elif batch_run.done and batch_run.cancelled:
+        st.warning(f"Batch cancelado tras {batch_run.completed} filas.")
+    elif batch_run.done:
+        st.success(f"Batch terminado en {batch_run.elapsed_seconds:.1f}s.")
+
+    recent, status_counts = batch_run.snapshot()
+    if status_counts:
+        st.caption("Status: " + " · ".join(f"{status}: {count}" for status, count in sorted(status_counts.items())))
+    if recent:
+        st.dataframe(list(reversed(recent)), hide_index=True, use_container_width=True)
+        if batch_run.completed > len(recent):
+            st.caption(f"Se muestran las últimas {len(recent)} filas; el archivo de resultados tiene todas.")
+
+@st.fragment(run_every=CALL_POLL_INTERVAL_SECONDS)
+def render_batch_progress(endpoint_id):
+    """Progreso en vivo del batch; al terminar se redibuja la app con el resumen y la descarga."""
+    batch_run = st.session_state.batch_runs.get(endpoint_id)
+    if batch_run is None:
+        return
+    if batch_run.done:
+        st.rerun()
+    render_batch_status(batch_run)
+    if st.button("⏹️ Cancelar batch", key=f"{endpoint_id}_batch_cancel{GLOBAL_SUFFIX}"):
+        batch_run.cancel()
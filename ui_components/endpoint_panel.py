@@ -0,0 +1,186 @@
+import streamlit as st
+from app_config import GLOBAL_SUFFIX, FRAGMENT_ENDPOINT_PANELS
+from api_service import execute_api_request, cancel_pending_call, start_pagination
+from render_plan import BODY_METHOD_FIELDS
+from state_manager import preserve_widget_state, rerun_endpoint_panel
+from ui_components.form_generator import render_form_tree
+from ui_components.response_display import render_response_data, render_request_notices
+from ui_components.batch_panel import render_batch_mode
+from ui_components.load_test_panel import render_load_test_mode
+
+def render_endpoint_header(plan):
+    col_summary, col_open = st.columns([0.85, 0.15])
+    with col_summary:
+        st.markdown(plan.expander_title)
+    with col_open:
+        if st.button("Abrir", key=f"{plan.id}_open_button{GLOBAL_SUFFIX}"):
+            st.session_state.active_expander_id = plan.id
+            st.rerun()
+    preserve_widget_state(plan.state_keys)
+
+def render_endpoint_panel(plan, api_base_url, spec, ref_index, tag_name):
+    endpoint_id = plan.id
+
+    if plan.description:
+        st.markdown(f"_{plan.description}_")
+
+    if endpoint_id not in st.session_state.form_field_values:
+        st.session_state.form_field_values[endpoint_id] = {}
+    if endpoint_id not in st.session_state.form_field_includes:
+        st.session_state.form_field_includes[endpoint_id] = {}
+
+    col_params, col_body = st.columns(2)
+
+    with col_params:
+        st.markdown("**Parámetros de URL:**")
+        for param in plan.params:
+            if param.location == 'path':
+                st.text_input(f"Path: {param.label}", key=param.widget_key, help=param.help)
+            elif param.location == 'query':
+                st.text_input(f"Query: {param.label}", key=param.widget_key, help=param.help)
+        if not plan.has_url_params:
+            st.caption("Este endpoint no tiene parámetros de URL (path o query).")
+
+    with col_body:
+        st.markdown("**Cuerpo del Request (Body):**")
+        body = plan.body
+        if body is None:
+            st.caption("Este endpoint no define un cuerpo (body) para el request.")
+
+        elif body.content_type == "application/json":
+            body_method_options = list(body.body_method_options)
+            current_body_method_choice = st.session_state.get(body.body_method_key, body_method_options[0])
+            if current_body_method_choice not in body_method_options:
+                current_body_method_choice = body_method_options[0]
+                st.session_state[body.body_method_key] = current_body_method_choice
+
+            default_radio_idx = body_method_options.index(current_body_method_choice)
+
+            chosen_body_method = st.radio(
+                "Método de entrada para el Body JSON:",
+                options=body_method_options,
+                index=default_radio_idx,
+                horizontal=True,
+                key=body.body_method_key
+            )
+
+            if chosen_body_method == BODY_METHOD_FIELDS and body.schema:
+                render_form_tree(body.schema, endpoint_id, ref_index)
+                st.markdown("--- \n JSON Adicional/Sobrescritura (opcional):")
+                st.text_area(
+                    "JSON para fusionar (este tiene precedencia sobre los campos):",
+                    value=st.session_state.get(body.additional_raw_json_key,"{}"),
+                    height=100,
+                    key=body.additional_raw_json_key,
+                    help="Este JSON se fusionará con los datos de los campos. En caso de conflicto de claves, este JSON prevalece."
+                )
+            else: 
+                st.text_area(
+                    "JSON Crudo para el Body:",
+                    value=st.session_state.get(body.raw_json_key, body.raw_json_default),
+                    height=200,
+                    key=body.raw_json_key
+                )
+
+        elif body.content_type == "application/x-www-form-urlencoded":
+            if body.form_fields:
+                st.markdown("Campos del formulario (x-www-form-urlencoded):")
+                for form_field in body.form_fields:
+                    current_field_val = st.session_state.get(form_field.widget_key)
+                    final_default_val = "" 
+
+                    if current_field_val is not None:
+                        final_default_val = current_field_val
+                    elif form_field.schema_default is not None:
+                        final_default_val = form_field.schema_default
+                    elif form_field.name == "username" and st.session_state.get('user_info',{}).get("username"): # Mantener lógica de autocompletar username
+                        final_default_val = st.session_state.user_info["username"]
+
+                    st.text_input(
+                        form_field.label,
+                        key=form_field.widget_key,
+                        type=form_field.input_type,
+                        value=final_default_val, 
+                        help=form_field.help,
+                        disabled=form_field.disabled 
+                    )
+            else:
+                st.caption("Esquema para x-www-form-urlencoded no definido o sin propiedades.")
+        else:
+            if body.first_content_type:
+                st.caption(f"Tipo de contenido del body no soportado para formulario interactivo: '{body.first_content_type}'.")
+            else:
+                st.caption("No se especificaron tipos de contenido para el body del request.")
+
+    st.markdown("---")
+
+    button_label = "🔑 Intentar Autenticar" if plan.offer_authentication else "🚀 Ejecutar"
+
+    disable_execute_button = False
+    tooltip_execute_button = None
+    if plan.security and not st.session_state.get('active_security_credentials'):
+        has_active_creds_with_value = any(
+            cred_detail.get("value") 
+            for cred_detail in st.session_state.get('active_security_credentials', {}).values()
+        )
+        if not has_active_creds_with_value:
+            button_label = "🔒 Autorización Requerida"
+            disable_execute_button = True
+            tooltip_execute_button = "Este endpoint requiere autorización. Configúrala desde el panel lateral."
+
+    # El batch y la prueba de carga solo dependen de la autorización, no de la llamada en curso
+    authorization_missing = disable_execute_button
+
+    pending = st.session_state.pending_calls.get(endpoint_id)
+    if pending is not None:
+        disable_execute_button = True
+        tooltip_execute_button = "Hay una solicitud en curso para este endpoint."
+    pagination_run = st.session_state.paginated_results.get(endpoint_id)
+    if pagination_run is not None and not pagination_run.done:
+        disable_execute_button = True
+        tooltip_execute_button = "Se están descargando las páginas de este endpoint."
+
+    col_execute, col_paginate, col_load_test = st.columns([0.3, 0.35, 0.35])
+    with col_execute:
+        execute_clicked = st.button(button_label, key=plan.execute_button_key, disabled=disable_execute_button, help=tooltip_execute_button)
+    with col_paginate:
+        fetch_all_pages = plan.method.upper() == "GET" and st.toggle(
+            "📚 Traer todas las páginas",
+            key=f"{endpoint_id}_fetch_all_pages{GLOBAL_SUFFIX}",
+            help="Sigue la paginación (cabecera Link, campos next/cursor o parámetros page/offset) y junta los items de todas las páginas."
+        )
+    with col_load_test:
+        show_load_test = st.toggle(
+            "📈 Prueba de carga",
+            value=endpoint_id in st.session_state.load_tests,
+            key=f"{endpoint_id}_load_test_mode{GLOBAL_SUFFIX}",
+            help="Envía el mismo request muchas veces y mide latencias y throughput."
+        )
+    if execute_clicked and fetch_all_pages:
+        if start_pagination(plan, api_base_url) is not None:
+            rerun_endpoint_panel()
+    elif execute_clicked:
+        st.session_state.active_expander_id = endpoint_id
+        execute_api_request(plan, api_base_url, spec)
+
+    if show_load_test:
+        render_load_test_mode(plan, api_base_url, execute_disabled=authorization_missing or plan.offer_authentication)
+    render_batch_mode(plan, api_base_url, execute_disabled=authorization_missing)
+
+    if pending is not None:
+        render_pending_call(pending)
+    else:
+        render_response_data(endpoint_id, tag_name)
+
+def render_pending_call(pending):
+    render_request_notices(pending.prepared.notices)
+    col_status, col_cancel = st.columns([0.8, 0.2])
+    with col_status:
+        st.info(f"⏳ Solicitud en curso ({pending.elapsed_seconds:.0f}s)...")
+    with col_cancel:
+        if st.button("Cancelar", key=f"{pending.endpoint_id}_cancel_call{GLOBAL_SUFFIX}"):
+            cancel_pending_call(pending.endpoint_id)
+            rerun_endpoint_panel()
+
+if FRAGMENT_ENDPOINT_PANELS:
+    render_endpoint_panel = st.fragment(render_endpoint_panel)
@@ -0,0 +1,59 @@
+import math
+import time
+import streamlit as st
+from app_config import GLOBAL_SUFFIX
+
+RESULTS_PER_PAGE = 20
+
+def focus_endpoint(plan):
+    """Salta a un endpoint: abre su tag y se muestra solo ese endpoint."""
+    st.session_state.active_tab_name = plan.tag
+    st.session_state.active_expander_id = plan.id
+    st.session_state.focused_endpoint_id = plan.id
+
+def render_search_box():
+    query = st.text_input(
+        "🔎 Buscar endpoint:",
+        key=f"endpoint_search_query{GLOBAL_SUFFIX}",
+        placeholder="path, método, operationId, resumen, descripción o tag",
+    )
+    if query != st.session_state.get('_last_search_query'):
+        st.session_state._last_search_query = query
+        st.session_state.search_results_page = 0
+    return query.strip()
+
+def render_search_results(query, search_index, operation_plans):
+    start_time = time.perf_counter()
+    results = search_index.search(query)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    if not results:
+        st.info(f"No se encontraron endpoints para '{query}'.")
+        return
+
+    total_pages = math.ceil(len(results) / RESULTS_PER_PAGE)
+    page = min(st.session_state.get('search_results_page', 0), total_pages - 1)
+    st.caption(f"{len(results)} resultados en {elapsed_ms:.1f} ms — página {page + 1} de {total_pages}")
+
+    for endpoint_id, _score in results[page * RESULTS_PER_PAGE:(page + 1) * RESULTS_PER_PAGE]:
+        plan = operation_plans[endpoint_id]
+        col_title, col_tag, col_go = st.columns([0.7, 0.15, 0.15])
+        with col_title:
+            st.markdown(plan.expander_title)
+        with col_tag:
+            st.caption(plan.tag.replace("_", " ").capitalize())
+        with col_go:
+            if st.button("Ir", key=f"search_go_{endpoint_id}"):
+                focus_endpoint(plan)
+                st.rerun()
+
+    if total_pages > 1:
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.button("← Anterior", key=f"search_prev_page{GLOBAL_SUFFIX}", disabled=page == 0):
+                st.session_state.search_results_page = page - 1
+                st.rerun()
+        with col_next:
+            if st.button("Siguiente →", key=f"search_next_page{GLOBAL_SUFFIX}", disabled=page >= total_pages - 1):
+                st.session_state.search_results_page = page + 1
+                st.rerun()
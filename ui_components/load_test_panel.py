@@ -0,0 +1,123 @@
+import json
+import streamlit as st
+from app_config import GLOBAL_SUFFIX, CALL_POLL_INTERVAL_SECONDS, LOAD_TEST_MAX_REQUESTS, LOAD_TEST_MAX_CONCURRENCY
+from api_service import start_load_test
+from load_test import LoadTestConfig, MODE_COUNT, MODE_RATE, WORKERS_THREADS, WORKERS_PROCESSES, STATUS_NO_RESPONSE
+from state_manager import rerun_endpoint_panel
+
+MODE_LABELS = {MODE_COUNT: "N requests", MODE_RATE: "RPS objetivo durante un tiempo"}
+WORKER_LABELS = {WORKERS_THREADS: "Hilos", WORKERS_PROCESSES: "Procesos"}
+
+def render_load_test_mode(plan, api_base_url, execute_disabled=False):
+    endpoint_id = plan.id
+    load_test_run = st.session_state.load_tests.get(endpoint_id)
+
+    col_mode, col_workers = st.columns(2)
+    with col_mode:
+        mode = st.radio("Modo:", options=list(MODE_LABELS), format_func=MODE_LABELS.get, horizontal=True, key=f"{endpoint_id}_load_mode{GLOBAL_SUFFIX}")
+    with col_workers:
+        workers = st.radio(
+            "Workers:", options=list(WORKER_LABELS), format_func=WORKER_LABELS.get, horizontal=True,
+            key=f"{endpoint_id}_load_workers{GLOBAL_SUFFIX}",
+            help="Con procesos, los requests se reparten entre varios procesos para que el GIL no limite al cliente."
+        )
+
+    col_a, col_b, col_c = st.columns(3)
+    with col_a:
+        concurrency = st.number_input("Concurrencia:", min_value=1, max_value=LOAD_TEST_MAX_CONCURRENCY, value=10, key=f"{endpoint_id}_load_concurrency{GLOBAL_SUFFIX}")
+    if mode == MODE_RATE:
+        with col_b:
+            target_rps = st.number_input("Requests por segundo:", min_value=0.1, value=10.0, step=1.0, key=f"{endpoint_id}_load_rps{GLOBAL_SUFFIX}")
+        with col_c:
+            duration_seconds = st.number_input("Duración (s):", min_value=1.0, value=10.0, step=1.0, key=f"{endpoint_id}_load_duration{GLOBAL_SUFFIX}")
+        config = LoadTestConfig(mode=mode, concurrency=concurrency, target_rps=target_rps, duration_seconds=duration_seconds, workers=workers)
+    else:
+        with col_b:
+            total_requests = st.number_input("Requests:", min_value=1, max_value=LOAD_TEST_MAX_REQUESTS, value=100, key=f"{endpoint_id}_load_requests{GLOBAL_SUFFIX}")
+        config = LoadTestConfig(mode=mode, total_requests=total_requests, concurrency=concurrency, workers=workers)
+
+    too_many = config.planned_requests > LOAD_TEST_MAX_REQUESTS
+    if too_many:
+        st.warning(f"La prueba enviaría {config.planned_requests} requests; el máximo es {LOAD_TEST_MAX_REQUESTS}.")
+
+    running = load_test_run is not None and not load_test_run.done
+    if st.button("📈 Iniciar prueba de carga", key=f"{endpoint_id}_load_start{GLOBAL_SUFFIX}", disabled=running or too_many or execute_disabled):
+        if start_load_test(plan, api_base_url, config) is not None:
+            rerun_endpoint_panel()
+
+    if load_test_run is None:
+        return
+    if running:
+        render_load_test_progress(endpoint_id)
+    else:
+        render_load_test_report(load_test_run)
+        file_stem = plan.operation_id or endpoint_id
+        st.download_button(
+            "⬇️ Exportar informe (JSON)",
+            data=json.dumps(load_test_run.report(), indent=2),
+            file_name=f"{file_stem}_load_test.json",
+            mime="application/json",
+            key=f"{endpoint_id}_load_download{GLOBAL_SUFFIX}"
+        )
+
+def _format_ms(value):
+    return f"{value:.1f} ms" if value is not None else "—"
+
+def _format_bytes(value):
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+def _histogram_labels(bins):
+    # Con latencias bajas los bins miden menos de 1 ms: se usan los decimales necesarios; el número
+    # de bin (con ceros a la izquierda) hace únicas las etiquetas y mantiene el orden de las barras
+    width = bins[0]["to_ms"] - bins[0]["from_ms"]
+    decimals = 0 if width >= 1 else 1 if width >= 0.1 else 2
+    digits = len(str(len(bins)))
+    return [f"{i + 1:0{digits}d} · {b['from_ms']:.{decimals}f}–{b['to_ms']:.{decimals}f}" for i, b in enumerate(bins)]
+
+def render_load_test_report(load_test_run):
+    report = load_test_run.report()
+    st.progress(load_test_run.progress, text=f"{report['requests']}/{report['planned_requests']} requests · {report['throughput_rps'] or 0:.1f} req/s en {report['duration_seconds']:.1f}s")
+
+    if load_test_run.error:
+        st.error(f"La prueba de carga se detuvo: {load_test_run.error}")
+    elif load_test_run.done and load_test_run.cancelled:
+        st.warning(f"Prueba de carga cancelada tras {report['requests']} requests.")
+
+    latency = report["latency_ms"]
+    metric_columns = st.columns(5)
+    for column, (label, key) in zip(metric_columns, (("p50", "p50"), ("p90", "p90"), ("p99", "p99"), ("Máx.", "max"), ("Media", "mean"))):
+        column.metric(label, _format_ms(latency[key]))
+
+    if report["histogram"]:
+        st.caption("Histograma de latencias (ms):")
+        bins = report["histogram"]
+        st.bar_chart(
+            [{"rango": label, "requests": b["count"]} for label, b in zip(_histogram_labels(bins), bins)],
+            x="rango", y="requests"
+        )
+
+    status_labels = [
+        f"{'sin respuesta' if int(status) == STATUS_NO_RESPONSE else status}: {count}"
+        for status, count in report["status_codes"].items()
+    ]
+    if status_labels:
+        st.caption("Status: " + " · ".join(status_labels))
+    if report["errors"]:
+        st.caption("Errores: " + " · ".join(f"{kind}: {count}" for kind, count in report["errors"].items()))
+    st.caption(f"Bytes de body recibidos: {_format_bytes(report['bytes_received'])} · enviados: {_format_bytes(report['bytes_sent'])}")
+
+@st.fragment(run_every=CALL_POLL_INTERVAL_SECONDS)
+def render_load_test_progress(endpoint_id):
+    """Métricas en vivo de la prueba; al terminar se redibuja la app con el informe y la exportación."""
+    load_test_run = st.session_state.load_tests.get(endpoint_id)
+    if load_test_run is None:
+        return
+    if load_test_run.done:
+        st.rerun()
+    render_load_test_report(load_test_run)
+    if st.button("⏹️ Detener prueba", key=f"{endpoint_id}_load_cancel{GLOBAL_SUFFIX}"):
+        load_test_run.cancel()
@@ -1,11 +1,158 @@
 import streamlit as st
-from app_config import GLOBAL_SUFFIX, PANDAS_AVAILABLE, pd
+from app_config import GLOBAL_SUFFIX, PANDAS_AVAILABLE, pd, CALL_POLL_INTERVAL_SECONDS
+from background_calls import SpilledResponse
+from response_cache import CACHE_HIT, CACHE_REVALIDATED
+from resilience import CIRCUIT_CLOSED
+from state_manager import rerun_endpoint_panel
 from .detail_dialog import trigger_detail_dialog
 
+def render_request_notices(notices):
+    for level, message in notices:
+        getattr(st, level)(message)
+
+def render_response_meta(meta):
+    if not meta:
+        return
+    render_request_notices(meta.get("notices", []))
+    details = [f"Status {meta['status_code']}", f"{meta['elapsed_ms']:.0f} ms"]
+    if meta.get("cache_status") == CACHE_HIT:
+        details.append(f"🗄️ desde caché, sin red (edad {meta['cache_age_seconds']:.0f}s)")
+    elif meta.get("cache_status") == CACHE_REVALIDATED:
+        details.append("🗄️ desde caché, revalidada por el servidor (304)")
+    if meta.get("connection_reused") is not None:
+        details.append("conexión reutilizada (keep-alive)" if meta["connection_reused"] else "conexión nueva")
+    if meta.get("retries"):
+        details.append(f"🔁 {len(meta['retries'])} reintento(s): " + ", ".join(f"{retry['reason']} → esperó {retry['delay_seconds']:.1f}s" for retry in meta["retries"]))
+    if meta.get("circuit_state"):
+        details.append(f"circuito del host: {meta['circuit_state']}" if meta["circuit_state"] == CIRCUIT_CLOSED else f"⚡ circuito del host: {meta['circuit_state']}")
+    st.caption(" · ".join(details))
+    if meta.get("timing"):
+        render_timing_waterfall(meta["timing"])
+
+def render_timing_waterfall(timing):
+    """Cascada de las fases del request (DNS, TCP, TLS, envío, espera del primer byte, descarga)."""
+    phases = [phase for phase in timing["phases"] if phase[2] >= phase[1]]
+    if not phases:
+        return
+    st.caption(
+        " · ".join(f"{name}: {end - start:.1f} ms" for name, start, end in phases)
+        + f" · enviados {format_size(timing['request_bytes'])}, recibidos {format_size(timing['response_bytes'])}"
+    )
+    st.vega_lite_chart(
+        {
+            "values": [{"fase": name, "inicio": start, "fin": end, "ms": round(end - start, 2)} for name, start, end in phases]
+        },
+        {
+            "mark": {"type": "bar", "cornerRadius": 2},
+            "height": 22 * len(phases),
+            "encoding": {
+                "y": {"field": "fase", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "inicio", "type": "quantitative", "title": "ms desde el inicio"},
+                "x2": {"field": "fin"},
+                "color": {"field": "fase", "type": "nominal", "legend": None, "sort": None},
+                "tooltip": [{"field": "fase", "type": "nominal"}, {"field": "ms", "type": "quantitative", "title": "duración (ms)"}],
+            },
+        },
+        use_container_width=True,
+    )
+
+def format_size(size_bytes):
+    for unit in ("B", "KB", "MB"):
+        if size_bytes < 1024:
+            return f"{size_bytes:.0f} {unit}"
+        size_bytes /= 1024
+    return f"{size_bytes:.1f} GB"
+
+def render_spilled_response(endpoint_id, spilled):
+    """
+    Respuesta guardada en disco: muestra su inicio y, a pedido, la parsea (sin
+    guardarla en la sesión) o la ofrece para descargar. Devuelve los datos
+    parseados, o None si no se pidió parsearla.
+    """
+    st.info(f"Respuesta grande ({format_size(spilled.size_bytes)}): se guardó en disco y se muestra solo su inicio.")
+    st.code(spilled.preview + "\n…", language="json" if spilled.is_json else "text")
+
+    download_key = f"{endpoint_id}_spilled_download{GLOBAL_SUFFIX}"
+    col_parse, col_download = st.columns(2)
+    with col_parse:
+        parse_full = st.toggle(
+            "Parsear y mostrar completa",
+            key=f"{endpoint_id}_spilled_parse{GLOBAL_SUFFIX}",
+            help="Lee y parsea el archivo en cada ejecución mientras esté activo; con respuestas muy grandes puede ser lento."
+        )
+    with col_download:
+        # El archivo solo se lee para la descarga cuando se pide, no en cada ejecución
+        if st.session_state.get(download_key) == spilled.path:
+            with spilled.open() as body_file:
+                extension = "json" if spilled.is_json else "txt"
+                st.download_button("⬇️ Descargar respuesta", data=body_file.read(), file_name=f"{endpoint_id}_response.{extension}", mime=spilled.content_type or None, key=f"{endpoint_id}_spilled_download_button{GLOBAL_SUFFIX}")
+        elif st.button("Preparar descarga", key=f"{endpoint_id}_spilled_prepare{GLOBAL_SUFFIX}"):
+            st.session_state[download_key] = spilled.path
+            rerun_endpoint_panel()
+    return spilled.load() if parse_full else None
+
+def render_pagination_status(pagination_run):
+    buffer = pagination_run.buffer
+    style = pagination_run.style.label if pagination_run.style else "detectando..."
+    st.caption(f"{pagination_run.pages} páginas · {buffer.row_count} items · {pagination_run.elapsed_seconds:.1f}s · paginación: {style}")
+    if pagination_run.error:
+        st.error(f"Se detuvo la paginación: {pagination_run.error}")
+    elif pagination_run.done:
+        st.success(f"Paginación terminada ({pagination_run.stop_reason}).")
+
+@st.fragment(run_every=CALL_POLL_INTERVAL_SECONDS)
+def render_pagination_progress(endpoint_id):
+    """Avance de 'traer todas las páginas'; al terminar se redibuja la app con la tabla completa."""
+    pagination_run = st.session_state.paginated_results.get(endpoint_id)
+    if pagination_run is None:
+        return
+    if pagination_run.done:
+        st.rerun()
+    st.info("⏳ Descargando páginas...")
+    render_pagination_status(pagination_run)
+    if st.button("⏹️ Detener", key=f"{endpoint_id}_pagination_cancel{GLOBAL_SUFFIX}"):
+        pagination_run.cancel()
+
+def render_paginated_result(endpoint_id, pagination_run):
+    st.markdown("--- \n #### Respuesta (todas las páginas):")
+    render_request_notices(pagination_run.prepared.notices)
+    if not pagination_run.done:
+        render_pagination_progress(endpoint_id)
+        return
+
+    render_pagination_status(pagination_run)
+    buffer = pagination_run.buffer
+    if not buffer.row_count:
+        return
+    st.dataframe(buffer.display_columns(), hide_index=True, use_container_width=True)
+
+    # Exportar serializa todas las filas: solo se hace cuando se pide
+    export_key = f"{endpoint_id}_pagination_export{GLOBAL_SUFFIX}"
+    if st.session_state.get(export_key) == pagination_run.started_at:
+        col_ndjson, col_csv = st.columns(2)
+        with col_ndjson:
+            st.download_button("⬇️ NDJSON", data=buffer.to_ndjson(), file_name=f"{endpoint_id}_pages.ndjson", mime="application/x-ndjson", key=f"{endpoint_id}_pagination_ndjson{GLOBAL_SUFFIX}")
+        with col_csv:
+            st.download_button("⬇️ CSV", data=buffer.to_csv(), file_name=f"{endpoint_id}_pages.csv", mime="text/csv", key=f"{endpoint_id}_pagination_csv{GLOBAL_SUFFIX}")
+    elif st.button("Exportar items", key=f"{endpoint_id}_pagination_prepare_export{GLOBAL_SUFFIX}"):
+        st.session_state[export_key] = pagination_run.started_at
+        rerun_endpoint_panel()
+
 def render_response_data(endpoint_id, tag_name_to_display):
+    pagination_run = st.session_state.get('paginated_results', {}).get(endpoint_id)
+    if pagination_run is not None:
+        render_paginated_result(endpoint_id, pagination_run)
+        return
+
     if endpoint_id in st.session_state.get('endpoint_responses', {}):
         st.markdown("--- \n #### Respuesta:")
         saved_resp_req = st.session_state.endpoint_responses[endpoint_id]
+        render_response_meta(st.session_state.get('endpoint_response_meta', {}).get(endpoint_id))
+
+        if isinstance(saved_resp_req, SpilledResponse):
+            saved_resp_req = render_spilled_response(endpoint_id, saved_resp_req)
+            if saved_resp_req is None:
+                return
 
         if isinstance(saved_resp_req, dict) and "error" in saved_resp_req:
             st.error(f"Error en la respuesta: {saved_resp_req['error']}")
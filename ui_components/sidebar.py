@@ -1,11 +1,101 @@
+import time
 import streamlit as st
-from app_config import GLOBAL_SUFFIX
-from api_service import load_api_spec
+from app_config import GLOBAL_SUFFIX, SPEC_WATCH_INTERVAL_SECONDS, CALL_POLL_INTERVAL_SECONDS
+from api_service import load_api_spec, reload_api_spec
 from api_service import reset_api_spec
+from api_service import fetch_api_spec, apply_spec_update
+from api_service import poll_pending_calls, cancel_pending_call
+from api_service import session_token_manager, session_oauth_tokens
+from spec_cache import SPEC_CACHE
+from spec_watcher import SPEC_WATCHERS
+from http_pool import HTTP_POOL
+from response_cache import RESPONSE_CACHE
+from ui_components.response_display import format_size
+
+@st.fragment(run_every=SPEC_WATCH_INTERVAL_SECONDS)
+def render_spec_watch_status():
+    """Cada intervalo comprueba si el vigilante dejó una versión nueva en la caché y la aplica."""
+    loaded_spec = st.session_state.get('loaded_spec')
+    cache_key = st.session_state.get('loaded_spec_key')
+    if loaded_spec is None or cache_key is None:
+        return
+    watcher = SPEC_WATCHERS.watch(f"{cache_key[0]}/{cache_key[1]}", cache_key, fetch_api_spec)
+
+    latest = SPEC_CACHE.get(cache_key)
+    if latest is not None and latest is not loaded_spec and latest.content_hash != loaded_spec.content_hash:
+        apply_spec_update(latest, "recarga automática")
+        st.rerun()
+
+    if watcher.last_error:
+        st.caption(f"⚠️ Vigilancia de la especificación: {watcher.last_error}")
+    elif watcher.last_checked_at:
+        st.caption(f"Última comprobación de cambios hace {int(time.time() - watcher.last_checked_at)}s.")
+
+def _token_label(expires_at, token_status):
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        label = "vencido"
+    elif remaining < 120:
+        label = f"vence en {remaining:.0f}s"
+    else:
+        label = f"vence en {remaining / 60:.0f} min"
+    if token_status.get("refreshing"):
+        label += " · renovando..."
+    elif token_status.get("refreshable"):
+        label += " · se renueva automáticamente"
+    if token_status.get("refreshes"):
+        label += f" ({token_status['refreshes']} renovaciones)"
+    return label
+
+def render_token_status():
+    """Vencimiento de cada credencial activa y estado de su renovación automática."""
+    managed_tokens = session_token_manager().status()
+    oauth_tokens = session_oauth_tokens()
+    oauth_status = oauth_tokens.status()
+    for scheme_name, creds in st.session_state.active_security_credentials.items():
+        if oauth_tokens.configured(scheme_name):
+            cached = [token for token in oauth_status if token["scheme"] == scheme_name]
+            st.caption(f"`{scheme_name}`: OAuth2 ({cached[0]['client'] if cached else 'sin tokens'}), {len(cached)} token(s) en caché por scopes")
+            for token in cached:
+                expiry = _token_label(token["expires_at"], token) if token["expires_at"] is not None else "sin vencimiento"
+                st.caption(f"↳ scopes `{' '.join(token['scopes']) or '(ninguno)'}`: {expiry}")
+                if token.get("error"):
+                    st.caption(f"⚠️ No se pudo renovar: {token['error']}")
+            continue
+        token_status = managed_tokens.get(scheme_name, {})
+        expires_at = token_status.get("expires_at", creds.get("expires_at"))
+        if expires_at is None:
+            continue
+        st.caption(f"`{scheme_name}`: {_token_label(expires_at, token_status)}")
+        if token_status.get("error"):
+            st.caption(f"⚠️ No se pudo renovar `{scheme_name}`: {token_status['error']}")
+
+@st.fragment(run_every=CALL_POLL_INTERVAL_SECONDS)
+def render_pending_calls():
+    """Sondea las llamadas en segundo plano; cuando alguna termina se redibuja la app con su resultado."""
+    if poll_pending_calls():
+        st.rerun()
+    if not st.session_state.pending_calls:
+        return
+    st.markdown(f"**⏳ Llamadas en curso ({len(st.session_state.pending_calls)})**")
+    operation_plans = st.session_state.get('operation_plans', {})
+    for endpoint_id, pending in list(st.session_state.pending_calls.items()):
+        plan = operation_plans.get(endpoint_id)
+        label = f"{plan.method.upper()} {plan.path}" if plan else endpoint_id
+        col_label, col_cancel = st.columns([0.75, 0.25])
+        with col_label:
+            st.caption(f"`{label}` — {pending.elapsed_seconds:.0f}s")
+        with col_cancel:
+            if st.button("✖", key=f"sidebar_cancel_{endpoint_id}", help="Cancelar"):
+                cancel_pending_call(endpoint_id)
+                st.rerun()
 
 def render_sidebar():
 
     with st.sidebar:
+        if st.session_state.get('pending_calls'):
+            render_pending_calls()
+
         st.header(f"🔑 Autenticación")
 
         if st.session_state.get('active_security_credentials') and \
@@ -24,9 +114,12 @@ def render_sidebar():
 
             if st.session_state.get('user_info') and "username" in st.session_state.user_info:
                 st.caption(f"Usuario: {st.session_state.user_info['username']}")
+            render_token_status()
             
             if st.button("Limpiar Autorización", key=f"clear_auth_btn{GLOBAL_SUFFIX}"):
                 st.session_state.active_security_credentials = {}
+                session_token_manager().forget()
+                session_oauth_tokens().remove()
                 st.session_state.auth_input_values = {}
                 st.session_state.auth_status_message = "Autorización limpiada."
                 st.session_state.user_info = {}
@@ -77,11 +170,77 @@ def render_sidebar():
             load_api_spec(api_base_url_input, api_json_location_input)
             st.rerun()  
 
+        if st.session_state.get('loaded_spec') is not None:
+            if st.button(
+                "🔄 Buscar cambios en la especificación",
+                key=f"reload_api_btn{GLOBAL_SUFFIX}",
+                help="Vuelve a consultar la especificación cargada y aplica solo las operaciones que cambiaron, conservando formularios, respuestas y credenciales del resto. 'Cargar API' reinicia todo."
+            ):
+                reload_api_spec()
+                st.rerun()
+
+        if st.session_state.get('loaded_spec') is not None and SPEC_WATCH_INTERVAL_SECONDS > 0:
+            st.session_state.spec_watch_enabled = st.toggle(
+                "Recargar automáticamente si cambia la especificación",
+                value=st.session_state.get('spec_watch_enabled', False),
+                key=f"spec_watch_toggle{GLOBAL_SUFFIX}",
+                help=f"Consulta la especificación cada {SPEC_WATCH_INTERVAL_SECONDS}s (con ETag) y aplica solo las operaciones que cambiaron, conservando formularios y respuestas del resto."
+            )
+            if st.session_state.spec_watch_enabled:
+                render_spec_watch_status()
+
+        st.session_state.lazy_endpoint_rendering = st.toggle(
+            "Construir solo el endpoint abierto",
+            value=st.session_state.get('lazy_endpoint_rendering', True),
+            key=f"lazy_rendering_toggle{GLOBAL_SUFFIX}",
+            help="Los endpoints cerrados muestran solo su cabecera; el formulario se construye al abrirlos. Acelera las recargas en tags con muchos endpoints."
+        )
+
+        st.session_state.response_cache_enabled = st.toggle(
+            "Caché de respuestas GET/HEAD",
+            value=st.session_state.get('response_cache_enabled', False),
+            key=f"response_cache_toggle{GLOBAL_SUFFIX}",
+            help="Respeta Cache-Control/Expires: una respuesta fresca se muestra sin ir a la red y una vencida con ETag o Last-Modified se revalida (304). Las respuestas se separan por URL, query y credenciales."
+        )
+        if st.session_state.response_cache_enabled:
+            response_cache_stats = RESPONSE_CACHE.stats()
+            col_stats, col_clear = st.columns([0.75, 0.25])
+            with col_stats:
+                st.caption(
+                    f"Caché de respuestas: {response_cache_stats['hits']} aciertos, {response_cache_stats['revalidations']} revalidadas, "
+                    f"{response_cache_stats['misses']} a la red; {response_cache_stats['entries']} entradas, "
+                    f"{format_size(response_cache_stats['memory_bytes'])} de {format_size(response_cache_stats['memory_budget'])} en memoria"
+                    + (" (y copia en disco)." if response_cache_stats['disk_enabled'] else ".")
+                )
+            with col_clear:
+                if st.button("Vaciar", key=f"response_cache_clear{GLOBAL_SUFFIX}"):
+                    RESPONSE_CACHE.clear()
+                    st.rerun()
+
+        cache_stats = SPEC_CACHE.stats()
+        st.caption(
+            f"Caché de especificaciones: {cache_stats['hits']} aciertos "
+            f"({cache_stats['revalidations']} revalidadas), {cache_stats['misses']} descargas, "
+            f"{cache_stats['entries']}/{cache_stats['max_entries']} entradas (TTL {cache_stats['ttl_seconds']}s)."
+        )
+        pool_stats = HTTP_POOL.stats(st.session_state.get('current_api_url') or "")
+        if pool_stats:
+            st.caption(
+                f"Conexiones HTTP a la API: {pool_stats['requests']} solicitudes sobre {pool_stats['connections']} conexiones "
+                f"({pool_stats['reused']} reutilizadas), compartidas por {pool_stats['holders']} sesión(es)."
+            )
+
         if st.session_state.get('openapi_spec'):
             spec = st.session_state.openapi_spec
             st.divider()
             st.subheader(f"API: {spec.get('info',{}).get('title','N/A')}")
             st.caption(f"Versión: {spec.get('info',{}).get('version','N/A')}")
+            if st.session_state.get('spec_source'):
+                st.caption(f"Origen de la especificación: {st.session_state.spec_source}")
+            if st.session_state.get('loaded_spec') is not None and st.session_state.loaded_spec.external_documents:
+                st.caption(f"Documentos referenciados por '$ref' externos: {len(st.session_state.loaded_spec.external_documents)}")
+            if st.session_state.get('spec_update_message'):
+                st.caption(f"Última recarga: {st.session_state.spec_update_message}")
             if spec.get('info',{}).get('description'):
                 st.markdown(spec.get('info',{}).get('description'))
             
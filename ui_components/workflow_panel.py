@@ -0,0 +1,168 @@
+import json
+import streamlit as st
+from app_config import GLOBAL_SUFFIX, CALL_POLL_INTERVAL_SECONDS, WORKFLOW_MAX_PARALLEL
+from api_service import start_workflow
+from workflow import WORKFLOW_STORE, Workflow, FINISHED_STATES, STEP_OK
+
+EDITOR_KEY = f"workflow_editor{GLOBAL_SUFFIX}"
+EXAMPLE_WORKFLOW = {
+    "name": "ejemplo",
+    "vars": {"usuario": "demo"},
+    "steps": [
+        {"id": "login", "operation": "POST /auth/login", "inputs": {"username": "${vars.usuario}", "password": "secreto"}},
+        {"id": "crear", "operation": "createItem", "inputs": {"name": "nuevo"}},
+        {"id": "leer", "operation": "GET /items/{id}", "inputs": {"id": "${crear.response.id}"}},
+    ],
+}
+
+def render_workflow_panel(api_base_url):
+    """
+    Editor de workflows (pasos encadenados con ${paso.response...}), guardado en
+    WORKFLOW_STORE y ejecución como DAG con el resultado de cada paso.
+    """
+    workflow_run = st.session_state.get('workflow_run')
+    running = workflow_run is not None and not workflow_run.done
+
+    saved_names = WORKFLOW_STORE.names()
+    if saved_names:
+        col_saved, col_load = st.columns([3, 1])
+        with col_saved:
+            selected_name = st.selectbox("Workflows guardados:", options=saved_names, key=f"workflow_saved_select{GLOBAL_SUFFIX}")
+        with col_load:
+            st.write("")
+            if st.button("📂 Cargar", key=f"workflow_load_button{GLOBAL_SUFFIX}"):
+                try:
+                    st.session_state[EDITOR_KEY] = json.dumps(WORKFLOW_STORE.load(selected_name), ensure_ascii=False, indent=2)
+                except (OSError, ValueError) as e_load:
+                    st.error(f"No se pudo cargar '{selected_name}': {e_load}")
+
+    if EDITOR_KEY not in st.session_state:
+        st.session_state[EDITOR_KEY] = json.dumps(EXAMPLE_WORKFLOW, ensure_ascii=False, indent=2)
+    editor_text = st.text_area(
+        "Definición (JSON):", key=EDITOR_KEY, height=260,
+        help="Cada paso referencia una operación (operationId, 'MÉTODO /ruta' o id de endpoint) y puede usar "
+             "${paso.response.campo}, ${paso.status}, ${paso.headers.Nombre} o ${vars.nombre} en sus entradas."
+    )
+
+    definition, workflow = None, None
+    try:
+        definition = json.loads(editor_text)
+        workflow = Workflow.from_dict(definition)
+    except ValueError as e_parse: # JSONDecodeError y WorkflowError
+        st.warning(f"Definición inválida: {e_parse}")
+
+    max_parallel = st.number_input(
+        "Pasos en paralelo (máx.):", min_value=1, max_value=max(WORKFLOW_MAX_PARALLEL, 1) * 4,
+        value=WORKFLOW_MAX_PARALLEL, key=f"workflow_max_parallel{GLOBAL_SUFFIX}"
+    )
+
+    col_run, col_save, col_delete = st.columns(3)
+    with col_run:
+        if st.button("▶️ Ejecutar workflow", key=f"workflow_run_button{GLOBAL_SUFFIX}", disabled=running or workflow is None, type="primary"):
+            if start_workflow(definition, api_base_url, max_parallel) is not None:
+                st.rerun()
+    with col_save:
+        if WORKFLOW_STORE.enabled and st.button("💾 Guardar", key=f"workflow_save_button{GLOBAL_SUFFIX}", disabled=workflow is None):
+            try:
+                WORKFLOW_STORE.save(workflow)
+                st.toast(f"Workflow '{workflow.name}' guardado.")
+            except OSError as e_save:
+                st.error(f"No se pudo guardar el workflow: {e_save}")
+    with col_delete:
+        if workflow is not None and workflow.name in saved_names:
+            if st.button("🗑️ Eliminar", key=f"workflow_delete_button{GLOBAL_SUFFIX}"):
+                WORKFLOW_STORE.delete(workflow.name)
+                st.rerun()
+
+    if workflow_run is None:
+        return
+    st.markdown(f"--- \n #### Ejecución de '{workflow_run.workflow.name}':")
+    if running:
+        render_workflow_progress()
+    else:
+        render_workflow_report(workflow_run)
+
+@st.fragment(run_every=CALL_POLL_INTERVAL_SECONDS)
+def render_workflow_progress():
+    """Estado de los pasos en vivo; al terminar se redibuja la app con el informe completo."""
+    workflow_run = st.session_state.get('workflow_run')
+    if workflow_run is None:
+        return
+    if workflow_run.done:
+        st.rerun()
+    render_workflow_steps(workflow_run)
+    if st.button("⏹️ Detener workflow", key=f"workflow_cancel_button{GLOBAL_SUFFIX}"):
+        workflow_run.cancel()
+
+def _format_ms(value):
+    return f"{value:.0f} ms" if value is not None else "—"
+
+def render_workflow_steps(workflow_run):
+    report = workflow_run.report()
+    finished = sum(1 for step in report["steps"] if step["status"] in FINISHED_STATES)
+    st.progress(workflow_run.progress, text=f"{finished}/{len(report['steps'])} pasos · {workflow_run.elapsed_seconds:.1f}s")
+    st.dataframe(
+        [
+            {
+                "Paso": step["step"], "Operación": step["operation"], "Depende de": ", ".join(step["depends_on"]),
+                "Estado": step["status"], "Status": step["status_code"], "Inicio": _format_ms(step["started_ms"]),
+                "Duración": _format_ms(step["elapsed_ms"]), "TTFB": _format_ms(step["ttfb_ms"]), "Error": step["error"] or "",
+            }
+            for step in report["steps"]
+        ],
+        hide_index=True, use_container_width=True
+    )
+    return report
+
+def render_workflow_report(workflow_run):
+    report = render_workflow_steps(workflow_run)
+    if workflow_run.error:
+        st.error(f"El workflow se detuvo: {workflow_run.error}")
+    elif workflow_run.cancelled:
+        st.warning("Workflow cancelado: los pasos pendientes no se enviaron.")
+    elif report["ok"]:
+        st.success(f"Workflow completado en {report['duration_ms']:.0f} ms.")
+    else:
+        st.error("Algunos pasos fallaron; los que dependían de ellos se omitieron.")
+
+    timeline = [step for step in report["steps"] if step["started_ms"] is not None and step["elapsed_ms"] is not None]
+    if timeline:
+        st.vega_lite_chart(
+            {
+                "values": [
+                    {"paso": step["step"], "inicio": step["started_ms"], "fin": step["started_ms"] + step["elapsed_ms"],
+                     "ms": round(step["elapsed_ms"], 1), "estado": step["status"]}
+                    for step in timeline
+                ]
+            },
+            {
+                "mark": {"type": "bar", "cornerRadius": 2},
+                "height": 22 * len(timeline),
+                "encoding": {
+                    "y": {"field": "paso", "type": "nominal", "sort": None, "title": None},
+                    "x": {"field": "inicio", "type": "quantitative", "title": "ms desde el inicio del workflow"},
+                    "x2": {"field": "fin"},
+                    "color": {"field": "estado", "type": "nominal"},
+                    "tooltip": [{"field": "paso", "type": "nominal"}, {"field": "ms", "type": "quantitative", "title": "duración (ms)"}],
+                },
+            },
+            use_container_width=True,
+        )
+
+    step_ids = [step["step"] for step in report["steps"] if workflow_run.results[step["step"]].status_code is not None]
+    if step_ids:
+        shown_step = st.selectbox("Ver respuesta del paso:", options=step_ids, key=f"workflow_step_view{GLOBAL_SUFFIX}")
+        step_result = workflow_run.results[shown_step]
+        st.caption(f"Entradas: {json.dumps(step_result.inputs, ensure_ascii=False, default=str)}")
+        if step_result.status == STEP_OK or isinstance(step_result.response, (dict, list)):
+            st.json(step_result.response)
+        else:
+            st.code(str(step_result.response), language="text")
+
+    st.download_button(
+        "⬇️ Exportar informe (JSON)",
+        data=json.dumps(report, indent=2),
+        file_name=f"{workflow_run.workflow.name}_workflow.json",
+        mime="application/json",
+        key=f"workflow_download{GLOBAL_SUFFIX}"
+    )
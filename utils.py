@@ -1,10 +1,11 @@
 import json
+from collections.abc import Mapping
 
 def resolve_ref(spec, ref_string):
     parts = ref_string.strip("#/").split("/")
     current = spec
     for part in parts:
-        if isinstance(current, dict) and part in current:
+        if isinstance(current, Mapping) and part in current:
             current = current[part]
         else:
             return None
@@ -0,0 +1,445 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from app_config import WORKFLOW_DIR, WORKFLOW_MAX_PARALLEL, REQUEST_TIMEOUT_SECONDS
+from background_calls import SpilledResponse
+from http_pool import build_session
+from oauth_flows import OAuthError
+from request_engine import RequestEngine, UnknownOperationError, load_compiled_spec, parse_auth_arguments, parse_oauth_arguments
+from request_builder import RequestBuildError
+
+# ${paso.response.items[0].id}: expresión tipo JSONPath sobre el resultado de un paso anterior
+TEMPLATE_PATTERN = re.compile(r"\$\{\s*([^}]+?)\s*\}")
+PATH_TOKEN_PATTERN = re.compile(r"\.?([A-Za-z_][\w-]*)|\[(\d+|\*|'[^']*'|\"[^\"]*\")\]")
+WILDCARD = object()
+VARIABLES_ROOT = "vars"
+
+STEP_PENDING = "pendiente"
+STEP_RUNNING = "en curso"
+STEP_OK = "ok"
+STEP_FAILED = "error"
+STEP_SKIPPED = "omitido"
+STEP_CANCELLED = "cancelado"
+FINISHED_STATES = (STEP_OK, STEP_FAILED, STEP_SKIPPED, STEP_CANCELLED)
+
+
+class WorkflowError(ValueError):
+    """La definición del workflow es inválida o una expresión no se pudo resolver."""
+
+
+def parse_path(expression:str) -> list:
+    """'paso.response.items[0].id' -> ['paso', 'response', 'items', 0, 'id']"""
+    tokens, position = [], 0
+    expression = expression.strip()
+    if expression.startswith("$."):
+        expression = expression[2:]
+    while position < len(expression):
+        match = PATH_TOKEN_PATTERN.match(expression, position)
+        if match is None or match.end() == position:
+            raise WorkflowError(f"Expresión inválida: '{expression}' (posición {position}).")
+        key, index = match.groups()
+        if key is not None:
+            tokens.append(key)
+        elif index == "*":
+            tokens.append(WILDCARD)
+        elif index.isdigit():
+            tokens.append(int(index))
+        else:
+            tokens.append(index[1:-1])
+        position = match.end()
+    if not tokens or not isinstance(tokens[0], str):
+        raise WorkflowError(f"La expresión '{expression}' debe empezar con el id de un paso o '{VARIABLES_ROOT}'.")
+    return tokens
+
+
+def evaluate_path(tokens, context):
+    """Valor de la ruta en el contexto; con '[*]' devuelve la lista de coincidencias. Lanza KeyError si no existe."""
+    nodes = [context]
+    multiple = False
+    for token in tokens:
+        next_nodes = []
+        for node in nodes:
+            if token is WILDCARD:
+                multiple = True
+                next_nodes.extend(node.values() if isinstance(node, dict) else node if isinstance(node, list) else [])
+            elif isinstance(token, int) and isinstance(node, list) and -len(node) <= token < len(node):
+                next_nodes.append(node[token])
+            elif isinstance(token, str) and isinstance(node, dict) and token in node:
+                next_nodes.append(node[token])
+        if not next_nodes and not multiple:
+            raise KeyError(token)
+        nodes = next_nodes
+    return nodes if multiple else nodes[0]
+
+
+def template_references(value) -> set:
+    """Primeros elementos (ids de paso o 'vars') de las expresiones ${...} dentro de un valor."""
+    if isinstance(value, str):
+        return {parse_path(expression)[0] for expression in TEMPLATE_PATTERN.findall(value)}
+    if isinstance(value, dict):
+        return set().union(*(template_references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(template_references(v) for v in value)) if value else set()
+    return set()
+
+
+def resolve_templates(value, context):
+    """
+    Reemplaza las expresiones ${...}. Un string que es solo una expresión toma el
+    valor tal cual (número, objeto...); dentro de un texto se interpola como texto.
+    """
+    if isinstance(value, dict):
+        return {k: resolve_templates(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_templates(v, context) for v in value]
+    if not isinstance(value, str) or "${" not in value:
+        return value
+
+    def lookup(expression):
+        try:
+            return evaluate_path(parse_path(expression), context)
+        except KeyError:
+            raise WorkflowError(f"La expresión '${{{expression}}}' no devolvió ningún valor.") from None
+
+    whole = TEMPLATE_PATTERN.fullmatch(value.strip())
+    if whole:
+        return lookup(whole.group(1))
+
+    def interpolate(match):
+        resolved = lookup(match.group(1))
+        return json.dumps(resolved, ensure_ascii=False) if isinstance(resolved, (dict, list)) else str(resolved)
+    return TEMPLATE_PATTERN.sub(interpolate, value)
+
+
+@dataclass(frozen=True)
+class WorkflowStep:
+    id: str
+    operation: str
+    inputs: dict = field(default_factory=dict)
+    after: tuple = () # Dependencias explícitas además de las inferidas
+
+
+class Workflow:
+    """
+    Pasos que referencian operaciones (operationId, 'MÉTODO /ruta' o id de endpoint)
+    y toman sus entradas de pasos anteriores con ${paso.response...}. Las
+    dependencias se infieren de esas expresiones, de 'after' y de los logins: un
+    paso con seguridad depende de los logins declarados antes que él.
+    """
+
+    def __init__(self, name, steps, variables=None):
+        self.name = name
+        self.steps = list(steps)
+        self.variables = dict(variables or {})
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict) or not isinstance(data.get("steps"), list) or not data["steps"]:
+            raise WorkflowError("El workflow debe ser un objeto con una lista 'steps' no vacía.")
+        steps, seen = [], set()
+        for position, raw_step in enumerate(data["steps"], start=1):
+            if not isinstance(raw_step, dict) or not raw_step.get("operation"):
+                raise WorkflowError(f"El paso {position} debe ser un objeto con 'operation'.")
+            step_id = str(raw_step.get("id") or f"paso{position}")
+            if step_id in seen or step_id == VARIABLES_ROOT:
+                raise WorkflowError(f"Id de paso repetido o reservado: '{step_id}'.")
+            seen.add(step_id)
+            after = raw_step.get("after") or ()
+            steps.append(WorkflowStep(step_id, str(raw_step["operation"]), dict(raw_step.get("inputs") or {}),
+                                      tuple([after] if isinstance(after, str) else after)))
+        return cls(str(data.get("name") or "workflow"), steps, data.get("vars"))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "vars": self.variables,
+            "steps": [
+                {"id": s.id, "operation": s.operation, "inputs": s.inputs, **({"after": list(s.after)} if s.after else {})}
+                for s in self.steps
+            ],
+        }
+
+    def dependencies(self, engine) -> dict:
+        """id de paso -> ids de los pasos de los que depende. Lanza WorkflowError si hay ciclos o referencias desconocidas."""
+        step_ids = [s.id for s in self.steps]
+        login_ids = []
+        dependencies = {}
+        for step in self.steps:
+            try:
+                plan = engine.operation(step.operation)
+            except UnknownOperationError as e:
+                raise WorkflowError(f"Paso '{step.id}': {e}") from None
+            referenced = (template_references(step.inputs) - {VARIABLES_ROOT}) | set(step.after)
+            unknown = referenced - set(step_ids)
+            if unknown:
+                raise WorkflowError(f"Paso '{step.id}': referencia a pasos inexistentes: {', '.join(sorted(unknown))}.")
+            if plan.security:
+                referenced |= set(login_ids)
+            referenced.discard(step.id)
+            dependencies[step.id] = referenced
+            if plan.is_potentially_auth_endpoint:
+                login_ids.append(step.id)
+        self._check_acyclic(dependencies)
+        return dependencies
+
+    @staticmethod
+    def _check_acyclic(dependencies):
+        remaining = {step_id: set(deps) for step_id, deps in dependencies.items()}
+        while remaining:
+            ready = [step_id for step_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise WorkflowError(f"Dependencias circulares entre los pasos: {', '.join(sorted(remaining))}.")
+            for step_id in ready:
+                del remaining[step_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+
+@dataclass
+class StepResult:
+    step_id: str
+    operation: str
+    depends_on: tuple = ()
+    status: str = STEP_PENDING
+    started_ms: Optional[float] = None # Relativos al inicio del workflow
+    finished_ms: Optional[float] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    inputs: Any = None
+    response: Any = None
+    headers: dict = field(default_factory=dict)
+    timing: Optional[dict] = None
+
+    @property
+    def elapsed_ms(self):
+        if self.started_ms is None or self.finished_ms is None:
+            return None
+        return self.finished_ms - self.started_ms
+
+    def context(self):
+        # Lo que las expresiones de pasos posteriores pueden leer de este paso
+        return {"response": self.response, "status": self.status_code, "headers": self.headers, "inputs": self.inputs}
+
+    def summary(self):
+        return {
+            "step": self.step_id, "operation": self.operation, "depends_on": list(self.depends_on),
+            "status": self.status, "status_code": self.status_code, "error": self.error,
+            "started_ms": self.started_ms, "elapsed_ms": self.elapsed_ms,
+            "ttfb_ms": next((end - start for name, start, end in (self.timing or {}).get("phases", []) if name == "Espera (TTFB)"), None),
+        }
+
+
+class WorkflowRun:
+    """
+    Ejecuta un workflow en un hilo propio: cada paso sale en cuanto terminaron bien
+    sus dependencias, con hasta max_parallel pasos a la vez, por el RequestEngine
+    (su Session con pool de conexiones y sus credenciales, que los logins
+    actualizan). Si un paso falla, los que dependen de él se omiten.
+    """
+
+    def __init__(self, workflow:Workflow, engine:RequestEngine, max_parallel=WORKFLOW_MAX_PARALLEL):
+        self.workflow = workflow
+        self.engine = engine
+        self.max_parallel = max(1, int(max_parallel))
+        self.dependencies = workflow.dependencies(engine)
+        self.results = {s.id: StepResult(s.id, s.operation, tuple(sorted(self.dependencies[s.id]))) for s in workflow.steps}
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._started_perf = time.perf_counter()
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="workflow", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def elapsed_seconds(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def progress(self):
+        finished = sum(1 for r in self.results.values() if r.status in FINISHED_STATES)
+        return finished / len(self.results)
+
+    def cancel(self):
+        # Los pasos en curso terminan; los pendientes no se envían
+        self._cancel_event.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _now_ms(self):
+        return (time.perf_counter() - self._started_perf) * 1000
+
+    def _context(self):
+        with self._lock:
+            context = {step_id: r.context() for step_id, r in self.results.items() if r.status == STEP_OK}
+        context[VARIABLES_ROOT] = self.workflow.variables
+        return context
+
+    def _run_step(self, step):
+        result = self.results[step.id]
+        with self._lock:
+            result.status = STEP_RUNNING
+            result.started_ms = self._now_ms()
+        try:
+            inputs = resolve_templates(step.inputs, self._context())
+        except WorkflowError as e:
+            with self._lock:
+                result.status, result.error, result.finished_ms = STEP_FAILED, str(e), self._now_ms()
+            return
+        call = self.engine.execute(step.operation, inputs, self._cancel_event)
+        response = call.response_data
+        if isinstance(response, SpilledResponse):
+            # Los pasos siguientes leen la respuesta completa: se parsea y se borra el archivo temporal
+            spilled, response = response, response.load()
+            spilled.discard()
+        with self._lock:
+            result.inputs = inputs
+            result.status_code = call.status_code
+            result.response = response
+            result.headers = call.headers
+            result.timing = call.timing
+            result.error = call.error or (None if call.ok else f"Status {call.status_code}")
+            result.status = STEP_OK if call.ok and not call.error else STEP_FAILED
+            result.finished_ms = self._now_ms()
+
+    def _run(self):
+        pending = {step.id: step for step in self.workflow.steps}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="workflow") as pool:
+                in_flight = set()
+                while pending or in_flight:
+                    for step_id, step in list(pending.items()):
+                        states = [self.results[dep].status for dep in self.dependencies[step_id]]
+                        if self._cancel_event.is_set():
+                            self.results[step_id].status = STEP_CANCELLED
+                        elif any(state in (STEP_FAILED, STEP_SKIPPED, STEP_CANCELLED) for state in states):
+                            self.results[step_id].status = STEP_SKIPPED
+                        elif all(state == STEP_OK for state in states) and len(in_flight) < self.max_parallel:
+                            in_flight.add(pool.submit(self._run_step, step))
+                        else:
+                            continue
+                        del pending[step_id]
+                    if not in_flight:
+                        continue
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+
+    def report(self) -> dict:
+        with self._lock:
+            steps = [self.results[s.id].summary() for s in self.workflow.steps]
+        return {
+            "workflow": self.workflow.name,
+            "duration_ms": round(self.elapsed_seconds * 1000, 2),
+            "ok": all(step["status"] == STEP_OK for step in steps),
+            "steps": steps,
+        }
+
+
+class WorkflowStore:
+    """Workflows guardados como archivos JSON (uno por workflow) en un directorio."""
+
+    def __init__(self, directory=WORKFLOW_DIR):
+        self.directory = directory
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def _path_for(self, name):
+        safe_name = re.sub(r"[^\w.-]+", "_", name).strip("._") or "workflow"
+        return os.path.join(self.directory, f"{safe_name}.workflow.json")
+
+    def names(self):
+        if not self.enabled or not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".workflow.json")] for name in os.listdir(self.directory) if name.endswith(".workflow.json"))
+
+    def load(self, name) -> dict:
+        with open(self._path_for(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, workflow:Workflow):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path_for(workflow.name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(workflow.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def delete(self, name):
+        try:
+            os.remove(self._path_for(name))
+        except OSError:
+            pass
+
+
+WORKFLOW_STORE = WorkflowStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta un workflow (pasos encadenados entre operaciones) sin la interfaz.")
+    parser.add_argument("workflow_file", help="Archivo JSON del workflow.")
+    parser.add_argument("--spec", required=True, help="URL o archivo JSON/YAML de la especificación.")
+    parser.add_argument("--spec-url", help="URL contra la que se resuelven los '$ref' relativos de un archivo local.")
+    parser.add_argument("--base-url", required=True, help="URL base de la API.")
+    parser.add_argument("--auth", action="append", metavar="ESQUEMA=VALOR", help="Credencial de un esquema de securitySchemes (repetible).")
+    parser.add_argument("--oauth-client", action="append", metavar="ESQUEMA=ID[:SECRETO]", help="Cliente OAuth2 de un esquema (ver request_engine, repetible).")
+    parser.add_argument("--oauth-user", action="append", metavar="ESQUEMA=USUARIO:CLAVE", help="Usuario del flujo password de un esquema (repetible).")
+    parser.add_argument("--var", action="append", metavar="NOMBRE=VALOR", help="Valor de ${vars.NOMBRE} (repetible; reemplaza al del archivo).")
+    parser.add_argument("--parallel", type=int, default=WORKFLOW_MAX_PARALLEL, help="Pasos simultáneos como máximo.")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS, help="Timeout de cada request en segundos.")
+    parser.add_argument("--responses", action="store_true", help="Incluir en el informe la respuesta de cada paso.")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.workflow_file, "r", encoding="utf-8") as f:
+            workflow = Workflow.from_dict(json.load(f))
+        workflow.variables.update(parse_auth_arguments(args.var, "--var"))
+        engine = RequestEngine(load_compiled_spec(args.spec, args.spec_url), args.base_url,
+                               session=build_session(pool_maxsize=max(1, args.parallel)), timeout=args.timeout)
+        for scheme_name, value in parse_auth_arguments(args.auth).items():
+            engine.set_credential(scheme_name, value)
+        for scheme_name, client in parse_oauth_arguments(args.oauth_client, args.oauth_user).items():
+            engine.set_oauth_client(scheme_name, client)
+        workflow_run = WorkflowRun(workflow, engine, args.parallel)
+    except (OSError, json.JSONDecodeError, WorkflowError, RequestBuildError, OAuthError, argparse.ArgumentTypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    workflow_run.start().wait()
+    report = workflow_run.report()
+    if args.responses:
+        for step in report["steps"]:
+            step["response"] = workflow_run.results[step["step"]].response
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    if workflow_run.error:
+        print(f"Error: {workflow_run.error}", file=sys.stderr)
+    return 0 if report["ok"] and not workflow_run.error else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())